@@ -0,0 +1,193 @@
+"""
+Helpers shared by the Notepad benchmarks
+
+The benchmarks run headless with the offscreen Qt platform from the
+repository root, where the application finds its configuration files.
+"""
+
+__all__ = [
+    'ROOT', 'CASES', 'MARKER', 'application', 'generateDocument',
+    'resetPeakRss', 'peakRssMb', 'currentRssMb',
+    'loadBaseline', 'compareBaseline', 'writeResults'
+]
+__version__ = '0.1'
+__author__ = 'Victor M. Ortiz <Victor.M.Ortiz@outlook.com>'
+
+import json
+import os
+import random
+import resource
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+os.chdir(ROOT)
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+# Name: (document size in bytes, line length in characters)
+CASES = {
+    '1mb': (1 << 20, 80),
+    '10mb': (10 << 20, 80),
+    '100mb': (100 << 20, 80),
+    'long-lines': (10 << 20, 1 << 20),
+}
+
+# Marker written every _marker_every lines, searched and replaced by benchmarks
+MARKER = 'NEEDLE'
+_marker_every = 1000
+_words = (
+    'lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod '
+    'tempor incididunt ut labore et dolore magna aliqua server host port '
+    'timeout retries enabled disabled value key name path'
+).split()
+
+_app = None
+
+def application():
+    """
+    Returns the QApplication, creating it on first use.
+    """
+    global _app
+    from PyQt6.QtWidgets import QApplication
+    if _app is None:
+        _app = QApplication.instance() or QApplication([sys.argv[0]])
+    return _app
+
+def generateDocument(filename: str, size: int, line_length: int, seed: int = 0,
+        nested: bool = False) -> int:
+    """
+    Write a text file of random words, with a marker every few lines.
+
+    Args:
+        filename (str): The file to write.
+        size (int): The approximate size of the file in bytes.
+        line_length (int): The approximate length of each line.
+        seed (int): The random seed, the same seed writes the same file.
+        nested (bool): Indent the lines after each marker in groups of
+            ten, so that folding everything leaves the marker lines.
+
+    Returns:
+        int: The number of lines written.
+    """
+    rng = random.Random(seed)
+    lines = 0
+    written = 0
+    with open(filename, 'w', encoding='utf-8') as document:
+        while written < size:
+            words = []
+            length = 0
+            if lines % _marker_every == 0:
+                words.append(MARKER)
+                length += len(MARKER) + 1
+            while length < line_length:
+                word = rng.choice(_words)
+                words.append(word)
+                length += len(word) + 1
+            line = ' '.join(words) + '\n'
+            if nested and lines % _marker_every:
+                line = ('  ' if lines % 10 == 1 else '    ') + line
+            document.write(line)
+            written += len(line)
+            lines += 1
+    return lines
+
+def resetPeakRss() -> bool:
+    """
+    Reset the peak resident set size of the process, only on Linux.
+
+    Returns:
+        bool: True if the peak was reset.
+    """
+    try:
+        with open('/proc/self/clear_refs', 'w') as clear_refs:
+            clear_refs.write('5')
+        return True
+    except OSError:
+        return False
+
+def _procStatusMb(field: str) -> float | None:
+    try:
+        with open('/proc/self/status') as status:
+            for line in status:
+                if line.startswith(field + ':'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+def peakRssMb() -> float:
+    """
+    Returns the peak resident set size of the process in MB since the last
+    reset, or since the process started where it cannot be reset.
+    """
+    peak = _procStatusMb('VmHWM')
+    if peak is None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux reports kilobytes, macOS bytes
+        peak /= 1024 * 1024 if sys.platform == 'darwin' else 1024
+    return peak
+
+def currentRssMb() -> float | None:
+    """
+    Returns the current resident set size of the process in MB, if known.
+    """
+    return _procStatusMb('VmRSS')
+
+def loadBaseline(filename: str) -> dict | None:
+    """
+    Read stored benchmark results, or None if there are none.
+    """
+    try:
+        with open(filename, 'r', encoding='utf-8') as baseline:
+            return json.load(baseline)
+    except FileNotFoundError:
+        return None
+
+def compareBaseline(results: list[dict], baseline: dict, metric: str, threshold: float) -> list[dict]:
+    """
+    Find the results worse than the baseline by more than a threshold.
+
+    Results and baseline entries are matched on their `case` and
+    `operation` keys.
+
+    Args:
+        results (list[dict]): The current results.
+        baseline (dict): The stored results, as written by `writeResults`.
+        metric (str): The result key to compare, lower is better.
+        threshold (float): The allowed relative increase, e.g. 0.2 for 20%.
+
+    Returns:
+        list[dict]: The regressions, with the baseline and current values.
+    """
+    previous = {
+        (result['case'], result['operation']): result
+        for result in baseline.get('results', [])
+    }
+    regressions = []
+    for result in results:
+        old = previous.get((result['case'], result['operation']))
+        if old is None or old.get(metric) in (None, 0) or result.get(metric) is None:
+            continue
+        ratio = result[metric] / old[metric]
+        if ratio > 1 + threshold:
+            regressions.append({
+                'case': result['case'],
+                'operation': result['operation'],
+                'metric': metric,
+                'baseline': old[metric],
+                'current': result[metric],
+                'ratio': round(ratio, 3)
+            })
+    return regressions
+
+def writeResults(filename: str | None, payload: dict):
+    """
+    Write results as JSON to a file, or to stdout when filename is None.
+    """
+    if filename is None:
+        json.dump(payload, sys.stdout, indent=2)
+        sys.stdout.write('\n')
+    else:
+        with open(filename, 'w', encoding='utf-8') as output:
+            json.dump(payload, output, indent=2)
@@ -0,0 +1,229 @@
+"""
+Benchmarks of the core editor operations on large documents
+
+Runs headless and measures each operation on generated documents, from the
+call until the event loop is idle again, along with the peak resident
+memory during the operation. Results are written as JSON and compared with
+a stored baseline; the exit status is 1 when an operation got slower than
+the baseline by more than the threshold.
+
+    python benchmarks/editor.py --cases 1mb,10mb --output results.json
+    python benchmarks/editor.py --save-baseline
+"""
+
+__version__ = '0.1'
+__author__ = 'Victor M. Ortiz <Victor.M.Ortiz@outlook.com>'
+
+import argparse
+import os
+import platform
+import sys
+import tempfile
+import time
+from collections.abc import Callable
+from common import (
+    ROOT, CASES, MARKER, application, generateDocument,
+    resetPeakRss, peakRssMb, loadBaseline, compareBaseline, writeResults
+)
+
+_baseline_file = os.path.join(ROOT, 'benchmarks', 'baseline.json')
+
+def _operations(notepad, filename: str, lines: int, workdir: str) -> dict[str, tuple[Callable | None, Callable]]:
+    """
+    Returns the benchmarked operations, in the order they run, as a setup
+    function run before the measure and the measured function.
+    """
+    from PyQt6.QtGui import QTextCursor
+
+    def moveToBlock(number: int):
+        block = notepad.editor.document().findBlockByNumber(number)
+        cursor = notepad.editor.textCursor()
+        cursor.setPosition(block.position())
+        notepad.editor.setTextCursor(cursor)
+
+    def cursorAtEnd():
+        notepad.editor.moveCursor(QTextCursor.MoveOperation.End)
+        notepad.onCursorPositionChanged()
+
+    def setupFind():
+        # Search the last marker, near the end of the document
+        dialog = notepad.findDialog()
+        dialog.find_text.setText(MARKER)
+        moveToBlock(max(0, lines - 1000))
+
+    def setupReplace():
+        dialog = notepad.replaceDialog()
+        dialog.find_text.setText(MARKER)
+        dialog.replace_text.setText(MARKER.lower())
+
+    def waitForRelayout():
+        # Zoom and wrap changes are laid out in event loop slices
+        while notepad.relayout.isRunning():
+            application().processEvents()
+
+    def waitForCompletionIndex():
+        # The index of the opened file is built on a worker thread
+        while notepad.completion.isBuilding():
+            application().processEvents()
+            time.sleep(0.01)
+
+    def zoom():
+        notepad.zoomIn()
+        waitForRelayout()
+        notepad.zoomOut()
+        waitForRelayout()
+
+    def wordWrap():
+        notepad.toggleWordWrap(False)
+        waitForRelayout()
+        notepad.toggleWordWrap(True)
+        waitForRelayout()
+
+    # The fold operations run on the same text with its lines nested under
+    # the markers, as YAML for the highlighter
+    nested_filename = os.path.join(workdir, 'nested.yaml')
+
+    def openNested():
+        # Generated and opened by the first fold operation that runs
+        if not os.path.exists(nested_filename):
+            generateDocument(nested_filename, os.path.getsize(filename), 80, nested=True)
+            notepad.loadFile(nested_filename)
+            waitForRelayout()
+
+    def setupFoldAll():
+        openNested()
+        notepad.unfoldAll()
+        waitForRelayout()
+
+    def foldAll():
+        notepad.foldAll()
+        waitForRelayout()
+
+    def setupFolded():
+        openNested()
+        if not notepad.folding.hasFolds():
+            foldAll()
+
+    def scroll():
+        scroll_bar = notepad.editor.verticalScrollBar()
+        for value in (scroll_bar.maximum() // 2, scroll_bar.maximum(), 0):
+            scroll_bar.setValue(value)
+            application().processEvents()
+
+    return {
+        'openFile': (None, lambda: notepad.loadFile(filename)),
+        'goTo': (lambda: moveToBlock(0), lambda: notepad.goToLine(lines // 2)),
+        'onCursorPositionChanged': (None, cursorAtEnd),
+        'findNext': (setupFind, lambda: notepad.findDialog().findNext()),
+        'suggestWords': (waitForCompletionIndex, lambda: notepad.completion.suggestions('d')),
+        'zoom': (None, zoom),
+        'wordWrap': (None, wordWrap),
+        'replaceAll': (setupReplace, lambda: notepad.replaceDialog().replaceAll()),
+        'save': (None, lambda: notepad.writeFile(filename)),
+        'saveAs': (None, lambda: notepad.writeFile(os.path.join(workdir, 'saved-as.txt'))),
+        'foldAll': (setupFoldAll, foldAll),
+        'scrollFolded': (setupFolded, scroll),
+        'zoomFolded': (setupFolded, zoom),
+    }
+
+def measure(setup: Callable | None, operation: Callable) -> dict:
+    """
+    Run an operation until the event loop is idle and measure it.
+
+    Args:
+        setup (Callable | None): Run before the measure.
+        operation (Callable): The measured operation.
+
+    Returns:
+        dict: The wall time in seconds and the peak resident memory in MB.
+    """
+    app = application()
+    if setup is not None:
+        setup()
+    app.processEvents()
+    resetPeakRss()
+    start = time.perf_counter()
+    operation()
+    app.processEvents()
+    seconds = time.perf_counter() - start
+    return {'seconds': round(seconds, 6), 'peak_rss_mb': round(peakRssMb(), 1)}
+
+def runCase(case: str, only: set[str] | None, repeat: int) -> list[dict]:
+    """
+    Generate the document of a case and benchmark each operation on it.
+    """
+    from src.app import Notepad
+
+    size, line_length = CASES[case]
+    results = []
+    with tempfile.TemporaryDirectory(prefix='notepad-bench-') as workdir:
+        filename = os.path.join(workdir, f'{case}.txt')
+        lines = generateDocument(filename, size, line_length)
+        notepad = Notepad()
+        notepad.resize(1024, 768)
+        notepad.show()
+        for name, (setup, operation) in _operations(notepad, filename, lines, workdir).items():
+            if only is not None and name not in only:
+                continue
+            runs = [measure(setup, operation) for _ in range(repeat)]
+            best = min(runs, key=lambda run: run['seconds'])
+            results.append({
+                'case': case,
+                'operation': name,
+                'bytes': size,
+                'lines': lines,
+                **best
+            })
+            print(f"{case:>12} {name:<24} {best['seconds']:>10.3f} s {best['peak_rss_mb']:>10.1f} MB", file=sys.stderr)
+        notepad.setWindowModified(False)
+        notepad.close()
+        notepad.deleteLater()
+        application().processEvents()
+    return results
+
+def main(argv: list[str]) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--cases', default=','.join(CASES), help=f"comma separated cases among {', '.join(CASES)}")
+    parser.add_argument('--operations', help='comma separated operations to run, all by default')
+    parser.add_argument('--repeat', type=int, default=1, help='runs of each operation, the fastest is kept')
+    parser.add_argument('--output', help='write the JSON results to this file instead of stdout')
+    parser.add_argument('--baseline', default=_baseline_file, help='stored results to compare with')
+    parser.add_argument('--threshold', type=float, default=0.2, help='allowed slowdown over the baseline, 0.2 is 20%%')
+    parser.add_argument('--save-baseline', action='store_true', help='store the results as the new baseline')
+    args = parser.parse_args(argv)
+
+    cases = args.cases.split(',')
+    for case in cases:
+        if case not in CASES:
+            parser.error(f'unknown case {case}')
+    only = set(args.operations.split(',')) if args.operations else None
+
+    application()
+    results = []
+    for case in cases:
+        results.extend(runCase(case, only, args.repeat))
+
+    payload = {
+        'benchmark': 'editor',
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'results': results
+    }
+    baseline = loadBaseline(args.baseline)
+    regressions = []
+    if baseline is not None:
+        regressions = compareBaseline(results, baseline, 'seconds', args.threshold)
+        payload['regressions'] = regressions
+    writeResults(args.output, payload)
+    if args.save_baseline:
+        writeResults(args.baseline, payload)
+    for regression in regressions:
+        print(
+            f"REGRESSION {regression['case']} {regression['operation']}: "
+            f"{regression['baseline']:.3f} s -> {regression['current']:.3f} s",
+            file=sys.stderr
+        )
+    return 1 if regressions else 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,226 @@
+"""
+Keystroke to paint latency of the Notepad editor
+
+Drives the editor headlessly with simulated key events at a steady rate on
+documents of increasing size. For each event it records the time from the
+key press until the editor viewport has been painted, then reports the
+p50, p95 and p99 latency of each scenario as JSON.
+
+The exit status is 1 when a p99 latency is over the budget or a p95 latency
+is slower than the stored baseline by more than the threshold, so the
+harness can gate changes to handlers like `onTextChanged` and
+`onCursorPositionChanged`.
+
+    python benchmarks/latency.py --sizes 0,1mb --events 100
+
+`tests/test_latency.py` runs each scenario briefly on a small document as
+part of the test suite, and checks the p99 against `NOTEPAD_LATENCY_BUDGET_MS`
+when it is set.
+"""
+
+__version__ = '0.1'
+__author__ = 'Victor M. Ortiz <Victor.M.Ortiz@outlook.com>'
+
+import argparse
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+from common import (
+    ROOT, application, generateDocument,
+    loadBaseline, compareBaseline, writeResults
+)
+from PyQt6.QtCore import QEvent, QObject, Qt
+from PyQt6.QtGui import QGuiApplication
+from PyQt6.QtTest import QTest
+
+_baseline_file = os.path.join(ROOT, 'benchmarks', 'latency-baseline.json')
+_sizes = {'0': 0, '100kb': 100 << 10, '1mb': 1 << 20, '10mb': 10 << 20}
+_scenarios = ('typing', 'arrows', 'paste', 'pagedown')
+# Give up waiting for a paint after this many seconds
+_paint_timeout = 5.0
+# Highest p99 latency allowed by default, in milliseconds
+BUDGET_MS = 50
+
+class _PaintWatcher(QObject):
+    """
+    Event filter that records when the watched widget is painted.
+    """
+
+    def __init__(self, parent: QObject = None):
+        super().__init__(parent)
+        self.painted = False
+
+    def eventFilter(self, obj: QObject, event: QEvent) -> bool:
+        if event.type() == QEvent.Type.Paint:
+            self.painted = True
+        return False
+
+def _keys(scenario: str, rng: random.Random):
+    """
+    Yields the key and modifier of each event of a scenario.
+    """
+    letters = [getattr(Qt.Key, f'Key_{c}') for c in 'ABCDEFGHIJKLMNOPQRSTUVWXYZ']
+    while True:
+        match scenario:
+            case 'typing':
+                roll = rng.random()
+                if roll < 0.15:
+                    yield Qt.Key.Key_Space, Qt.KeyboardModifier.NoModifier
+                elif roll < 0.18:
+                    yield Qt.Key.Key_Return, Qt.KeyboardModifier.NoModifier
+                elif roll < 0.22:
+                    yield Qt.Key.Key_Backspace, Qt.KeyboardModifier.NoModifier
+                else:
+                    yield rng.choice(letters), Qt.KeyboardModifier.NoModifier
+            case 'arrows':
+                yield rng.choice((
+                    Qt.Key.Key_Left, Qt.Key.Key_Right, Qt.Key.Key_Up, Qt.Key.Key_Down
+                )), Qt.KeyboardModifier.NoModifier
+            case 'paste':
+                yield Qt.Key.Key_V, Qt.KeyboardModifier.ControlModifier
+            case 'pagedown':
+                yield Qt.Key.Key_PageDown, Qt.KeyboardModifier.NoModifier
+
+def _percentile(values: list[float], percent: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(percent / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+def runScenario(notepad, scenario: str, events: int, interval: float, seed: int) -> list[float]:
+    """
+    Send the key events of a scenario and measure the latency of each one.
+
+    Returns:
+        list[float]: The latency of each event in milliseconds.
+    """
+    app = application()
+    editor = notepad.editor
+    viewport = editor.viewport()
+    watcher = _PaintWatcher(viewport)
+    viewport.installEventFilter(watcher)
+    rng = random.Random(seed)
+    latencies = []
+    keys = _keys(scenario, rng)
+    try:
+        for _ in range(events):
+            key, modifier = next(keys)
+            watcher.painted = False
+            start = time.perf_counter()
+            QTest.keyClick(editor, key, modifier)
+            while not watcher.painted and time.perf_counter() - start < _paint_timeout:
+                app.processEvents()
+            latencies.append((time.perf_counter() - start) * 1000)
+            # Keep a steady rate, letting idle time work run in between
+            while time.perf_counter() - start < interval:
+                app.processEvents()
+    finally:
+        viewport.removeEventFilter(watcher)
+        watcher.deleteLater()
+    return latencies
+
+def runSize(name: str, scenarios: list[str], events: int, interval: float) -> list[dict]:
+    """
+    Open a document of the given size and run each scenario on it.
+    """
+    from src.app import Notepad
+
+    results = []
+    with tempfile.TemporaryDirectory(prefix='notepad-latency-') as workdir:
+        notepad = Notepad()
+        notepad.resize(1024, 768)
+        notepad.show()
+        editor = notepad.editor
+        editor.setFocus()
+        if _sizes[name] > 0:
+            filename = os.path.join(workdir, f'{name}.txt')
+            generateDocument(filename, _sizes[name], 80)
+            notepad.loadFile(filename)
+        QGuiApplication.clipboard().setText('pasted text ' * 80 + '\n')
+
+        for index, scenario in enumerate(scenarios):
+            # Start each scenario in the middle of the document
+            cursor = editor.textCursor()
+            cursor.setPosition(editor.document().characterCount() // 2)
+            editor.setTextCursor(cursor)
+            latencies = runScenario(notepad, scenario, events, interval, seed=index)
+            result = {
+                'case': name,
+                'operation': scenario,
+                'events': len(latencies),
+                'p50_ms': round(statistics.median(latencies), 3),
+                'p95_ms': round(_percentile(latencies, 95), 3),
+                'p99_ms': round(_percentile(latencies, 99), 3),
+                'max_ms': round(max(latencies), 3)
+            }
+            results.append(result)
+            print(
+                f"{name:>8} {scenario:<10} p50 {result['p50_ms']:>8.2f} ms"
+                f"  p95 {result['p95_ms']:>8.2f} ms  p99 {result['p99_ms']:>8.2f} ms",
+                file=sys.stderr
+            )
+        notepad.setWindowModified(False)
+        notepad.close()
+        notepad.deleteLater()
+        application().processEvents()
+    return results
+
+def main(argv: list[str]) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--sizes', default=','.join(_sizes), help=f"comma separated document sizes among {', '.join(_sizes)}")
+    parser.add_argument('--scenarios', default=','.join(_scenarios), help=f"comma separated scenarios among {', '.join(_scenarios)}")
+    parser.add_argument('--events', type=int, default=200, help='key events sent in each scenario')
+    parser.add_argument('--interval-ms', type=float, default=50, help='time between key events, 50 ms is a fast typist')
+    parser.add_argument('--budget-ms', type=float, default=BUDGET_MS, help='highest p99 latency allowed')
+    parser.add_argument('--output', help='write the JSON results to this file instead of stdout')
+    parser.add_argument('--baseline', default=_baseline_file, help='stored results to compare with')
+    parser.add_argument('--threshold', type=float, default=0.2, help='allowed p95 slowdown over the baseline, 0.2 is 20%%')
+    parser.add_argument('--save-baseline', action='store_true', help='store the results as the new baseline')
+    args = parser.parse_args(argv)
+
+    sizes = args.sizes.split(',')
+    scenarios = args.scenarios.split(',')
+    for size in sizes:
+        if size not in _sizes:
+            parser.error(f'unknown size {size}')
+    for scenario in scenarios:
+        if scenario not in _scenarios:
+            parser.error(f'unknown scenario {scenario}')
+
+    application()
+    results = []
+    for size in sizes:
+        results.extend(runSize(size, scenarios, args.events, args.interval_ms / 1000))
+
+    payload = {
+        'benchmark': 'latency',
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'budget_ms': args.budget_ms,
+        'results': results
+    }
+    over_budget = [result for result in results if result['p99_ms'] > args.budget_ms]
+    payload['over_budget'] = over_budget
+    baseline = loadBaseline(args.baseline)
+    regressions = []
+    if baseline is not None:
+        regressions = compareBaseline(results, baseline, 'p95_ms', args.threshold)
+        payload['regressions'] = regressions
+    writeResults(args.output, payload)
+    if args.save_baseline:
+        writeResults(args.baseline, payload)
+    for result in over_budget:
+        print(f"OVER BUDGET {result['case']} {result['operation']}: p99 {result['p99_ms']:.2f} ms", file=sys.stderr)
+    for regression in regressions:
+        print(
+            f"REGRESSION {regression['case']} {regression['operation']}: "
+            f"p95 {regression['baseline']:.2f} ms -> {regression['current']:.2f} ms",
+            file=sys.stderr
+        )
+    return 1 if over_budget or regressions else 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
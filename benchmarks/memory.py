@@ -0,0 +1,202 @@
+"""
+Memory use of the Notepad editor while opening, editing and saving
+
+Runs headless through the phases of a typical session on generated
+documents: open the file, a series of edits, replace all, repeated undo and
+redo, and save. For each phase it records the peak and the steady state
+memory, both as Python allocations traced by `tracemalloc`, which counts the
+`toPlainText()` copies, the undo history and other Python strings, and as
+process resident memory, which also counts the Qt document. Every value is
+also reported per MB of document.
+
+    python benchmarks/memory.py --cases 1mb,10mb
+"""
+
+__version__ = '0.1'
+__author__ = 'Victor M. Ortiz <Victor.M.Ortiz@outlook.com>'
+
+import argparse
+import gc
+import os
+import platform
+import random
+import sys
+import tempfile
+import tracemalloc
+from collections.abc import Callable
+from common import (
+    ROOT, CASES, MARKER, application, generateDocument,
+    resetPeakRss, peakRssMb, currentRssMb, loadBaseline, compareBaseline, writeResults
+)
+
+_baseline_file = os.path.join(ROOT, 'benchmarks', 'memory-baseline.json')
+_mb = 1 << 20
+# Edits made by the edit phase
+_typed_edits = 200
+_pasted_edits = 10
+_pasted_size = 64 << 10
+
+def _phases(notepad, filename: str, workdir: str, rounds: int) -> dict[str, Callable]:
+    """
+    Returns the measured phases in the order they run.
+    """
+    from PyQt6.QtGui import QTextCursor
+
+    editor = notepad.editor
+    document = editor.document()
+
+    def edit():
+        rng = random.Random(0)
+        cursor = QTextCursor(document)
+        pasted = ('pasted line of text ' * 4 + '\n') * (_pasted_size // 81)
+        for index in range(_typed_edits + _pasted_edits):
+            cursor.setPosition(rng.randrange(document.characterCount() - 1))
+            if index % ((_typed_edits + _pasted_edits) // _pasted_edits) == 0:
+                cursor.insertText(pasted)
+            else:
+                cursor.insertText('typed ')
+
+    def replaceAll():
+        dialog = notepad.replaceDialog()
+        dialog.find_text.setText(MARKER)
+        dialog.replace_text.setText(MARKER.lower())
+        dialog.replaceAll()
+
+    def undoRedo():
+        for _ in range(rounds):
+            # The document keeps no undo stack, the history of the window does
+            while notepad.history.undoCount():
+                notepad.undo()
+            while notepad.history.redoCount():
+                notepad.redo()
+
+    return {
+        'openFile': lambda: notepad.loadFile(filename),
+        'edit': edit,
+        'replaceAll': replaceAll,
+        'undoRedo': undoRedo,
+        'save': lambda: notepad.writeFile(os.path.join(workdir, 'saved.txt')),
+    }
+
+def measure(phase: Callable, start_rss: float) -> dict:
+    """
+    Run a phase until the event loop is idle and measure its memory.
+
+    Args:
+        phase (Callable): The measured phase.
+        start_rss (float): The resident memory in MB before the first phase.
+
+    Returns:
+        dict: The peak and steady state memory in MB.
+    """
+    app = application()
+    gc.collect()
+    app.processEvents()
+    traced_before = tracemalloc.get_traced_memory()[0]
+    rss_before = currentRssMb()
+    tracemalloc.reset_peak()
+    resetPeakRss()
+    phase()
+    app.processEvents()
+    traced_peak = tracemalloc.get_traced_memory()[1]
+    rss_peak = peakRssMb()
+    gc.collect()
+    traced_after = tracemalloc.get_traced_memory()[0]
+    rss_after = currentRssMb()
+    return {
+        # Growth over the memory in use when the phase started
+        'traced_peak_mb': (traced_peak - traced_before) / _mb,
+        'rss_peak_mb': rss_peak - rss_before,
+        # Memory still held after the phase, over the memory before the session
+        'traced_steady_mb': traced_after / _mb,
+        'rss_steady_mb': rss_after - start_rss,
+    }
+
+def runCase(case: str, rounds: int) -> list[dict]:
+    """
+    Generate the document of a case and measure each phase on it.
+    """
+    from src.app import Notepad
+
+    size, line_length = CASES[case]
+    document_mb = size / _mb
+    results = []
+    with tempfile.TemporaryDirectory(prefix='notepad-memory-') as workdir:
+        filename = os.path.join(workdir, f'{case}.txt')
+        generateDocument(filename, size, line_length)
+        notepad = Notepad()
+        notepad.resize(1024, 768)
+        notepad.show()
+        application().processEvents()
+        gc.collect()
+        tracemalloc.start()
+        start_rss = currentRssMb()
+        try:
+            for name, phase in _phases(notepad, filename, workdir, rounds).items():
+                values = measure(phase, start_rss)
+                result = {'case': case, 'operation': name, 'bytes': size}
+                for key, value in values.items():
+                    result[key] = round(value, 1)
+                    result[key.replace('_mb', '_per_mb')] = round(value / document_mb, 2)
+                results.append(result)
+                print(
+                    f"{case:>12} {name:<12} peak {result['rss_peak_mb']:>8.1f} MB rss"
+                    f" {result['traced_peak_mb']:>8.1f} MB traced"
+                    f"  steady {result['rss_steady_mb']:>8.1f} MB rss"
+                    f" {result['traced_steady_mb']:>8.1f} MB traced",
+                    file=sys.stderr
+                )
+        finally:
+            tracemalloc.stop()
+        notepad.setWindowModified(False)
+        notepad.close()
+        notepad.deleteLater()
+        application().processEvents()
+    return results
+
+def main(argv: list[str]) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--cases', default='1mb,10mb', help=f"comma separated cases among {', '.join(CASES)}")
+    parser.add_argument('--rounds', type=int, default=3, help='rounds of undoing and redoing every edit')
+    parser.add_argument('--output', help='write the JSON results to this file instead of stdout')
+    parser.add_argument('--baseline', default=_baseline_file, help='stored results to compare with')
+    parser.add_argument('--threshold', type=float, default=0.2, help='allowed peak memory increase over the baseline, 0.2 is 20%%')
+    parser.add_argument('--save-baseline', action='store_true', help='store the results as the new baseline')
+    args = parser.parse_args(argv)
+
+    cases = args.cases.split(',')
+    for case in cases:
+        if case not in CASES:
+            parser.error(f'unknown case {case}')
+    if currentRssMb() is None:
+        parser.error('resident memory is only measured on Linux')
+
+    application()
+    results = []
+    for case in cases:
+        results.extend(runCase(case, args.rounds))
+
+    payload = {
+        'benchmark': 'memory',
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'results': results
+    }
+    baseline = loadBaseline(args.baseline)
+    regressions = []
+    if baseline is not None:
+        regressions = compareBaseline(results, baseline, 'rss_peak_per_mb', args.threshold)
+        payload['regressions'] = regressions
+    writeResults(args.output, payload)
+    if args.save_baseline:
+        writeResults(args.baseline, payload)
+    for regression in regressions:
+        print(
+            f"REGRESSION {regression['case']} {regression['operation']}: "
+            f"{regression['baseline']:.2f} MB/MB -> {regression['current']:.2f} MB/MB",
+            file=sys.stderr
+        )
+    return 1 if regressions else 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
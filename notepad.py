@@ -1,13 +1,92 @@
 __version__ = '0.1'
 __author__ = 'Victor M. Ortiz <Victor.M.Ortiz@outlook.com>'
 
+import argparse
+import os
 import sys
-from PyQt6.QtWidgets import QApplication
-from src.app import Notepad
+
+def parseArguments(argv: list[str]) -> argparse.Namespace:
+    """
+    Parse the command line arguments.
+
+    Args:
+        argv (list[str]): The command line arguments, without the program name.
+
+    Returns:
+        argparse.Namespace: The parsed arguments.
+    """
+    parser = argparse.ArgumentParser(
+        prog = 'notepad',
+        description = 'A Windows Notepad clone built with Python and PyQt.'
+    )
+    parser.add_argument(
+        'files', nargs = '*', metavar = 'FILE',
+        help = 'files to open'
+    )
+    parser.add_argument(
+        '--new-instance', action = 'store_true',
+        help = 'start a new process instead of using a running Notepad'
+    )
+    parser.add_argument(
+        '--profile-startup', action = 'store_true',
+        help = 'print the time spent on each startup step until the first paint'
+    )
+    parser.add_argument(
+        '--trace', metavar = 'TRACE_FILE',
+        help = 'record editor operations and save them as a Chrome trace on exit'
+    )
+    return parser.parse_args(argv)
 
 # Main
 if __name__ == '__main__':
+    # Batch commands run without the GUI, before any Qt module is imported
+    from src.batch import COMMANDS
+    if sys.argv[1:2] and sys.argv[1] in COMMANDS:
+        from src.batch import main
+        sys.exit(main(sys.argv[1:]))
+
+    from src import startup
+    from src.instance import forwardFiles, InstanceServer
+    args = parseArguments(sys.argv[1:])
+    if args.profile_startup:
+        startup.enable()
+        startup.mark('core imports')
+    filenames = [os.path.abspath(filename) for filename in args.files]
+
+    # Hand the files over to a running instance and exit
+    if not args.new_instance and forwardFiles(filenames):
+        sys.exit(0)
+
+    from PyQt6.QtWidgets import QApplication
+    startup.mark('widgets imported')
+    from src.app import Notepad
+    from src.config import settings
+    from src import tracing
+    from src.watchdog import Watchdog
+    startup.mark('application imported')
+
+    if args.trace or settings().trace_enabled:
+        tracing.enable(settings().trace_buffer_size)
+
     app = QApplication(sys.argv)
+    startup.mark('application created')
     w = Notepad()
+    startup.mark('window created')
+    if not args.new_instance:
+        server = InstanceServer(app)
+        server.filesReceived.connect(
+            lambda files: w.openFiles(files) if files else w.newWindow()
+        )
+        server.start()
+    startup.watchFirstPaint(w.editor.viewport())
     w.show()
+    w.openFiles(filenames)
+    startup.mark('window shown')
+    if args.trace:
+        app.aboutToQuit.connect(lambda: tracing.dump(args.trace))
+
+    watchdog = Watchdog(app)
+    if settings().watchdog_enabled:
+        watchdog.start()
+    app.aboutToQuit.connect(watchdog.stop)
     app.exec()
@@ -4,65 +4,97 @@ __author__ = 'Victor M. Ortiz <Victor.M.Ortiz@outlook.com>'
 
 import os
 import datetime as dt
-import webbrowser
+from PyQt6.QtCore import Qt
 from PyQt6.QtGui import QTextOption, QTextCursor, QIcon
 from PyQt6.QtWidgets import (
-    QMainWindow, QTextEdit, 
-    QFileDialog, QMessageBox, 
-    QFontDialog, QInputDialog
+    QApplication, QMainWindow, 
+    QFileDialog, QMessageBox, QDialog,
+    QFontDialog, QInputDialog, QProgressDialog
 )
-from PyQt6.QtPrintSupport import QPrintDialog, QPageSetupDialog, QPrinter
-from .config import readConfig
+from .config import settings, configWatcher
+from .icons import icon
 from .logger import showError, logger
 from .translation import tr
-from .components import MenuBar, StatusBar
-from .dialogs import FindDialog, ReplaceDialog, AboutDialog
+from .components import MenuBar, StatusBar, LineNumbers, Editor
+from .dialogs import FindDialog, ReplaceDialog, AboutDialog, DiagnosticsDialog
+from .history import UndoHistory
+from .longlines import LongLines
+from .relayout import Relayout
+from .folding import Folding
+from .highlighter import Highlighter
+from .spelling import SpellChecker
+from .completion import WordCompleter
+from . import profiler
+from . import startup
+from . import tracing
+from .tracing import traced, documentSize
+
+# Secondary windows, kept alive until they are closed
+_windows = set()
+# Actions disabled while a print job runs, since they use the printer
+_print_actions = ('page-setup', 'print', 'export-pdf')
+# Pasted characters above which the text is laid out in slices
+_large_paste = 1 << 20
 
 class Notepad(QMainWindow):
     def __init__(self):
         super().__init__()
         
-        self._filename = readConfig('file-name')
-        if self._filename is None:
-            self._filename = 'Untitled'
-        self._zoom = readConfig('zoom-restore')
-        if self._zoom is None:
-            self._zoom = 100
-        self._zoom_factor = readConfig('zoom-factor')
-        if self._zoom_factor is None:
-            self._zoom_factor = 10
+        config = settings()
+        self._filename = config.file_name
+        self._zoom = config.zoom_restore
+        self._zoom_factor = config.zoom_factor
         self._line = 1
         self._col = 1
-        self._printer = QPrinter(QPrinter.PrinterMode.PrinterResolution)
+        # Created on first use, most sessions never print or search
+        self._printer = None
+        self._print_job = None
+        self._print_progress = None
+        self._find_dialog = None
+        self._replace_dialog = None
 
         self.setWindowTitle(self.getWindowTitle())
-        icon_filename = readConfig('window-icon')
-        if icon_filename is None:
-            self.setWindowIcon(QIcon.fromTheme(QIcon.ThemeIcon.DocumentNew))
-        else: 
-            self.setWindowIcon(QIcon(icon_filename))
-        self.setMenuBar(MenuBar(self))
+        self.setWindowIcon(self.getWindowIcon())
+        self.setMenuBar(MenuBar(self, self.menuSlots()))
+        self.menuBar().setActionsChecked(('record-trace',), tracing.isEnabled())
+        self.menuBar().setActionsChecked(('profiling',), profiler.isRunning())
+        startup.mark('menubar built')
  
-        self.editor = QTextEdit(self)
-        self.editor.setAcceptRichText(False)
+        self.editor = Editor(self)
         self.setCentralWidget(self.editor)
         self.editor.document().modificationChanged.connect(self.setWindowModified)
-        self.editor.undoAvailable.connect(self.menuBar().onUndoAvailable)
-        self.editor.redoAvailable.connect(self.menuBar().onRedoAvailable)
+        self.history = UndoHistory(self.editor)
+        self.history.undoAvailable.connect(self.menuBar().onUndoAvailable)
+        self.history.redoAvailable.connect(self.menuBar().onRedoAvailable)
+        self.editor.setHistory(self.history)
+        # After the history, which reads each change before the segments change
+        self.long_lines = LongLines(self.editor)
+        self.history.setLongLines(self.long_lines)
+        self.relayout = Relayout(self.editor)
+        self.folding = Folding(self.editor, self.long_lines, self.relayout)
+        self.relayout.setFolding(self.folding)
+        self.highlighter = Highlighter(self.editor, self.long_lines, self.folding)
+        self.spelling = SpellChecker(self.editor, self.long_lines, self.folding)
+        self.spelling.unavailable.connect(self.onSpellingUnavailable)
+        self.completion = WordCompleter(self.editor, self.history, self.long_lines)
+        self.line_numbers = LineNumbers(self.editor, self.long_lines, self.relayout, self.folding)
+        self.editor.setPasteHandler(self.pasteText)
         self.editor.copyAvailable.connect(self.menuBar().onCopyAvailable)
         self.editor.textChanged.connect(self.onTextChanged)
         self.editor.cursorPositionChanged.connect(self.onCursorPositionChanged)
+        self.relayout.finished.connect(self.onCursorPositionChanged)
         self.editor.setStyleSheet(
             "border: 1px solid lightgray; \
             selection-color: white; \
             selection-background-color: rgb(53, 126, 199);"
         )
+        startup.mark('editor built')
         self.setStatusBar(StatusBar(self))
+        startup.mark('status bar built')
 
-        self._find_dialog = FindDialog(self)
-        self._replace_dialog = ReplaceDialog(self)
+        configWatcher().settingsChanged.connect(self.onSettingsChanged)
 
-        logger.info(f"Notepad class initiated")
+        logger.info("Notepad class initiated")
 
     # File / New File
     def newFile(self):
@@ -87,14 +119,31 @@ class Notepad(QMainWindow):
         Create a new file by clearing the editor and resetting the window title and modification status.
         """
         self.editor.clear()
+        self.long_lines.clear()
+        self.history.clear()
+        self.highlighter.setFile(None)
+        self.spelling.setFile(None)
+        self.completion.clear()
         self.setWindowTitle(self.getWindowTitle())
         self.setWindowModified(False)
-        logger.info(f"New file created")
+        logger.info("New file created")
 
     # File / New Window
-    def newWindow(self):
-        # How to open a new instance of the application?
-        logger.info('New Window - To be implemented')
+    def newWindow(self) -> 'Notepad':
+        """
+        Create and show a new Notepad window in the same process.
+
+        Returns:
+            Notepad: The new window.
+        """
+        window = Notepad()
+        window.setAttribute(Qt.WidgetAttribute.WA_DeleteOnClose)
+        # Keep a reference until the window is closed
+        _windows.add(window)
+        window.destroyed.connect(lambda: _windows.discard(window))
+        window.show()
+        logger.info('New window created')
+        return window
 
     # File / Open...
     def open(self):
@@ -117,139 +166,223 @@ class Notepad(QMainWindow):
 
     def openFile(self):
         """
-        Open a file and load its content into the editor, handling various exceptions.
+        Show the open file dialog and load the selected file into the editor.
         """
+        config = settings()
         # User directory
-        user_dir = readConfig('file-dialog-directory')
-        if user_dir is None:
-            user_dir = '~'
-        dir = os.path.expanduser(user_dir)
-        # File filter
-        file_filter = readConfig('file-dialog-filters')
-        if file_filter is None:
-            file_filter = 'Text Documents(*.txt);;All Files(*.*)'
+        dir = os.path.expanduser(config.file_dialog_directory)
         # Show open file dialog
         filename, _ = QFileDialog.getOpenFileName(
             parent = self, 
             caption = tr('Open'), 
             directory = dir, 
-            filter = file_filter
+            filter = config.file_dialog_filters
         )
         if filename != '':
-            # Encoding
-            encoding = readConfig('file-encoding')
-            if encoding is None:
-                encoding = 'utf_8'
-            # Open file for reading
-            try:
-                text = open(filename, 'r', encoding=encoding).read()
-            except FileNotFoundError as e:
-                showError(f"File {filename} not found. {e}")
-            except PermissionError as e:
-                showError(f"Permission denied to open {filename}. {e}")
-            except UnicodeDecodeError as e:
-                showError(f"File encoding error while reading file {filename}. {e}")
-            except Exception as e:
-                showError(f"Error opening file {filename}. {e}")
-            else:
-                # Load file content on editor and reset modified flag
-                self._filename = filename
-                self.editor.setPlainText(text)
-                self.setWindowTitle(self.getWindowTitle())
-                self.setWindowModified(False)
-                logger.info(f"File {filename} opened")
+            self.loadFile(filename)
         else:
             logger.info("Open file dialog was cancelled by user")
 
+    @traced('Notepad.loadFile', size=documentSize)
+    def loadFile(self, filename: str) -> bool:
+        """
+        Load the content of a file into the editor, handling various exceptions.
+
+        Args:
+            filename (str): The path of the file to load.
+
+        Returns:
+            bool: True if the file was loaded, False otherwise.
+        """
+        # Open file for reading
+        try:
+            text = open(filename, 'r', encoding=settings().file_encoding).read()
+        except FileNotFoundError as e:
+            showError(f"File {filename} not found. {e}")
+        except PermissionError as e:
+            showError(f"Permission denied to open {filename}. {e}")
+        except UnicodeDecodeError as e:
+            showError(f"File encoding error while reading file {filename}. {e}")
+        except Exception as e:
+            showError(f"Error opening file {filename}. {e}")
+        else:
+            # Load file content on editor and reset modified flag
+            self._filename = filename
+            if not self.long_lines.load(text):
+                self.editor.setPlainText(text)
+            self.history.setFile(filename, text)
+            self.highlighter.setFile(filename)
+            self.spelling.setFile(filename)
+            self.completion.setText(text)
+            self.setWindowTitle(self.getWindowTitle())
+            self.setWindowModified(False)
+            logger.info("File %s opened", filename)
+            return True
+        return False
+
+    def openFiles(self, filenames: list[str]):
+        """
+        Open files in this window if it is blank, otherwise in new windows.
+
+        Args:
+            filenames (list[str]): The paths of the files to open.
+        """
+        window = self
+        for filename in filenames:
+            if not window.isBlank():
+                window = window.newWindow()
+            window.loadFile(filename)
+        window.show()
+        window.raise_()
+        window.activateWindow()
+
     # File / Save
     def save(self):
         """
         Save the current file. If the file name matches the default, prompt the user to save as a new file.
         """
-        if self._filename == readConfig('file-name'):
+        if self._filename == settings().file_name:
             self.saveAs()
         else:
-            try:
-                with open(self._filename, 'w') as file:
-                    file.write(self.editor.toPlainText())
-            except FileNotFoundError as e:
-                showError(f"File {self._filename} not found. {e}")
-            except PermissionError as e:
-                showError(f"No write permission for file {self._filename}. {e}")
-            except UnicodeDecodeError as e:
-                showError(f"File encoding error while writting file {self._filename}. {e}")
-            except Exception as e:
-                showError(f"Error writting file {self._filename}. {e}")
-            else:
-                self.setWindowModified(False)
-                logger.info(f"File {self._filename} was saved")
+            self.writeFile(self._filename)
 
     # File / Save As...
     def saveAs(self):
         """
         Save the current file with a new name, prompting the user to choose the location and file name.
         """
-        # User directory
-        user_dir = readConfig('file-dialog-directory')
-        if user_dir is None:
-            user_dir = '~'
-        dir = os.path.expanduser(user_dir)
-        # File extension
-        file_extension = readConfig('file-extension')
-        if file_extension is None:
-            file_extension = "*.txt"
-        dir += '/' + file_extension
-        # File filter
-        file_filter = readConfig('file-dialog-filters')
-        if file_filter is None:
-            file_filter = 'Text Documents(*.txt);;All Files(*.*)'
+        config = settings()
+        # User directory and file extension
+        dir = os.path.expanduser(config.file_dialog_directory)
+        dir += '/' + config.file_extension
         # File Save As dialog
         filename, _ = QFileDialog.getSaveFileName(
             parent = self, 
             caption = tr('Save As'), 
             directory = dir,
-            filter = file_filter
+            filter = config.file_dialog_filters
         )
         if filename != '':
-            # Encoding
-            encoding = readConfig('file-encoding')
-            if encoding is None:
-                encoding = 'utf_8'
-            # Write to file
-            try:
-                with open(filename, 'w', encoding=encoding) as file:
-                    file.write(self.editor.toPlainText())
-            except FileNotFoundError as e:
-                showError(f"File {filename} not found. {e}")
-            except PermissionError as e:
-                showError(f"No write permission for file {filename}. {e}")
-            except UnicodeDecodeError as e:
-                showError(f"File encoding error while writting file {filename}. {e}")
-            except Exception as e:
-                showError(f"Error writting file {filename}. {e}")
-            else:
-                self._filename = filename
-                self.setWindowTitle(self.getWindowTitle())
-                self.setWindowModified(False)
-                logger.info(f"File {filename} was saved")
+            self.writeFile(filename)
         else:
             logger.info("Save As file dialog was cancelled by user")
 
+    @traced('Notepad.writeFile', size=documentSize)
+    def writeFile(self, filename: str) -> bool:
+        """
+        Write the editor content to a file, handling various exceptions.
+
+        Args:
+            filename (str): The path of the file to write.
+
+        Returns:
+            bool: True if the file was written, False otherwise.
+        """
+        text = self.long_lines.text()
+        try:
+            with open(filename, 'w', encoding=settings().file_encoding) as file:
+                file.write(text)
+        except FileNotFoundError as e:
+            showError(f"File {filename} not found. {e}")
+        except PermissionError as e:
+            showError(f"No write permission for file {filename}. {e}")
+        except UnicodeEncodeError as e:
+            showError(f"File encoding error while writting file {filename}. {e}")
+        except Exception as e:
+            showError(f"Error writting file {filename}. {e}")
+        else:
+            if filename != self._filename:
+                self._filename = filename
+                self.setWindowTitle(self.getWindowTitle())
+                self.highlighter.setFile(filename)
+                self.spelling.setFile(filename)
+            self.setWindowModified(False)
+            self.history.persist(filename, text)
+            logger.info("File %s was saved", filename)
+            return True
+        return False
+
+    # File / Compare With...
+    def compareWith(self):
+        """
+        Compare the file as saved with a file selected by the user, in a
+        separate window. Without a saved file, both files are selected.
+        """
+        from .compare import CompareDialog
+        config = settings()
+        dir = os.path.expanduser(config.file_dialog_directory)
+        files = []
+        if self._filename != config.file_name and os.path.isfile(self._filename):
+            files.append(self._filename)
+        while len(files) < 2:
+            filename, _ = QFileDialog.getOpenFileName(
+                parent = self,
+                caption = tr('Compare With') if files else tr('Compare'),
+                directory = dir,
+                filter = config.file_dialog_filters
+            )
+            if filename == '':
+                logger.info("Compare file dialog was cancelled by user")
+                return
+            files.append(filename)
+        dialog = CompareDialog(self, files[0], files[1], self.relayout.baseFont())
+        dialog.show()
+
     # File / Page Setup...
     def showPageSetupDialog(self):
         """
         Creates and displays a page setup dialog in a PyQt application.
         """
-        dialog = QPageSetupDialog(self._printer, self)
-        reply = dialog.exec()
+        from PyQt6.QtPrintSupport import QPageSetupDialog
+        # The dialog sets the page layout of the printer when accepted
+        dialog = QPageSetupDialog(self.printer(), self)
+        if dialog.exec() == QDialog.DialogCode.Accepted:
+            logger.info("Page layout set to %s", self.printer().pageLayout().pageSize().name())
 
     # File / Print...
     def showPrintDialog(self):
         """
         Creates and displays a print dialog window in a PyQt application.
         """
-        dialog = QPrintDialog(self._printer, self)
-        reply = dialog.exec()
+        from PyQt6.QtPrintSupport import QAbstractPrintDialog, QPrintDialog, QPrinter
+        dialog = QPrintDialog(self.printer(), self)
+        dialog.setOption(
+            QAbstractPrintDialog.PrintDialogOption.PrintSelection,
+            self.editor.textCursor().hasSelection()
+        )
+        if dialog.exec() != QDialog.DialogCode.Accepted:
+            logger.info("Print dialog was cancelled by user")
+            return
+        if self.printer().printRange() == QPrinter.PrintRange.Selection:
+            cursor = self.editor.textCursor()
+            text = self.long_lines.trueText(cursor.selectionStart(), cursor.selectionEnd())
+        else:
+            text = self.long_lines.text()
+        self.startPrintJob(self.printer(), text, tr('Printing...'))
+
+    # File / Export as PDF...
+    def exportPdf(self):
+        """
+        Exports the document as a PDF file with the page layout of the printer.
+        """
+        from PyQt6.QtPrintSupport import QPrinter
+        name = os.path.splitext(os.path.basename(self._filename))[0]
+        directory = os.path.expanduser(settings().file_dialog_directory)
+        filename, _ = QFileDialog.getSaveFileName(
+            parent = self,
+            caption = tr('Export as PDF'),
+            directory = os.path.join(directory, name + '.pdf'),
+            filter = 'PDF Files(*.pdf);;All Files(*.*)'
+        )
+        if filename == '':
+            logger.info("Export as PDF dialog was cancelled by user")
+            return
+        printer = QPrinter(QPrinter.PrinterMode.HighResolution)
+        printer.setOutputFormat(QPrinter.OutputFormat.PdfFormat)
+        printer.setOutputFileName(filename)
+        printer.setPageLayout(self.printer().pageLayout())
+        printer.setDocName(name)
+        self.startPrintJob(printer, self.long_lines.text(), tr('Exporting as PDF...'))
 
     # File / Exit
     def exitApplication(self):
@@ -270,35 +403,35 @@ class Notepad(QMainWindow):
                     pass
         else:
             self.close()
-            logger.info(f"Application closed")
+            logger.info("Application closed")
 
     # Edit / Undo
     def undo(self):
         """
         Undoes the last operation.
         """
-        self.editor.undo()
+        self.history.undo()
 
     # Edit / Redo
     def redo(self):
         """
         Redoes the last operation.
         """
-        self.editor.redo()
+        self.history.redo()
 
     # Edit / Cut
     def cut(self):
         """
         Cuts the selected text in the editor.
         """
-        self.editor.cut()
+        self.long_lines.cut()
 
     # Edit / Copy
     def copy(self):
         """
         Copies the content from the editor.
         """
-        self.editor.copy()
+        self.long_lines.copy()
 
     # Edit / Paste
     def paste(self):
@@ -307,6 +440,48 @@ class Notepad(QMainWindow):
         """
         self.editor.paste()
 
+    def pasteText(self, text: str):
+        """
+        Replace the selection with a pasted plain text, as one undo entry.
+        A text over the `paste-warning-mb` setting is only pasted if the user
+        agrees, and a large text is laid out in slices after it is inserted.
+        The editor signals are held during the paste and emitted once.
+
+        Args:
+            text (str): The pasted text.
+        """
+        config = settings()
+        if 0 < config.paste_warning_mb << 20 < len(text):
+            reply = QMessageBox.question(
+                self,
+                config.app_name,
+                tr(f'The pasted text has {len(text) >> 20} MB. Do you want to paste it?')
+            )
+            if reply != QMessageBox.StandardButton.Yes:
+                logger.info("Paste of %s characters was cancelled by user", len(text))
+                return
+        cursor = self.editor.textCursor()
+        had_selection = cursor.hasSelection()
+        QApplication.setOverrideCursor(Qt.CursorShape.WaitCursor)
+        self.editor.blockSignals(True)
+        try:
+            # The cursor of the editor moves along, setting it again would
+            # lay out the text down to it right away
+            if len(text) > _large_paste:
+                self.relayout.editText(lambda: self.history.insertText(cursor, text))
+                logger.info("Pasted %s characters", len(text))
+            else:
+                self.history.insertText(cursor, text)
+                self.editor.ensureCursorVisible()
+        finally:
+            self.editor.blockSignals(False)
+            QApplication.restoreOverrideCursor()
+        if had_selection:
+            self.editor.copyAvailable.emit(False)
+            self.editor.selectionChanged.emit()
+        self.editor.textChanged.emit()
+        self.editor.cursorPositionChanged.emit()
+
     # Edit / Delete
     def delete(self):
         """
@@ -319,44 +494,52 @@ class Notepad(QMainWindow):
         """
         Displays a Find Dialog window
         """
-        self._find_dialog.find_text.setText(self.editor.textCursor().selectedText())
-        self._find_dialog.show()
+        dialog = self.findDialog()
+        dialog.find_text.setText(self.editor.textCursor().selectedText())
+        dialog.show()
 
     # Edit / Find Next
     def findNext(self):
         """
         Searches for the next occurrence of a specified text in an editor.
         """
-        self._find_dialog.findNext()
+        if self._find_dialog is None:
+            self.showFindDialog()
+        else:
+            self._find_dialog.findNext()
 
     # Edit / Find Previous
     def findPrevious(self) -> bool:
         """
         Searches for the previous occurrence of a specified text in an editor.
         """
-        self._find_dialog.findPrevious()
+        if self._find_dialog is None:
+            self.showFindDialog()
+        else:
+            self._find_dialog.findPrevious()
 
     # Edit / Replace
     def showReplaceDialog(self):
         """
         Creates and displays a replace text dialog window.
         """
-        self._replace_dialog.find_text.setText(self.editor.textCursor().selectedText())
-        self._replace_dialog.show()
+        dialog = self.replaceDialog()
+        dialog.find_text.setText(self.editor.textCursor().selectedText())
+        dialog.show()
 
     def replace(self):
         """
         Searches for a specified text in an editor and replaces it with 
         another text if found.
         """
-        self._replace_dialog.replace()
+        self.replaceDialog().replace()
 
     def replaceAll(self):
         """
         Searches for all instances of a specified text in an editor and replaces
         them with another.
         """
-        self._replace_dialog.replaceAll()
+        self.replaceDialog().replaceAll()
 
     # Edit / Go To
     def goTo(self):
@@ -371,18 +554,47 @@ class Notepad(QMainWindow):
             self._line
         )
         if accepted and line > 0:
+            self.goToLine(line)
+
+    @traced('Notepad.goToLine', size=documentSize)
+    def goToLine(self, line: int):
+        """
+        Moves the cursor to the start of a line in the editor.
+
+        Args:
+            line (int): The line number, counted from 1.
+        """
+        if self.long_lines.isActive():
+            cursor = self.editor.textCursor()
+            cursor.setPosition(self.long_lines.lineStart(line))
+            self.editor.setTextCursor(cursor)
+            logger.info("Moved cursor to line %s", line)
+            return
+        if (
+            self.editor.wordWrapMode() == QTextOption.WrapMode.NoWrap
+            or self.folding.hasFolds()
+        ):
+            # One line per block. Moving down would skip the folded blocks,
+            # which are unfolded once the cursor is in them
+            document = self.editor.document()
+            block = document.findBlockByNumber(min(line, document.blockCount()) - 1)
+            cursor = self.editor.textCursor()
+            cursor.setPosition(block.position())
+            self.editor.setTextCursor(cursor)
+            logger.info("Moved cursor to line %s", line)
+            return
+        self.editor.moveCursor(
+            QTextCursor.MoveOperation.Start
+        )
+        current_line = 1
+        while(current_line < line):
             self.editor.moveCursor(
-                QTextCursor.MoveOperation.Start
+                QTextCursor.MoveOperation.Down
             )
-            current_line = 1
-            while(current_line < line):
-                self.editor.moveCursor(
-                    QTextCursor.MoveOperation.Down
-                )
-                current_line += 1
-                if self.editor.textCursor().atEnd():
-                    break
-            logger.info(f"Moved cursor to line {line}")
+            current_line += 1
+            if self.editor.textCursor().atEnd():
+                break
+        logger.info("Moved cursor to line %s", line)
 
     # Edit / Select All
     def selectAll(self):
@@ -398,12 +610,16 @@ class Notepad(QMainWindow):
         datetime format.
         """
         now = dt.datetime.now()
-        format = readConfig('datetime-format')
-        if format is None:
-            format = '%I:%M %p %m/%d/%Y'
-        dateTime = now.strftime(format)
+        dateTime = now.strftime(settings().datetime_format)
         self.editor.insertPlainText(dateTime)
-        logger.info(f"Inserted date/time {dateTime}")
+        logger.info("Inserted date/time %s", dateTime)
+
+    # Edit / Complete Word
+    def completeWord(self):
+        """
+        Completes the word before the cursor with the words of the document.
+        """
+        self.completion.complete()
 
     # Format / Word Wrap
     def toggleWordWrap(self, enabled:bool):
@@ -414,11 +630,11 @@ class Notepad(QMainWindow):
             enabled (bool): determines whether word wrap should be enabled or disabled in the editor.
         """
         if enabled:
-            self.editor.setWordWrapMode(
+            self.relayout.setWordWrapMode(
                 QTextOption.WrapMode.WordWrap
             )
         else:
-            self.editor.setWordWrapMode(
+            self.relayout.setWordWrapMode(
                 QTextOption.WrapMode.NoWrap
             )
 
@@ -430,59 +646,71 @@ class Notepad(QMainWindow):
         dialog = QFontDialog(self)
         dialog.show()
 
+    # Format / Spell Check
+    def toggleSpellCheck(self, enabled: bool):
+        """
+        Turns spell checking of prose files on or off.
+
+        Args:
+            enabled (bool): determines whether misspelled words are underlined.
+        """
+        self.spelling.setEnabled(enabled)
+
+    def onSpellingUnavailable(self, message: str):
+        """
+        Unchecks spell checking when the dictionary cannot be loaded.
+
+        Args:
+            message (str): The error message.
+        """
+        self.menuBar().setActionsChecked(('spell-check',), False)
+        showError(message)
+
     # View / Zoom / Zoom In
+    @traced('Notepad.zoomIn', size=documentSize)
     def zoomIn(self):
         """
         Increases the zoom level by zoom factor units if the current zoom 
         level is less than the maximum allowed zoom level.
         """
-        # Maximum Zoom
-        zoom_max = readConfig('zoom-max')
-        if zoom_max is None:
-            zoom_max = 500
         # Zoom in until max zoom is reached
-        if (self._zoom < zoom_max):
-            self.editor.zoomIn()
+        if (self._zoom < settings().zoom_max):
             self._zoom += self._zoom_factor
+            self.relayout.setZoom(self._zoomSteps())
             self.statusBar().setZoom(self._zoom)
 
     # View / Zoom / Zoom Out
+    @traced('Notepad.zoomOut', size=documentSize)
     def zoomOut(self):
         """
         Decreases the zoom level by zoom factor if it is greater than the 
         minimum zoom level allowed.
         """
-        # Minimum Zoom
-        zoom_min = readConfig('zoom-min')
-        if zoom_min is None:
-            zoom_min = 10
         # Zoom out until min zoom is reached
-        if (self._zoom > zoom_min):
-            self.editor.zoomOut()
+        if (self._zoom > settings().zoom_min):
             self._zoom -= self._zoom_factor
+            self.relayout.setZoom(self._zoomSteps())
             self.statusBar().setZoom(self._zoom)
 
     # View / Zoom / Restore Default Zoom 
+    @traced('Notepad.restoreZoom', size=documentSize)
     def restoreZoom(self):
         """
         Adjusts the zoom level of an editor to a default value and updates the
         status bar accordingly.
         """
-        # Zoom restore
-        zoom_restore = readConfig('zoom-restore')
-        if zoom_restore is None:
-            zoom_restore = 100
-        # Calculate range to restore zoom
-        if (self._zoom < zoom_restore):
-            range = int((zoom_restore - self._zoom) / self._zoom_factor)
-            self.editor.zoomIn(range)
-        elif (self._zoom > zoom_restore):
-            range = int((self._zoom - zoom_restore) / self._zoom_factor)
-            self.editor.zoomOut(range)
-        # 
-        self._zoom = zoom_restore
+        # One relayout, however far the zoom level is from the default
+        self._zoom = settings().zoom_restore
+        self.relayout.setZoom(self._zoomSteps())
         self.statusBar().setZoom(self._zoom)
 
+    def _zoomSteps(self) -> int:
+        """
+        Returns the font size steps of the current zoom level from the
+        default zoom level.
+        """
+        return (self._zoom - settings().zoom_restore) // self._zoom_factor
+
     # View / Status Bar
     def toggleStatusBar(self, visible:bool):
         """
@@ -495,13 +723,124 @@ class Notepad(QMainWindow):
         """
         self.statusBar().setVisible(visible)
 
+    # View / Line Numbers
+    def toggleLineNumbers(self, visible:bool):
+        """
+        Toggles the line number gutter at the left of the editor based on
+        the boolean parameter `visible`.
+
+        Args:
+            visible (bool): Determines whether the line numbers should be
+                shown or hidden.
+        """
+        self.line_numbers.setShown(visible)
+
+    # View / Folding / Fold
+    def foldRegion(self):
+        """
+        Folds the region at the cursor, by indentation.
+        """
+        self.folding.fold(self.editor.textCursor().blockNumber())
+
+    # View / Folding / Unfold
+    def unfoldRegion(self):
+        """
+        Unfolds the folded region starting at the line of the cursor.
+        """
+        self.folding.unfold(self.editor.textCursor().blockNumber())
+
+    # View / Folding / Fold All
+    def foldAll(self):
+        """
+        Folds every region at the top level.
+        """
+        QApplication.setOverrideCursor(Qt.CursorShape.WaitCursor)
+        try:
+            self.folding.foldAll()
+        finally:
+            QApplication.restoreOverrideCursor()
+
+    # View / Folding / Unfold All
+    def unfoldAll(self):
+        """
+        Unfolds every folded region.
+        """
+        QApplication.setOverrideCursor(Qt.CursorShape.WaitCursor)
+        try:
+            self.folding.unfoldAll()
+        finally:
+            QApplication.restoreOverrideCursor()
+
     # Help / View Help
     def viewHelp(self):
         """
         Opens a web page with help about Notepad
         """
-        url = readConfig('help-view')
-        webbrowser.open(url)
+        import webbrowser
+        webbrowser.open(settings().help_view)
+
+    # Help / Record Trace
+    def toggleTracing(self, enabled: bool):
+        """
+        Starts or stops recording the duration of editor operations.
+
+        Args:
+            enabled (bool): Whether operations are recorded.
+        """
+        if enabled:
+            tracing.enable(settings().trace_buffer_size)
+        else:
+            tracing.disable()
+        for window in QApplication.topLevelWidgets():
+            if isinstance(window, Notepad):
+                window.menuBar().setActionsChecked(('record-trace',), enabled)
+        logger.info("Tracing %s", 'enabled' if enabled else 'disabled')
+
+    # Help / Export Trace...
+    def exportTrace(self):
+        """
+        Saves the recorded operations as a Chrome Trace Event JSON file.
+        """
+        filename, _ = QFileDialog.getSaveFileName(
+            parent = self,
+            caption = tr('Export Trace'),
+            directory = os.path.expanduser('~/notepad-trace.json'),
+            filter = 'Trace Files(*.json);;All Files(*.*)'
+        )
+        if filename == '':
+            logger.info("Export trace dialog was cancelled by user")
+            return
+        try:
+            count = tracing.dump(filename)
+        except Exception as e:
+            showError(f"Error writting trace file {filename}. {e}")
+        else:
+            logger.info("Exported %s trace events to %s", count, filename)
+
+    # Help / Profiling
+    def toggleProfiling(self, enabled: bool):
+        """
+        Starts profiling the application, or stops it and saves the
+        statistics in the profile directory.
+
+        Args:
+            enabled (bool): Whether the application is profiled.
+        """
+        if enabled:
+            profiler.start()
+        else:
+            try:
+                files = profiler.stop()
+            except Exception as e:
+                showError(f"Error writting profile statistics. {e}")
+            else:
+                if files is not None:
+                    self.statusBar().showMessage(
+                        tr('Profile saved to ') + files[1], 10000
+                    )
+        for window in QApplication.topLevelWidgets():
+            if isinstance(window, Notepad):
+                window.menuBar().setActionsChecked(('profiling',), enabled)
 
     # Help / About
     def about(self):
@@ -511,24 +850,182 @@ class Notepad(QMainWindow):
         dialog = AboutDialog(self)
         dialog.show()
 
+    # Help / Diagnostics...
+    def showDiagnostics(self):
+        """
+        Displays a DiagnosticsDialog window with the undo history memory use.
+        """
+        dialog = DiagnosticsDialog(self)
+        dialog.setAttribute(Qt.WidgetAttribute.WA_DeleteOnClose)
+        dialog.show()
+
     # HELPER FUNCTIONS    
+    def menuSlots(self) -> dict:
+        """
+        Returns the slots that can be bound to actions in the menubar 
+        configuration, by name.
+
+        Returns:
+            dict: The callable for each slot name.
+        """
+        return {
+            'newFile': self.newFile,
+            'newWindow': self.newWindow,
+            'open': self.open,
+            'save': self.save,
+            'saveAs': self.saveAs,
+            'compareWith': self.compareWith,
+            'showPageSetupDialog': self.showPageSetupDialog,
+            'showPrintDialog': self.showPrintDialog,
+            'exportPdf': self.exportPdf,
+            'exitApplication': self.exitApplication,
+            'undo': self.undo,
+            'redo': self.redo,
+            'cut': self.cut,
+            'copy': self.copy,
+            'paste': self.paste,
+            'delete': self.delete,
+            'showFindDialog': self.showFindDialog,
+            'findNext': self.findNext,
+            'findPrevious': self.findPrevious,
+            'showReplaceDialog': self.showReplaceDialog,
+            'goTo': self.goTo,
+            'selectAll': self.selectAll,
+            'insertDateTime': self.insertDateTime,
+            'completeWord': self.completeWord,
+            'toggleWordWrap': self.toggleWordWrap,
+            'showFontDialog': self.showFontDialog,
+            'toggleSpellCheck': self.toggleSpellCheck,
+            'zoomIn': self.zoomIn,
+            'zoomOut': self.zoomOut,
+            'restoreZoom': self.restoreZoom,
+            'toggleStatusBar': self.toggleStatusBar,
+            'toggleLineNumbers': self.toggleLineNumbers,
+            'foldRegion': self.foldRegion,
+            'unfoldRegion': self.unfoldRegion,
+            'foldAll': self.foldAll,
+            'unfoldAll': self.unfoldAll,
+            'viewHelp': self.viewHelp,
+            'toggleTracing': self.toggleTracing,
+            'exportTrace': self.exportTrace,
+            'toggleProfiling': self.toggleProfiling,
+            'showDiagnostics': self.showDiagnostics,
+            'about': self.about,
+        }
+
+    def printer(self):
+        """
+        Returns the printer shared by the page setup and print dialogs,
+        importing the print support module on first use.
+
+        Returns:
+            QPrinter: The application printer.
+        """
+        if self._printer is None:
+            from PyQt6.QtPrintSupport import QPrinter
+            self._printer = QPrinter(QPrinter.PrinterMode.PrinterResolution)
+        return self._printer
+
+    def startPrintJob(self, printer, text: str, label: str):
+        """
+        Prints a text in the background with a progress dialog that can
+        cancel it. The print actions are disabled until the job finishes.
+
+        Args:
+            printer (QPrinter): The printer or PDF printer to print to.
+            text (str): The text to print.
+            label (str): The text of the progress dialog.
+        """
+        from .printing import PrintJob
+        self._print_job = PrintJob(printer, text, self.relayout.baseFont(), self)
+        self._print_job.progress.connect(self.onPrintProgress)
+        self._print_job.finished.connect(self.onPrintJobFinished)
+        self._print_progress = QProgressDialog(label, tr('Cancel'), 0, 100, self)
+        self._print_progress.setWindowTitle(settings().app_name)
+        self._print_progress.setMinimumDuration(500)
+        self._print_progress.setAutoReset(False)
+        self._print_progress.canceled.connect(self._print_job.cancel)
+        self.menuBar().setActionsEnabled(_print_actions, False)
+        self._print_job.start()
+
+    def onPrintProgress(self, pages: int, percent: int):
+        """
+        Shows the progress of the print job.
+
+        Args:
+            pages (int): The number of pages printed so far.
+            percent (int): The percentage of the text printed.
+        """
+        self._print_progress.setValue(percent)
+        self.statusBar().showMessage(f"{tr('Pages printed:')} {pages}")
+
+    def onPrintJobFinished(self, pages: int, error: str):
+        """
+        Closes the progress dialog of the print job and enables the print
+        actions again.
+
+        Args:
+            pages (int): The number of pages printed.
+            error (str): The error message, empty if the job completed or
+                'cancelled' if it was cancelled.
+        """
+        self._print_progress.close()
+        self._print_progress.deleteLater()
+        self._print_job.deleteLater()
+        self._print_progress = None
+        self._print_job = None
+        self.menuBar().setActionsEnabled(_print_actions, True)
+        match error:
+            case '':
+                self.statusBar().showMessage(f"{tr('Pages printed:')} {pages}", 10000)
+            case 'cancelled':
+                self.statusBar().showMessage(tr('Printing cancelled'), 10000)
+            case _:
+                self.statusBar().clearMessage()
+                showError(f"Error printing file {self._filename}. {error}")
+
+    def findDialog(self) -> FindDialog:
+        """
+        Returns the Find dialog, creating it on first use.
+        """
+        if self._find_dialog is None:
+            self._find_dialog = FindDialog(self)
+        return self._find_dialog
+
+    def replaceDialog(self) -> ReplaceDialog:
+        """
+        Returns the Replace dialog, creating it on first use.
+        """
+        if self._replace_dialog is None:
+            self._replace_dialog = ReplaceDialog(self)
+        return self._replace_dialog
+
+    def isBlank(self) -> bool:
+        """
+        Checks if the window holds an untitled, unmodified and empty document.
+
+        Returns:
+            bool: True if the window can be reused to open a file.
+        """
+        return (
+            self._filename == settings().file_name
+            and not self.isWindowModified()
+            and self.editor.document().isEmpty()
+        )
+
     def unsavedFileDialog(self) -> QMessageBox.StandardButton:
         """
         Prompts the user to save changes to a file with options to save,
         discard changes, or cancel.
         """
         # Ask the user to save the file
+        config = settings()
         filename = tr(os.path.basename(self._filename))
         if filename == '':
-            filename = readConfig('file-name')
-            if filename is None:
-                filename = 'Untitled'
-        app_name = readConfig('app-name')
-        if app_name is None:
-            app_name = 'Notepad'
+            filename = config.file_name
         msgBox = QMessageBox(
             QMessageBox.Icon.NoIcon,
-            app_name, 
+            config.app_name, 
             tr(f'Do you want to save changes to {filename}?'),
             QMessageBox.StandardButton.Save
                 | QMessageBox.StandardButton.Discard
@@ -546,42 +1043,75 @@ class Notepad(QMainWindow):
             str: a formatted window title string based on the `filename` and 
                 application name stored in the class attributes. 
         """
+        config = settings()
         filename = self._filename
-        default_filename = readConfig('file-name')
-        if default_filename is None:
-            default_filename = 'Untitled'
-        if filename != default_filename:
+        if filename != config.file_name:
             filename = os.path.basename(self._filename)
 
-        title_template = readConfig('window-title')
-        if title_template is None:
-            title_template = '[*]{file} - {app}'
-
-        app_name = readConfig('app-name')
-        if app_name is None:
-            app_name = 'Notepad'
-
-        window_title = title_template.format(
+        window_title = config.window_title.format(
                 file = filename, 
-                app = app_name
+                app = config.app_name
         )
         return window_title
+
+    def getWindowIcon(self) -> QIcon:
+        """
+        Retrieves the window icon from the settings, or the theme icon for
+        new documents when no icon is configured.
+
+        Returns:
+            QIcon: The window icon.
+        """
+        icon_filename = settings().window_icon
+        if icon_filename is None:
+            return QIcon.fromTheme(QIcon.ThemeIcon.DocumentNew)
+        return icon(icon_filename)
     
     # EVENTS
+    def onSettingsChanged(self, changed: frozenset[str]):
+        """
+        Applies the settings changed in the configuration file while the
+        application is running.
+
+        Args:
+            changed (frozenset[str]): The names of the changed settings.
+        """
+        if changed & {'window_title', 'app_name'}:
+            self.setWindowTitle(self.getWindowTitle())
+        if 'window_icon' in changed:
+            self.setWindowIcon(self.getWindowIcon())
+        if changed & {'trace_enabled', 'trace_buffer_size'}:
+            self.toggleTracing(settings().trace_enabled)
+
     def onTextChanged(self):
         """
-        Calculates the length of text in a text editor and then calls a method 
-        in the menu bar with that length as an argument.
+        Checks if the document has any text and then calls a method in the
+        menu bar to enable or disable the actions that need text.
         """
-        length = len(self.editor.toPlainText())
-        self.menuBar().onTextChanged(length > 0)
+        self.menuBar().onTextChanged(not self.editor.document().isEmpty())
 
+    @traced('Notepad.onCursorPositionChanged', size=documentSize)
     def onCursorPositionChanged(self):
         """
         Calculates the current line and column position of the cursor
         in a text editor and updates the status bar with this information.
         """
         cursor = self.editor.textCursor()
+        if self.long_lines.isActive():
+            # Lines and columns of the true text, not of the segments
+            self._line, self._col = self.long_lines.position(cursor)
+            self.statusBar().setPosition(self._line, self._col)
+            return
+        if self.relayout.isRunning():
+            # Counting the lines above would lay them all out at once, the
+            # position is updated when the relayout finishes
+            return
+        if self.editor.wordWrapMode() == QTextOption.WrapMode.NoWrap:
+            # One line per block, no need to count them
+            self._line = cursor.blockNumber() + 1
+            self._col = cursor.positionInBlock() + 1
+            self.statusBar().setPosition(self._line, self._col)
+            return
         currentPosition = cursor.positionInBlock()
         cursor.movePosition(QTextCursor.MoveOperation.StartOfLine)
         startOfLine = cursor.positionInBlock()
@@ -594,7 +1124,8 @@ class Notepad(QMainWindow):
         block = cursor.block().previous()
 
         while(block.isValid()):
-            lines+=block.lineCount()
+            # Folded blocks are not laid out again, count them once at least
+            lines+=block.lineCount() or 1
             block = block.previous()
         self._line = lines
 
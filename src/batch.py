@@ -0,0 +1,422 @@
+"""
+Headless batch commands used by the Notepad application
+
+`python notepad.py <command> ...` runs one of the commands below over a list
+of files or glob patterns, without starting the GUI:
+
+    find PATTERN FILE...               count the matches in each file
+    replace PATTERN REPLACEMENT FILE...
+                                       replace the matches in each file
+    encoding --to ENCODING FILE...     convert the files to another encoding
+    line-ending --to {lf,crlf,cr} FILE...
+                                       convert the line endings of the files
+
+Find and replace follow the rules of the editor: the search ignores case
+unless `--match-case` is given, matches never span lines, and a literal
+replacement is inserted as is. `--regex` searches with a Python regular
+expression instead, and the replacement may refer to its groups. Files are
+read with the `file-encoding` setting unless `--encoding` is given.
+
+The files are processed in parallel in a pool of processes. Each file is
+streamed line by line, or in chunks for the conversions, so the memory
+used for a file is bounded by its longest line. A changed file is written
+to a temporary file next to it, which then replaces it, so a file is never
+left half written.
+
+One JSON object is printed per file as it is processed, followed by a
+summary object. The exit status is 0 on success, 1 when `find` found no
+match, and 2 when a file could not be processed.
+"""
+
+__all__ = ['COMMANDS', 'main']
+__version__ = '0.1'
+__author__ = 'Victor M. Ortiz <Victor.M.Ortiz@outlook.com>'
+
+import argparse
+import codecs
+import glob
+import json
+import os
+import re
+import shutil
+import sys
+import tempfile
+import time
+from collections.abc import Callable, Iterator
+
+COMMANDS = ('find', 'replace', 'encoding', 'line-ending')
+
+# Size of the chunks read by the conversions, in characters
+_chunk_size = 1 << 20
+_line_endings = {'lf': '\n', 'crlf': '\r\n', 'cr': '\r'}
+_line_ending_pattern = re.compile(r'\r\n|\r|\n')
+
+def _compile(pattern: str, regex: bool, match_case: bool) -> re.Pattern:
+    """
+    Returns the regular expression searching a pattern as the editor does.
+
+    Args:
+        pattern (str): The text or regular expression to find.
+        regex (bool): Whether the pattern is a regular expression.
+        match_case (bool): Whether the search is case sensitive.
+    """
+    flags = 0 if match_case else re.IGNORECASE
+    return re.compile(pattern if regex else re.escape(pattern), flags)
+
+def _replacer(replacement: str, regex: bool) -> str | Callable[[re.Match], str]:
+    """
+    Returns the replacement for `re.sub`, a literal one is inserted as is.
+    """
+    return replacement if regex else lambda match: replacement
+
+def _writeAtomically(filename: str, encoding: str, write: Callable) -> None:
+    """
+    Write a file through a temporary file in the same directory, which
+    replaces it once complete, keeping its permissions.
+
+    Args:
+        filename (str): The path of the file to replace.
+        encoding (str): The encoding of the new content.
+        write (Callable): Called with the temporary file to write the content.
+    """
+    directory = os.path.dirname(os.path.abspath(filename))
+    handle, temporary = tempfile.mkstemp(
+        prefix=f'.{os.path.basename(filename)}.', suffix='.tmp', dir=directory
+    )
+    try:
+        with open(handle, 'w', encoding=encoding, newline='') as file:
+            write(file)
+        shutil.copymode(filename, temporary)
+        os.replace(temporary, filename)
+    except BaseException:
+        os.remove(temporary)
+        raise
+
+def _chunks(file) -> Iterator[str]:
+    """
+    Yields the text of a file opened with `newline=''` in chunks, never
+    splitting a CRLF line ending.
+    """
+    while chunk := file.read(_chunk_size):
+        if chunk.endswith('\r'):
+            chunk += file.read(1)
+        yield chunk
+
+def _lineChunks(file) -> Iterator[str]:
+    """
+    Yields the text of a file opened with `newline=''` in chunks of whole lines.
+    """
+    while lines := file.readlines(_chunk_size):
+        yield ''.join(lines)
+
+def _find(filename: str, options: dict) -> dict:
+    """
+    Count the matches of a pattern in a file and list the lines they are on.
+    """
+    pattern = _compile(options['pattern'], options['regex'], options['match_case'])
+    limit = options['max_lines']
+    matches = 0
+    lines = []
+    truncated = False
+    with open(filename, 'r', encoding=options['encoding'], newline='') as file:
+        for number, line in enumerate(file, 1):
+            count = sum(1 for _ in pattern.finditer(line.rstrip('\r\n')))
+            if count:
+                matches += count
+                if len(lines) < limit:
+                    lines.append(number)
+                else:
+                    truncated = True
+    result = {'matches': matches, 'lines': lines}
+    if truncated:
+        result['truncated'] = True
+    return result
+
+def _replace(filename: str, options: dict) -> dict:
+    """
+    Replace the matches of a pattern in a file, keeping its line endings.
+    """
+    pattern = _compile(options['pattern'], options['regex'], options['match_case'])
+    replacement = _replacer(options['replacement'], options['regex'])
+    encoding = options['encoding']
+    # Matches never span lines. A literal text without line breaks cannot
+    # match one, so it is replaced in chunks of whole lines, a regular
+    # expression is applied to each line without its line ending.
+    by_line = options['regex'] or '\r' in options['pattern'] or '\n' in options['pattern']
+
+    def pieces(file) -> Iterator[tuple[str, str]]:
+        if not by_line:
+            for chunk in _lineChunks(file):
+                yield chunk, ''
+            return
+        for line in file:
+            text = line.rstrip('\r\n')
+            yield text, line[len(text):]
+
+    # A first pass finds whether the file changes at all, so unchanged
+    # files are never rewritten
+    with open(filename, 'r', encoding=encoding, newline='') as file:
+        if not any(pattern.search(text) for text, _ in pieces(file)):
+            return {'replacements': 0, 'changed': False}
+
+    replacements = 0
+    def write(output):
+        nonlocal replacements
+        with open(filename, 'r', encoding=encoding, newline='') as file:
+            for text, ending in pieces(file):
+                text, count = pattern.subn(replacement, text)
+                replacements += count
+                output.write(text + ending)
+    if options['dry_run']:
+        with open(os.devnull, 'w', encoding=encoding) as output:
+            write(output)
+    else:
+        _writeAtomically(filename, encoding, write)
+    return {'replacements': replacements, 'changed': True}
+
+def _convertEncoding(filename: str, options: dict) -> dict:
+    """
+    Convert a file from one encoding to another.
+    """
+    source, target = options['encoding'], options['to']
+    if _sameEncoding(source, target):
+        return {'changed': False}
+    def write(output):
+        with open(filename, 'r', encoding=source, newline='') as file:
+            for chunk in _chunks(file):
+                output.write(chunk)
+    if options['dry_run']:
+        # Still decodes and encodes everything, to report errors
+        with open(os.devnull, 'w', encoding=target) as output:
+            write(output)
+    else:
+        _writeAtomically(filename, target, write)
+    return {'changed': True, 'from': source, 'to': target}
+
+def _convertLineEndings(filename: str, options: dict) -> dict:
+    """
+    Convert the line endings of a file to LF, CRLF or CR.
+    """
+    encoding = options['encoding']
+    ending = _line_endings[options['to']]
+    # A first pass counts the line endings to convert
+    converted = 0
+    with open(filename, 'r', encoding=encoding, newline='') as file:
+        for chunk in _chunks(file):
+            crlf = chunk.count('\r\n')
+            counts = {'\r\n': crlf, '\r': chunk.count('\r') - crlf, '\n': chunk.count('\n') - crlf}
+            converted += sum(counts.values()) - counts[ending]
+    if not converted:
+        return {'line_endings': 0, 'changed': False}
+    def write(output):
+        with open(filename, 'r', encoding=encoding, newline='') as file:
+            for chunk in _chunks(file):
+                output.write(_line_ending_pattern.sub(ending, chunk))
+    if not options['dry_run']:
+        _writeAtomically(filename, encoding, write)
+    return {'line_endings': converted, 'changed': True}
+
+def _sameEncoding(first: str, second: str) -> bool:
+    """
+    Returns True if two encoding names are the same codec.
+    """
+    return codecs.lookup(first).name == codecs.lookup(second).name
+
+_handlers = {
+    'find': _find,
+    'replace': _replace,
+    'encoding': _convertEncoding,
+    'line-ending': _convertLineEndings,
+}
+
+def _processFile(task: tuple[str, str, dict]) -> dict:
+    """
+    Run a command on one file in a worker process.
+
+    Args:
+        task (tuple[str, str, dict]): The command, the file and the options.
+
+    Returns:
+        dict: The result of the command for the file, with an `error`
+            entry when the file could not be processed.
+    """
+    command, filename, options = task
+    result = {'file': filename}
+    try:
+        result.update(_handlers[command](filename, options))
+    except (OSError, UnicodeError, re.error, LookupError) as e:
+        result['error'] = f"{type(e).__name__}: {e}"
+    return result
+
+def _expandFiles(patterns: list[str]) -> list[str]:
+    """
+    Expand the glob patterns of a list of files, `**` matching any number of
+    directories. Names without wildcards are kept as given.
+
+    Args:
+        patterns (list[str]): The file names and glob patterns.
+
+    Returns:
+        list[str]: The file names, each one once, in the order given.
+    """
+    files = {}
+    for pattern in patterns:
+        if glob.has_magic(pattern):
+            for filename in sorted(glob.glob(pattern, recursive=True)):
+                if os.path.isfile(filename):
+                    files[filename] = None
+        else:
+            files[pattern] = None
+    return list(files)
+
+def _parseArguments(argv: list[str]) -> argparse.Namespace:
+    """
+    Parse the command line arguments of the batch commands.
+
+    Args:
+        argv (list[str]): The command and its arguments.
+
+    Returns:
+        argparse.Namespace: The parsed arguments.
+    """
+    # Read here, the GUI only needs the command names. The settings file is
+    # read without Qt, its errors leave the default encoding
+    from .settingsfile import Settings, readSettings
+    try:
+        default_encoding = readSettings().file_encoding
+    except (OSError, ValueError):
+        default_encoding = Settings.file_encoding
+    parser = argparse.ArgumentParser(
+        prog = 'notepad',
+        description = 'Find, replace and convert many files without starting the editor.'
+    )
+    commands = parser.add_subparsers(dest = 'command', required = True)
+
+    def addCommon(command: argparse.ArgumentParser, changes: bool = True):
+        command.add_argument(
+            'files', nargs = '+', metavar = 'FILE',
+            help = 'files or glob patterns, ** matches any number of directories'
+        )
+        command.add_argument(
+            '--encoding', default = default_encoding,
+            help = 'encoding of the files, the file-encoding setting by default'
+        )
+        command.add_argument(
+            '--jobs', type = int, default = os.cpu_count(),
+            help = 'number of worker processes, the number of CPUs by default'
+        )
+        if changes:
+            command.add_argument(
+                '--dry-run', action = 'store_true',
+                help = 'report the changes without writing the files'
+            )
+
+    def addSearch(command: argparse.ArgumentParser):
+        command.add_argument(
+            '--regex', action = 'store_true',
+            help = 'the pattern is a Python regular expression'
+        )
+        command.add_argument(
+            '--match-case', action = 'store_true',
+            help = 'match the case of the pattern'
+        )
+
+    find = commands.add_parser('find', help = 'count the matches of a pattern in each file')
+    find.add_argument('pattern', metavar = 'PATTERN', help = 'text to find')
+    addSearch(find)
+    find.add_argument(
+        '--max-lines', type = int, default = 1000,
+        help = 'most line numbers listed per file'
+    )
+    addCommon(find, changes = False)
+
+    replace = commands.add_parser('replace', help = 'replace the matches of a pattern in each file')
+    replace.add_argument('pattern', metavar = 'PATTERN', help = 'text to find')
+    replace.add_argument(
+        'replacement', metavar = 'REPLACEMENT',
+        help = 'text to replace with, may refer to the groups of a regular expression'
+    )
+    addSearch(replace)
+    addCommon(replace)
+
+    encoding = commands.add_parser('encoding', help = 'convert the files to another encoding')
+    encoding.add_argument('--to', required = True, help = 'the new encoding')
+    addCommon(encoding)
+
+    line_ending = commands.add_parser('line-ending', help = 'convert the line endings of the files')
+    line_ending.add_argument(
+        '--to', required = True, choices = tuple(_line_endings),
+        help = 'the new line ending'
+    )
+    addCommon(line_ending)
+    return parser.parse_args(argv)
+
+def _run(args: argparse.Namespace, output = sys.stdout) -> int:
+    """
+    Run a batch command and print a JSON line per file and a summary.
+
+    Args:
+        args (argparse.Namespace): The parsed arguments.
+        output: The text stream written to.
+
+    Returns:
+        int: The exit status.
+    """
+    from concurrent.futures import ProcessPoolExecutor
+    start = time.perf_counter()
+    options = {
+        key: value for key, value in vars(args).items()
+        if key not in ('command', 'files', 'jobs')
+    }
+    if args.command in ('find', 'replace'):
+        try:
+            _compile(args.pattern, args.regex, args.match_case)
+        except re.error as e:
+            print(json.dumps({'error': f"Invalid regular expression. {e}"}), file=output)
+            return 2
+    encodings = [args.encoding, args.to] if args.command == 'encoding' else [args.encoding]
+    for encoding in encodings:
+        try:
+            codecs.lookup(encoding)
+        except LookupError as e:
+            print(json.dumps({'error': f"Unknown encoding. {e}"}), file=output)
+            return 2
+    files = _expandFiles(args.files)
+    tasks = [(args.command, filename, options) for filename in files]
+
+    summary = {'command': args.command, 'files': len(files), 'changed': 0, 'errors': 0}
+    totals = {'find': 'matches', 'replace': 'replacements', 'line-ending': 'line_endings'}
+    total = totals.get(args.command)
+    if total is not None:
+        summary[total] = 0
+    with ProcessPoolExecutor(max_workers=max(args.jobs, 1)) as executor:
+        # Small files are sent in batches, results are printed in order
+        chunksize = max(1, len(tasks) // (max(args.jobs, 1) * 8))
+        for result in executor.map(_processFile, tasks, chunksize=chunksize):
+            print(json.dumps(result), file=output, flush=True)
+            if 'error' in result:
+                summary['errors'] += 1
+                continue
+            summary['changed'] += bool(result.get('changed'))
+            if total is not None:
+                summary[total] += result[total]
+    summary['seconds'] = round(time.perf_counter() - start, 3)
+    print(json.dumps({'summary': summary}), file=output, flush=True)
+
+    if summary['errors']:
+        return 2
+    if args.command == 'find' and not summary['matches']:
+        return 1
+    return 0
+
+def main(argv: list[str]) -> int:
+    """
+    Run the batch command of a command line.
+
+    Args:
+        argv (list[str]): The command and its arguments, without the program name.
+
+    Returns:
+        int: The exit status.
+    """
+    return _run(_parseArguments(argv))
@@ -0,0 +1,609 @@
+"""
+File comparison used in the Notepad application
+
+`CompareJob` compares two files in a worker thread. Both files are streamed
+once, keeping only a hash and the offset of each line, so the memory used
+grows with the number of lines, not with their length. The hashes are
+compared with a patience diff: the lines found exactly once on both sides
+anchor the longest common subsequence of such lines, the ranges between
+anchors are compared the same way, and the common lines at the ends of each
+range are matched directly. A range without unique lines is compared with
+`difflib` when it is small, and shown as changed otherwise. Line endings
+are not part of the hash, so CRLF and LF files with the same text are equal.
+
+`CompareDialog` shows the result side by side in a single scroll area, so
+both sides always scroll together. It is scrolled by rows and paints only
+the rows in view, reading their text from the files by offset.
+"""
+
+__all__ = ['Comparison', 'CompareJob', 'CompareDialog', 'diffHashes']
+__version__ = '0.1'
+__author__ = 'Victor M. Ortiz <Victor.M.Ortiz@outlook.com>'
+
+import bisect
+import difflib
+import os
+import threading
+import time
+from array import array
+from collections import Counter
+from collections.abc import Sequence
+from PyQt6.QtCore import QObject, QRect, Qt, pyqtSignal
+from PyQt6.QtGui import QColor, QFont, QKeySequence, QPainter, QPaintEvent, QResizeEvent, QShortcut
+from PyQt6.QtWidgets import (
+    QAbstractScrollArea, QDialog, QGridLayout, QLabel, QPushButton, QWidget
+)
+from .config import settings
+from .logger import logger
+from .translation import tr
+
+# Largest range without unique lines compared with difflib, in line pairs
+_fallback_limit = 1 << 22
+# Lines of text kept in memory by the view for each side
+_cache_size = 2000
+# Lines counted at a time, the GIL is held while counting
+_count_step = 1 << 16
+# Characters painted at most for each line
+_max_columns = 4096
+
+# Row backgrounds of the compare view
+_colors = {
+    'delete': QColor('#fbe3e4'),
+    'insert': QColor('#e1f5e1'),
+    'replace': QColor('#fff4d6'),
+    'filler': QColor('#f0f0f0'),
+}
+_number_color = QColor('#8a8a8a')
+_divider_color = QColor('#c8c8c8')
+
+def _hashFile(filename: str) -> tuple[array, array]:
+    """
+    Returns the hashes of the lines of a file without their line endings,
+    and the offset of each line followed by the size of the file.
+    """
+    hashes = array('q')
+    offsets = array('q')
+    position = 0
+    with open(filename, 'rb') as file:
+        for line in file:
+            hashes.append(hash(line.rstrip(b'\r\n')))
+            offsets.append(position)
+            position += len(line)
+    offsets.append(position)
+    return hashes, offsets
+
+def _count(values: Sequence[int]) -> Counter:
+    """
+    Returns the occurrences of each value, counted in steps so the GUI
+    thread is not blocked by a single long call.
+    """
+    counts = Counter()
+    for start in range(0, len(values), _count_step):
+        counts.update(values[start:start + _count_step])
+    return counts
+
+def _longestIncreasing(values: array) -> Sequence[int]:
+    """
+    Returns the indexes of the longest increasing subsequence of values, by
+    patience sorting.
+    """
+    if all(x < y for x, y in zip(values, values[1:])):
+        # Matched lines are rarely moved
+        return range(len(values))
+    tails = array('q')
+    tail_indexes = array('q')
+    previous = array('q', bytes(8 * len(values)))
+    for index, value in enumerate(values):
+        if not tails or value > tails[-1]:
+            pile = len(tails)
+        else:
+            pile = bisect.bisect_left(tails, value)
+        previous[index] = tail_indexes[pile - 1] if pile else -1
+        if pile == len(tails):
+            tails.append(value)
+            tail_indexes.append(index)
+        else:
+            tails[pile] = value
+            tail_indexes[pile] = index
+    sequence = []
+    index = tail_indexes[-1] if tail_indexes else -1
+    while index >= 0:
+        sequence.append(index)
+        index = previous[index]
+    sequence.reverse()
+    return sequence
+
+def _commonLength(a: Sequence[int], i: int, b: Sequence[int], j: int, limit: int,
+                  backward: bool = False) -> int:
+    """
+    Returns the number of equal items of a and b from i and j, or before i
+    and j when backward, up to limit. Slices are compared in growing steps,
+    so long equal stretches are skipped at the speed of the C comparison.
+    """
+    def equal(start: int, stop: int) -> bool:
+        if backward:
+            return a[i - stop:i - start] == b[j - stop:j - start]
+        return a[i + start:i + stop] == b[j + start:j + stop]
+
+    length = 0
+    step = 16
+    while length < limit:
+        stop = min(length + step, limit)
+        if not equal(length, stop):
+            # The first difference is in this step
+            while stop - length > 1:
+                middle = (length + stop) // 2
+                if equal(length, middle):
+                    length = middle
+                else:
+                    stop = middle
+            return length
+        length = stop
+        step *= 2
+    return length
+
+def _matchingBlocks(a: Sequence[int], b: Sequence[int]) -> list[tuple[int, int, int]]:
+    """
+    Returns the runs of lines matched between two sequences of hashes, in
+    order, as (start in a, start in b, length).
+    """
+    blocks: list[tuple[int, int, int]] = []
+
+    def emit(i: int, j: int, n: int):
+        if n <= 0:
+            return
+        if blocks:
+            last_i, last_j, last_n = blocks[-1]
+            if last_i + last_n == i and last_j + last_n == j:
+                blocks[-1] = (last_i, last_j, last_n + n)
+                return
+        blocks.append((i, j, n))
+
+    # Ranges to compare and runs to emit once the ranges before them are
+    # compared, the next one last
+    stack: list[tuple] = [('range', 0, len(a), 0, len(b))]
+    while stack:
+        item = stack.pop()
+        if item[0] == 'run':
+            emit(*item[1:])
+            continue
+        _, alo, ahi, blo, bhi = item
+
+        # Common lines at both ends
+        n = _commonLength(a, alo, b, blo, min(ahi - alo, bhi - blo))
+        emit(alo, blo, n)
+        alo += n
+        blo += n
+        n = _commonLength(a, ahi, b, bhi, min(ahi - alo, bhi - blo), backward=True)
+        ahi -= n
+        bhi -= n
+        if n:
+            stack.append(('run', ahi, bhi, n))
+        if alo == ahi or blo == bhi:
+            continue
+
+        # Lines found once on each side, in the order of a
+        counts = _count(b[blo:bhi])
+        unique_b = {h: j for j, h in enumerate(b[blo:bhi], blo) if counts[h] == 1}
+        del counts
+        counts = _count(a[alo:ahi])
+        anchors_a = array('q', (
+            i for i, h in enumerate(a[alo:ahi], alo) if counts[h] == 1 and h in unique_b
+        ))
+        anchors_b = array('q', (unique_b[a[i]] for i in anchors_a))
+        del counts, unique_b
+        if not anchors_a:
+            if (ahi - alo) * (bhi - blo) <= _fallback_limit:
+                matcher = difflib.SequenceMatcher(None, a[alo:ahi], b[blo:bhi], autojunk=False)
+                for i, j, n in reversed(matcher.get_matching_blocks()):
+                    stack.append(('run', alo + i, blo + j, n))
+            continue
+
+        increasing = _longestIncreasing(anchors_b)
+        if len(increasing) < len(anchors_a):
+            anchors_a = array('q', (anchors_a[index] for index in increasing))
+            anchors_b = array('q', (anchors_b[index] for index in increasing))
+
+        # Each anchor is extended over the equal lines after it, up to the
+        # next difference, and the anchors within are skipped. The ranges
+        # between these runs are left on the stack, the first one on top.
+        items = []
+        i0, j0 = alo, blo
+        index = 0
+        while index < len(anchors_a):
+            i, j = anchors_a[index], anchors_b[index]
+            if i0 < i or j0 < j:
+                items.append(('range', i0, i, j0, j))
+            n = _commonLength(a, i, b, j, min(ahi - i, bhi - j))
+            items.append(('run', i, j, n))
+            i0, j0 = i + n, j + n
+            index = bisect.bisect_left(anchors_a, i0, index + 1)
+        if i0 < ahi or j0 < bhi:
+            items.append(('range', i0, ahi, j0, bhi))
+        stack.extend(reversed(items))
+    return blocks
+
+def diffHashes(a: Sequence[int], b: Sequence[int]) -> list[tuple[str, int, int, int, int]]:
+    """
+    Compare two sequences of line hashes.
+
+    Args:
+        a (Sequence[int]): The hashes of the lines on the left.
+        b (Sequence[int]): The hashes of the lines on the right.
+
+    Returns:
+        list[tuple[str, int, int, int, int]]: The operations turning a into
+            b, as `difflib` opcodes: 'equal', 'replace', 'delete' or 'insert'
+            with the ranges of lines in a and b.
+    """
+    opcodes = []
+    i = j = 0
+    for start_a, start_b, n in _matchingBlocks(a, b) + [(len(a), len(b), 0)]:
+        if i < start_a and j < start_b:
+            opcodes.append(('replace', i, start_a, j, start_b))
+        elif i < start_a:
+            opcodes.append(('delete', i, start_a, j, j))
+        elif j < start_b:
+            opcodes.append(('insert', i, i, j, start_b))
+        if n:
+            opcodes.append(('equal', start_a, start_a + n, start_b, start_b + n))
+        i, j = start_a + n, start_b + n
+    return opcodes
+
+
+class Comparison:
+    """
+    The result of comparing two files, laid out as rows: an equal line is a
+    row with both sides, a changed range takes as many rows as its longest
+    side.
+    """
+
+    def __init__(self, left: str, right: str, left_offsets: array, right_offsets: array,
+                 opcodes: list[tuple[str, int, int, int, int]]):
+        """
+        Initialize the Comparison.
+
+        Args:
+            left (str): The path of the file on the left.
+            right (str): The path of the file on the right.
+            left_offsets (array): The offsets of the lines on the left,
+                followed by the size of the file.
+            right_offsets (array): The same for the file on the right.
+            opcodes (list): The operations from `diffHashes`.
+        """
+        self.files = (left, right)
+        self.offsets = (left_offsets, right_offsets)
+        self.opcodes = opcodes
+        # First row of each operation
+        self.row_starts = array('q')
+        rows = 0
+        for _, i1, i2, j1, j2 in opcodes:
+            self.row_starts.append(rows)
+            rows += max(i2 - i1, j2 - j1)
+        self.rows = rows
+        # Size in bytes of the longest line, a bound of its width
+        self.longest = max(
+            max((end - start for start, end in zip(offsets, offsets[1:])), default=0)
+            for offsets in self.offsets
+        )
+        self.changes = sum(1 for opcode in opcodes if opcode[0] != 'equal')
+        self.deleted = sum(i2 - i1 for tag, i1, i2, _, _ in opcodes if tag != 'equal')
+        self.inserted = sum(j2 - j1 for tag, _, _, j1, j2 in opcodes if tag != 'equal')
+
+    def lineCount(self, side: int) -> int:
+        """
+        Returns the number of lines of a side, 0 for the left, 1 for the right.
+        """
+        return len(self.offsets[side]) - 1
+
+    def row(self, row: int) -> tuple[str, int | None, int | None]:
+        """
+        Returns the operation of a row and the line shown on each side, or
+        None where the side has no line in that row.
+        """
+        index = bisect.bisect_right(self.row_starts, row) - 1
+        tag, i1, i2, j1, j2 = self.opcodes[index]
+        offset = row - self.row_starts[index]
+        left = i1 + offset if i1 + offset < i2 else None
+        right = j1 + offset if j1 + offset < j2 else None
+        return tag, left, right
+
+    def changeRows(self) -> list[int]:
+        """
+        Returns the first row of each change.
+        """
+        return [
+            self.row_starts[index] for index, opcode in enumerate(self.opcodes)
+            if opcode[0] != 'equal'
+        ]
+
+
+class CompareJob(QObject):
+    """
+    Compares two files in a worker thread.
+
+    The job must be created in the GUI thread, its signal is queued to it.
+    """
+
+    # Emitted with the Comparison, or with an error message
+    finished = pyqtSignal(object)
+
+    def __init__(self, left: str, right: str, parent: QObject = None):
+        """
+        Initialize the CompareJob.
+
+        Args:
+            left (str): The path of the file on the left.
+            right (str): The path of the file on the right.
+            parent (QObject): The parent object.
+        """
+        super().__init__(parent)
+        self._files = (left, right)
+        self._thread: threading.Thread | None = None
+
+    def start(self):
+        """
+        Start comparing in the worker thread.
+        """
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='CompareJob', daemon=True)
+            self._thread.start()
+
+    def wait(self, timeout: float | None = None) -> bool:
+        """
+        Wait for the worker thread to finish.
+
+        Returns:
+            bool: True if the worker thread finished.
+        """
+        if self._thread is not None:
+            self._thread.join(timeout)
+        return self._thread is None or not self._thread.is_alive()
+
+    def _run(self):
+        """
+        Hash both files and compare them in the worker thread.
+        """
+        start = time.perf_counter()
+        left, right = self._files
+        try:
+            left_hashes, left_offsets = _hashFile(left)
+            right_hashes, right_offsets = _hashFile(right)
+            hashed = time.perf_counter()
+            opcodes = diffHashes(left_hashes, right_hashes)
+            del left_hashes, right_hashes
+            comparison = Comparison(left, right, left_offsets, right_offsets, opcodes)
+        except OSError as e:
+            self.finished.emit(f"{e.strerror}: {e.filename}")
+            return
+        except Exception as e:
+            # E.g. out of memory on huge files, the dialog must still stop waiting
+            logger.exception("Comparing %s and %s failed", left, right)
+            self.finished.emit(f"Comparing {left} and {right} failed. {e!r}")
+            return
+        logger.info(
+            "Compared %s and %s lines in %.2f s (hashed in %.2f s), %s changes",
+            comparison.lineCount(0), comparison.lineCount(1),
+            time.perf_counter() - start, hashed - start, comparison.changes
+        )
+        self.finished.emit(comparison)
+
+
+class _CompareView(QAbstractScrollArea):
+    """
+    Both sides of a comparison, scrolled together by rows. Only the rows
+    in view are painted, and only their lines are read from the files.
+    """
+
+    _padding = 4
+
+    def __init__(self, parent: QWidget, font: QFont):
+        super().__init__(parent)
+        self._comparison: Comparison | None = None
+        self._files = [None, None]
+        # Decoded lines of each side by line number
+        self._cache: list[dict[int, str]] = [{}, {}]
+        self._encoding = settings().file_encoding
+        self.viewport().setFont(font)
+        self.setFont(font)
+        self.verticalScrollBar().setSingleStep(1)
+        self.verticalScrollBar().valueChanged.connect(self.viewport().update)
+        self.horizontalScrollBar().valueChanged.connect(self.viewport().update)
+
+    def setComparison(self, comparison: Comparison):
+        """
+        Show a comparison from its first row.
+        """
+        self.closeFiles()
+        self._comparison = comparison
+        self._files = [open(filename, 'rb') for filename in comparison.files]
+        self.horizontalScrollBar().setRange(0, min(comparison.longest, _max_columns))
+        self._updateScrollBar()
+        self.viewport().update()
+
+    def closeFiles(self):
+        """
+        Close the files of the comparison.
+        """
+        for file in self._files:
+            if file is not None:
+                file.close()
+        self._files = [None, None]
+        self._cache = [{}, {}]
+
+    def rowHeight(self) -> int:
+        return self.fontMetrics().lineSpacing()
+
+    def visibleRows(self) -> int:
+        return max(self.viewport().height() // self.rowHeight(), 1)
+
+    def scrollToRow(self, row: int):
+        """
+        Scroll a row near the top of the view.
+        """
+        self.verticalScrollBar().setValue(max(row - 3, 0))
+
+    def resizeEvent(self, event: QResizeEvent):
+        super().resizeEvent(event)
+        self._updateScrollBar()
+
+    def _updateScrollBar(self):
+        rows = self._comparison.rows if self._comparison is not None else 0
+        visible = self.visibleRows()
+        self.verticalScrollBar().setRange(0, max(rows - visible + 1, 0))
+        self.verticalScrollBar().setPageStep(visible)
+
+    def _line(self, side: int, number: int) -> str:
+        """
+        Returns the text of a line, read from its file on first use.
+        """
+        cache = self._cache[side]
+        text = cache.get(number)
+        if text is None:
+            if len(cache) >= _cache_size:
+                cache.clear()
+            offsets = self._comparison.offsets[side]
+            file = self._files[side]
+            file.seek(offsets[number])
+            data = file.read(min(offsets[number + 1] - offsets[number], _max_columns * 4))
+            text = data.decode(self._encoding, 'replace').rstrip('\r\n').expandtabs(4)
+            cache[number] = text
+        return text
+
+    def paintEvent(self, event: QPaintEvent):
+        """
+        Paint the rows in view, each side with its line numbers.
+        """
+        painter = QPainter(self.viewport())
+        comparison = self._comparison
+        if comparison is None:
+            return
+        metrics = self.fontMetrics()
+        height = self.rowHeight()
+        ascent = metrics.ascent()
+        width = self.viewport().width()
+        pane = width // 2
+        digits = len(str(max(comparison.lineCount(0), comparison.lineCount(1), 1)))
+        numbers = metrics.horizontalAdvance('9') * digits + 2 * self._padding
+        column = self.horizontalScrollBar().value()
+        first = self.verticalScrollBar().value()
+        last = min(first + self.visibleRows() + 1, comparison.rows)
+
+        for row in range(first, last):
+            y = (row - first) * height
+            tag, *lines = comparison.row(row)
+            for side, line in enumerate(lines):
+                left = side * pane
+                if line is None:
+                    if tag != 'equal':
+                        painter.fillRect(left, y, pane, height, _colors['filler'])
+                    continue
+                if tag != 'equal':
+                    color = _colors['replace'] if tag == 'replace' else _colors[tag]
+                    painter.fillRect(left, y, pane, height, color)
+                painter.setPen(_number_color)
+                number = str(line + 1)
+                painter.drawText(left + numbers - self._padding - metrics.horizontalAdvance(number), y + ascent, number)
+                painter.setPen(self.palette().text().color())
+                painter.save()
+                painter.setClipRect(QRect(left + numbers, y, pane - numbers, height))
+                text = self._line(side, line)[column:column + _max_columns]
+                painter.drawText(left + numbers, y + ascent, text)
+                painter.restore()
+        painter.setPen(_divider_color)
+        painter.drawLine(pane, 0, pane, self.viewport().height())
+
+
+class CompareDialog(QDialog):
+    """
+    Window comparing two files side by side, with the changes highlighted.
+    """
+
+    def __init__(self, parent: QWidget, left: str, right: str, font: QFont):
+        """
+        Initialize the CompareDialog and start comparing the files.
+
+        Args:
+            parent (QWidget): The parent widget.
+            left (str): The path of the file on the left.
+            right (str): The path of the file on the right.
+            font (QFont): The font of the text.
+        """
+        super().__init__(parent, Qt.WindowType.Window)
+        self.setAttribute(Qt.WidgetAttribute.WA_DeleteOnClose)
+        self.setWindowTitle(f"{tr('Compare')} - {os.path.basename(left)} / {os.path.basename(right)}")
+        self.resize(1000, 700)
+        self._change_rows: list[int] = []
+
+        self.left_label = QLabel(left, self)
+        self.right_label = QLabel(right, self)
+        self.summary_label = QLabel(tr('Comparing...'), self)
+        self.view = _CompareView(self, font)
+        self.previous_button = QPushButton(tr('&Previous Difference'), self)
+        self.next_button = QPushButton(tr('&Next Difference'), self)
+        self.previous_button.clicked.connect(self.previousDifference)
+        self.next_button.clicked.connect(self.nextDifference)
+        self.previous_button.setEnabled(False)
+        self.next_button.setEnabled(False)
+        QShortcut(QKeySequence('Shift+F7'), self, self.previousDifference)
+        QShortcut(QKeySequence('F7'), self, self.nextDifference)
+
+        grid = QGridLayout(self)
+        grid.addWidget(self.left_label, 0, 0, 1, 2)
+        grid.addWidget(self.right_label, 0, 2, 1, 2)
+        grid.addWidget(self.view, 1, 0, 1, 4)
+        grid.addWidget(self.summary_label, 2, 0, 1, 2)
+        grid.addWidget(self.previous_button, 2, 2)
+        grid.addWidget(self.next_button, 2, 3)
+        self.setLayout(grid)
+
+        # Not owned by the dialog, it may be closed before the job finishes
+        self._job = CompareJob(left, right)
+        self._job.finished.connect(self.onFinished)
+        self._job.start()
+
+    def onFinished(self, result: 'Comparison | str'):
+        """
+        Show the comparison, or the error that stopped it.
+        """
+        if isinstance(result, str):
+            self.summary_label.setText(f"{tr('The files could not be compared.')} {result}")
+            return
+        self.view.setComparison(result)
+        self._change_rows = result.changeRows()
+        if not self._change_rows:
+            self.summary_label.setText(tr('The files are identical'))
+            return
+        self.summary_label.setText(
+            f"{result.changes} {tr('differences')}: "
+            f"-{result.deleted} {tr('lines')}, +{result.inserted} {tr('lines')}"
+        )
+        self.previous_button.setEnabled(True)
+        self.next_button.setEnabled(True)
+        self.view.scrollToRow(self._change_rows[0])
+
+    def nextDifference(self):
+        """
+        Scroll to the first difference below the top of the view.
+        """
+        top = self.view.verticalScrollBar().value() + 3
+        index = bisect.bisect_right(self._change_rows, top)
+        if index < len(self._change_rows):
+            self.view.scrollToRow(self._change_rows[index])
+
+    def previousDifference(self):
+        """
+        Scroll to the last difference above the top of the view.
+        """
+        top = self.view.verticalScrollBar().value() + 3
+        index = bisect.bisect_left(self._change_rows, top) - 1
+        if index >= 0:
+            self.view.scrollToRow(self._change_rows[index])
+
+    def closeEvent(self, event):
+        """
+        Close the files, the comparison is dropped with the window.
+        """
+        self._job.finished.disconnect(self.onFinished)
+        self.view.closeFiles()
+        super().closeEvent(event)
@@ -0,0 +1,555 @@
+"""
+Word completion used in the Notepad application
+
+`WordIndex` counts the words of the document, identifiers and host names
+included, and finds the most frequent words starting with a prefix. The
+words are kept in a sorted list, so the words of a prefix are a range
+found by bisection, and the words added since are merged in by the
+thousand. When that range is too large to rank in full, the most frequent
+words of the document when the index was built are ranked along with the
+first words of the range. The memory of the index is capped by
+the `completion-memory-mb` setting, dropping the least frequent words.
+
+`WordCompleter` builds the index of an opened file on a worker thread, and
+then keeps it up to date from each change of the undo history: the words
+of the removed text, with the partial words around it, are counted out and
+those of the added text counted in. Large changes are counted on the
+worker thread, in order with the build. Ctrl+Space completes the word
+before the cursor from the index. Completion is off in long line mode.
+"""
+
+__all__ = ['WordIndex', 'WordCompleter']
+__version__ = '0.1'
+__author__ = 'Victor M. Ortiz <Victor.M.Ortiz@outlook.com>'
+
+import bisect
+import collections
+import heapq
+import queue
+import re
+import sys
+import threading
+import time
+from PyQt6.QtCore import QEvent, QObject, QStringListModel, Qt, pyqtSignal
+from PyQt6.QtGui import QTextCursor
+from PyQt6.QtWidgets import QCompleter, QTextEdit
+from .config import settings, configWatcher
+from .logger import logger
+
+# Words, with the dots and dashes of host names and keys
+_word = re.compile(r'\w(?:[\w.-]*\w)?')
+# Partial words around a change
+_head = re.compile(r'^[\w.-]*')
+_tail = re.compile(r'[\w.-]*$')
+# Approximate size of an entry without its word, in bytes
+_entry_overhead = 110
+# Words of a prefix ranked in full, beyond that only the first ones are
+_max_scan = 1000
+# Most frequent words ranked for any prefix
+_frequent_size = 4096
+# Words added since the sorted list was merged, searched one by one
+_max_new = 1024
+# Characters of a change counted on the GUI thread
+_max_inline = 1 << 16
+# Characters counted at a time when building
+_build_chunk = 1 << 20
+# Suggestions shown
+_max_suggestions = 10
+
+def _length(text: str) -> int:
+    """
+    Returns the length of a text in document positions, which count UTF-16
+    code units.
+    """
+    if text.isascii():
+        return len(text)
+    return len(text.encode('utf-16-le', 'surrogatepass')) // 2
+
+def _words(text: str, min_length: int) -> collections.Counter:
+    """
+    Returns the number of times each word of a text long enough to complete
+    appears in it.
+    """
+    counts = collections.Counter(_word.findall(text))
+    if min_length > 1:
+        for word in [word for word in counts if len(word) < min_length]:
+            del counts[word]
+    return counts
+
+def _wordSize(word: str) -> int:
+    """
+    Returns the approximate memory held by a word of the index in bytes.
+    """
+    return sys.getsizeof(word) + _entry_overhead
+
+def _dropLeastFrequent(counts: collections.Counter, size: int):
+    """
+    Drop the least frequent words of a count until it has at most a number
+    of words.
+    """
+    threshold = 1
+    while len(counts) > size:
+        for word in [word for word, count in counts.items() if count <= threshold]:
+            del counts[word]
+        threshold += 1
+
+
+class WordIndex:
+    """
+    Words of a document by frequency, searched by prefix.
+    """
+
+    def __init__(self, counts: dict[str, int] | None = None, budget: int = 32 << 20):
+        """
+        Initialize the WordIndex.
+
+        Args:
+            counts (dict[str, int] | None): The number of times each word
+                appears, taken over by the index.
+            budget (int): The memory allowed for the index in bytes.
+        """
+        self._counts: dict[str, int] = counts if counts is not None else {}
+        self._budget = budget
+        self._memory = sum(_wordSize(word) for word in self._counts)
+        # Sorted words, which may still hold words no longer counted, and
+        # the words added since it was sorted
+        self._sorted: list[str] = []
+        self._new: list[str] = []
+        self._stale = 0
+        self._frequent: list[str] = []
+        if self._memory > self._budget:
+            self._evict()
+        else:
+            self._sort()
+
+    @classmethod
+    def fromText(cls, text: str, min_length: int, budget: int) -> 'WordIndex':
+        """
+        Count the words of a text, a chunk of lines at a time, dropping the
+        least frequent words whenever the count is over budget.
+
+        Args:
+            text (str): The text.
+            min_length (int): The shortest word counted.
+            budget (int): The memory allowed for the index in bytes.
+
+        Returns:
+            WordIndex: The index of the text.
+        """
+        counts = collections.Counter()
+        start = 0
+        while start < len(text):
+            end = text.find('\n', start + _build_chunk)
+            end = len(text) if end < 0 else end + 1
+            counts.update(_words(text[start:end], min_length))
+            start = end
+            # Estimated from the number of words, the sizes are summed once
+            if len(counts) * (_entry_overhead + 64) > budget:
+                _dropLeastFrequent(counts, budget * 3 // 4 // (_entry_overhead + 64))
+        return cls(dict(counts), budget)
+
+    def __len__(self) -> int:
+        return len(self._counts)
+
+    def count(self, word: str) -> int:
+        """
+        Returns:
+            int: The number of times a word appears in the document.
+        """
+        return self._counts.get(word, 0)
+
+    def memoryUsage(self) -> int:
+        """
+        Returns:
+            int: The approximate memory held by the index in bytes.
+        """
+        return self._memory
+
+    def setBudget(self, budget: int):
+        """
+        Set the memory allowed for the index, dropping words if it is over.
+
+        Args:
+            budget (int): The memory allowed in bytes.
+        """
+        self._budget = budget
+        if self._memory > self._budget:
+            self._evict()
+
+    def update(self, removed: collections.Counter, added: collections.Counter):
+        """
+        Count the words of a change of the document.
+
+        Args:
+            removed (collections.Counter): The words of the removed text.
+            added (collections.Counter): The words of the added text.
+        """
+        counts = self._counts
+        delta = collections.Counter(added)
+        delta.subtract(removed)
+        for word, difference in delta.items():
+            if difference == 0:
+                continue
+            count = counts.get(word, 0) + difference
+            if count > 0:
+                if word not in counts:
+                    self._new.append(word)
+                    self._memory += _wordSize(word)
+                counts[word] = count
+            elif word in counts:
+                # Words dropped over budget may be removed again
+                del counts[word]
+                self._memory -= _wordSize(word)
+                self._stale += 1
+        if self._memory > self._budget:
+            self._evict()
+        elif len(self._new) > _max_new or self._stale > max(_max_new, len(self._sorted) // 2):
+            self._merge()
+
+    def suggest(self, prefix: str, limit: int = _max_suggestions) -> list[str]:
+        """
+        Returns the most frequent words starting with a prefix.
+
+        Args:
+            prefix (str): The start of the words, not suggested itself.
+            limit (int): The largest number of suggestions.
+
+        Returns:
+            list[str]: The suggestions, the most frequent first.
+        """
+        counts, words = self._counts, self._sorted
+        low = bisect.bisect_left(words, prefix)
+        high = bisect.bisect_left(words, prefix + '\U0010ffff', low)
+        if high - low <= _max_scan:
+            candidates = set(words[low:high])
+        else:
+            candidates = set(words[low:low + _max_scan])
+            first = bisect.bisect_left(self._frequent, prefix)
+            last = bisect.bisect_left(self._frequent, prefix + '\U0010ffff', first)
+            candidates.update(self._frequent[first:last])
+        candidates.update(word for word in self._new if word.startswith(prefix))
+        candidates.discard(prefix)
+        ranked = heapq.nsmallest(
+            limit,
+            (word for word in candidates if word in counts),
+            key=lambda word: (-counts[word], word)
+        )
+        return ranked
+
+    def _sort(self):
+        """
+        Sort all the words again and pick the most frequent ones.
+        """
+        self._sorted = sorted(self._counts)
+        self._new = []
+        self._stale = 0
+        self._frequent = sorted(heapq.nlargest(_frequent_size, self._counts, key=self._counts.__getitem__))
+
+    def _merge(self):
+        """
+        Merge the new words into the sorted list, leaving out the words no
+        longer counted.
+        """
+        counts = self._counts
+        words = [word for word in self._sorted if word in counts] if self._stale else self._sorted
+        new = []
+        for word in sorted(set(self._new)):
+            # A word removed and added again may still be in the list
+            index = bisect.bisect_left(words, word)
+            if word in counts and (index == len(words) or words[index] != word):
+                new.append(word)
+        # Sorting two sorted runs merges them in linear time
+        self._sorted = sorted(words + new)
+        self._new = []
+        self._stale = 0
+        if len(counts) <= _frequent_size * 16:
+            self._frequent = sorted(heapq.nlargest(_frequent_size, counts, key=counts.__getitem__))
+
+    def _evict(self):
+        """
+        Drop the least frequent words until the index is well under budget.
+        """
+        before = len(self._counts)
+        target = self._budget * 3 // 4
+        threshold = 1
+        while self._memory > target and self._counts:
+            for word in [word for word, count in self._counts.items() if count <= threshold]:
+                del self._counts[word]
+                self._memory -= _wordSize(word)
+            threshold += 1
+        self._sort()
+        logger.info(
+            "Dropped %s words from the completion index, over the budget of %s MB",
+            before - len(self._counts), self._budget >> 20
+        )
+
+
+class WordCompleter(QObject):
+    """
+    Completes the word before the cursor of an editor from the words of
+    its document.
+    """
+
+    # Emitted by the worker thread with the generation it built for and
+    # the index
+    _built = pyqtSignal(int, object)
+    # Emitted by the worker thread with the generation it counted for and
+    # the words of the removed and added texts of a change
+    _counted = pyqtSignal(int, object, object)
+    # Emitted by the worker thread with the generation a job failed for
+    _failed = pyqtSignal(int)
+
+    def __init__(self, editor: QTextEdit, history, long_lines):
+        """
+        Initialize the WordCompleter.
+
+        Args:
+            editor (QTextEdit): The editor showing the document.
+            history (UndoHistory): The undo history reporting the changes.
+            long_lines (LongLines): The long line mode of the editor, where
+                completion is off.
+        """
+        super().__init__(editor)
+        self._editor = editor
+        self._document = editor.document()
+        self._long_lines = long_lines
+        config = settings()
+        self._min_length = config.completion_min_length
+        self._index = WordIndex(budget=config.completion_memory_mb << 20)
+        # Bumped when the text is replaced, dropping older results
+        self._generation = 0
+        # Jobs sent to the worker thread and not done yet. Changes are
+        # counted inline only when there are none, to keep their order
+        self._jobs = 0
+        self._queue: queue.SimpleQueue = queue.SimpleQueue()
+        self._thread: threading.Thread | None = None
+        # Start of the completed prefix
+        self._position = 0
+        self._prefix = ''
+        self._model = QStringListModel(self)
+        self._completer = QCompleter(self._model, self)
+        self._completer.setWidget(editor)
+        self._completer.setCompletionMode(QCompleter.CompletionMode.UnfilteredPopupCompletion)
+        self._completer.setCaseSensitivity(Qt.CaseSensitivity.CaseSensitive)
+        self._completer.activated.connect(self.insertCompletion)
+        self._built.connect(self.onBuilt)
+        self._counted.connect(self.onCounted)
+        self._failed.connect(self.onFailed)
+        history.edited.connect(self.onEdited)
+        editor.installEventFilter(self)
+        configWatcher().settingsChanged.connect(self.onSettingsChanged)
+
+    def index(self) -> WordIndex:
+        """
+        Returns:
+            WordIndex: The index of the words of the document.
+        """
+        return self._index
+
+    def isBuilding(self) -> bool:
+        """
+        Returns:
+            bool: True while the worker thread has jobs for the document.
+        """
+        return self._jobs > 0
+
+    def clear(self):
+        """
+        Forget the words, e.g. for a new file.
+        """
+        self._generation += 1
+        self._jobs = 0
+        self._index = WordIndex(budget=settings().completion_memory_mb << 20)
+
+    def setText(self, text: str):
+        """
+        Build the index of a text that was just loaded, in the background.
+
+        Args:
+            text (str): The loaded text.
+        """
+        self.clear()
+        if self._long_lines.isActive():
+            return
+        self._submit(('build', text))
+
+    def suggestions(self, prefix: str) -> list[str]:
+        """
+        Returns the completions of a prefix, the most frequent first.
+
+        Args:
+            prefix (str): The start of the word.
+        """
+        if not prefix or self._long_lines.isActive():
+            return []
+        return self._index.suggest(prefix)
+
+    def complete(self):
+        """
+        Complete the word before the cursor. A single completion is inserted
+        at once, otherwise they are shown in a popup.
+        """
+        cursor = self._editor.textCursor()
+        if cursor.hasSelection():
+            return
+        start = QTextCursor(cursor)
+        start.movePosition(QTextCursor.MoveOperation.StartOfBlock, QTextCursor.MoveMode.KeepAnchor)
+        prefix = _tail.search(start.selectedText()).group().lstrip('.-')
+        suggestions = self.suggestions(prefix)
+        logger.debug("Completions of %r: %s", prefix, suggestions)
+        if not suggestions:
+            return
+        self._position = cursor.position() - _length(prefix)
+        self._prefix = prefix
+        if len(suggestions) == 1:
+            self.insertCompletion(suggestions[0])
+            return
+        self._model.setStringList(suggestions)
+        popup = self._completer.popup()
+        popup.setCurrentIndex(self._model.index(0, 0))
+        rect = self._editor.cursorRect()
+        rect.translate(self._editor.viewport().pos())
+        rect.setWidth(popup.sizeHintForColumn(0) + popup.verticalScrollBar().sizeHint().width())
+        self._completer.complete(rect)
+
+    def insertCompletion(self, word: str):
+        """
+        Replace the completed prefix with a word.
+
+        Args:
+            word (str): The chosen completion.
+        """
+        cursor = self._editor.textCursor()
+        cursor.setPosition(self._position)
+        cursor.setPosition(
+            self._position + _length(self._prefix),
+            QTextCursor.MoveMode.KeepAnchor
+        )
+        if cursor.selectedText() != self._prefix:
+            # The text changed since the popup was shown
+            return
+        cursor.insertText(word)
+        self._editor.setTextCursor(cursor)
+
+    def eventFilter(self, obj: QObject, event: QEvent) -> bool:
+        """
+        Leave the keys choosing a completion to the popup.
+        """
+        if event.type() == QEvent.Type.KeyPress and self._completer.popup().isVisible():
+            if event.key() in (
+                Qt.Key.Key_Enter, Qt.Key.Key_Return, Qt.Key.Key_Escape, Qt.Key.Key_Tab, Qt.Key.Key_Backtab
+            ):
+                event.ignore()
+                return True
+        return False
+
+    def onEdited(self, position: int, removed: str, added: str):
+        """
+        Count the words of a change, with the partial words around it.
+
+        Args:
+            position (int): The position of the change.
+            removed (str): The removed text.
+            added (str): The added text.
+        """
+        if self._long_lines.isActive():
+            return
+        cursor = QTextCursor(self._document)
+        cursor.setPosition(position)
+        cursor.movePosition(QTextCursor.MoveOperation.StartOfBlock, QTextCursor.MoveMode.KeepAnchor)
+        before = _tail.search(cursor.selectedText()).group()
+        cursor.setPosition(position + _length(added))
+        cursor.movePosition(QTextCursor.MoveOperation.EndOfBlock, QTextCursor.MoveMode.KeepAnchor)
+        after = _head.search(cursor.selectedText()).group()
+        removed = before + removed + after
+        added = before + added + after
+        if self._jobs == 0 and len(removed) + len(added) <= _max_inline:
+            self._index.update(_words(removed, self._min_length), _words(added, self._min_length))
+        else:
+            self._submit(('count', removed, added))
+
+    def onBuilt(self, generation: int, index: WordIndex):
+        """
+        Take the index built by the worker thread.
+        """
+        if generation != self._generation:
+            return
+        self._jobs -= 1
+        self._index = index
+
+    def onCounted(self, generation: int, removed: collections.Counter, added: collections.Counter):
+        """
+        Count in the words of a change counted by the worker thread.
+        """
+        if generation != self._generation:
+            return
+        self._jobs -= 1
+        self._index.update(removed, added)
+
+    def onFailed(self, generation: int):
+        """
+        Drop the jobs still queued after a job failed on the worker thread,
+        so the following changes are counted inline again. The index keeps
+        what it has counted and misses the dropped changes.
+        """
+        if generation != self._generation:
+            return
+        self._generation += 1
+        self._jobs = 0
+
+    def onSettingsChanged(self, changed: frozenset[str]):
+        """
+        Apply a new memory budget or shortest word.
+
+        Args:
+            changed (frozenset[str]): The names of the changed settings.
+        """
+        if 'completion_memory_mb' in changed:
+            self._index.setBudget(settings().completion_memory_mb << 20)
+        if 'completion_min_length' in changed:
+            self._min_length = settings().completion_min_length
+            self._generation += 1
+            self._jobs = 0
+            self._index = WordIndex(budget=settings().completion_memory_mb << 20)
+            if not self._long_lines.isActive():
+                self._submit(('build', self._long_lines.text()))
+
+    def _submit(self, job: tuple):
+        """
+        Send a job to the worker thread, starting it on first use.
+        """
+        config = settings()
+        self._jobs += 1
+        self._queue.put((self._generation, self._min_length, config.completion_memory_mb << 20, job))
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='WordCompleter', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        """
+        Build indexes and count the words of large changes, in the order the
+        GUI thread sent them.
+        """
+        while True:
+            generation, min_length, budget, job = self._queue.get()
+            try:
+                if job[0] == 'build':
+                    start = time.perf_counter()
+                    index = WordIndex.fromText(job[1], min_length, budget)
+                    logger.info(
+                        "Completion index of %s words built in %.2f s, %.1f MB",
+                        len(index), time.perf_counter() - start, index.memoryUsage() / (1 << 20)
+                    )
+                    self._built.emit(generation, index)
+                else:
+                    self._counted.emit(generation, _words(job[1], min_length), _words(job[2], min_length))
+            except RuntimeError:
+                # The editor was closed
+                return
+            except Exception:
+                # E.g. out of memory, the GUI thread must stop waiting for it
+                logger.exception("Completion job %s failed", job[0])
+                try:
+                    self._failed.emit(generation)
+                except RuntimeError:
+                    return
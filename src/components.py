@@ -1,59 +1,199 @@
 """Components used in the Notepad application
 
-The components defined in this module include `MenuBar` and `StatusBar`. 
+The components defined in this module include `MenuBar`, `StatusBar`,
+`LineNumbers` and `Editor`.
 The menu is configured with a `JSON` file which action slots are defined
 in the main application class named `Notepad`.
 """
 
-__all__ = ['MenuBar', 'StatusBar']
+__all__ = ['MenuBar', 'StatusBar', 'LineNumbers', 'Editor']
 __version__ = '0.1'
 __author__ = 'Victor M. Ortiz <Victor.M.Ortiz@outlook.com>'
 
 import codecs
 import json
+import marshal
 import os
-from PyQt6.QtCore import Qt
-from PyQt6.QtGui import QAction, QIcon
-from PyQt6.QtWidgets import QLabel, QMenu, QMenuBar, QStatusBar, QWidget
-from .config import readConfig
+from collections.abc import Callable
+from PyQt6.QtCore import QEvent, QMimeData, QObject, QPoint, QPointF, QRectF, Qt
+from PyQt6.QtGui import QAction, QColor, QContextMenuEvent, QMouseEvent, QPainter, QPaintEvent, QPolygonF
+from PyQt6.QtWidgets import QLabel, QMenu, QMenuBar, QStatusBar, QTextEdit, QWidget
+from .config import settings
+from .folding import Folding
+from .history import UndoHistory
+from .icons import icon
 from .logger import showError, logger
+from .longlines import LongLines
+from .relayout import Relayout
 
 # Configuration
-try:
-    _config_file = 'config/menubar.json'
-    with open(_config_file, 'r') as _menubar_config:
-        _menubar = json.load(_menubar_config)
-except FileNotFoundError as e:
-    showError(f"File {_config_file} not found. {e}")
-except PermissionError as e:
-    showError(f"Permission denied to open {_config_file}. {e}")
-except UnicodeDecodeError as e:
-    showError(f"File encoding error while reading file {_config_file}. {e}")
-except Exception as e:
-    showError(f"Error parsing JSON file {_config_file}. {e}")
+_config_file = 'config/menubar.json'
+_cache_file = 'cache/menubar.marshal'
+# Bump when the compiled layout changes to discard older caches
+_cache_format = 2
+
+def _compileNode(node_config) -> dict | None:
+    """
+    Validate a menubar configuration node and fill in its defaults.
+
+    Args:
+        node_config: The configuration of a menu, action or separator.
+
+    Returns:
+        dict | None: The compiled node, or None if the node is not supported.
+    """
+    match(node_config.get('type')):
+        case 'separator':
+            return {'type': 'separator'}
+        case 'menu':
+            children = [_compileNode(child) for child in node_config.get('children', [])]
+            return {
+                'type': 'menu',
+                'text': node_config.get('text', ''),
+                'icon': node_config.get('icon'),
+                'children': [child for child in children if child is not None]
+            }
+        case 'action':
+            if 'text' not in node_config:
+                showError('JSON key "text" is required for child type action in menubar configuration.')
+            if 'slot' not in node_config:
+                showError('JSON key "slot" is required for child type action in menubar configuration.')
+            return {
+                'type': 'action',
+                'id': node_config.get('id', node_config.get('slot')),
+                'text': node_config.get('text', ''),
+                'icon': node_config.get('icon'),
+                'shortcut': node_config.get('shortcut'),
+                'status-tip': node_config.get('status-tip'),
+                'slot': node_config.get('slot'),
+                'checkable': node_config.get('checkable', False),
+                'checked': node_config.get('checked', False)
+            }
+        case _:
+            logger.error("Unsupported child type %s in menu configuration", node_config.get('type'))
+            return None
+
+def _compileMenubar(menubar_config) -> dict:
+    """
+    Compile the menubar configuration into validated nodes with defaults.
+
+    Args:
+        menubar_config: The parsed menubar JSON.
+
+    Returns:
+        dict: The compiled menubar with its iconset and menus.
+    """
+    menus = [_compileNode(menu_config) for menu_config in menubar_config['menubar']]
+    return {
+        'iconset': menubar_config['iconset'],
+        'menubar': [menu for menu in menus if menu is not None]
+    }
+
+def loadMenubarConfig() -> dict | None:
+    """
+    Load the compiled menubar, recompiling the JSON configuration only when
+    its modification time or size changed since the cache was written.
+
+    Returns:
+        dict | None: The compiled menubar, or None if it could not be loaded.
+    """
+    try:
+        stat = os.stat(_config_file)
+    except OSError as e:
+        showError(f"File {_config_file} not found. {e}")
+        return None
+    key = (_cache_format, stat.st_mtime_ns, stat.st_size)
+    # Compiled cache
+    try:
+        with open(_cache_file, 'rb') as cache:
+            cached_key, compiled = marshal.load(cache)
+        if cached_key == key:
+            return compiled
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        logger.warning("Ignoring unreadable menubar cache %s. %s", _cache_file, e)
+    # JSON configuration
+    try:
+        with open(_config_file, 'r') as menubar_config:
+            compiled = _compileMenubar(json.load(menubar_config))
+    except FileNotFoundError as e:
+        showError(f"File {_config_file} not found. {e}")
+        return None
+    except PermissionError as e:
+        showError(f"Permission denied to open {_config_file}. {e}")
+        return None
+    except UnicodeDecodeError as e:
+        showError(f"File encoding error while reading file {_config_file}. {e}")
+        return None
+    except Exception as e:
+        showError(f"Error parsing JSON file {_config_file}. {e}")
+        return None
+    # Written through a temporary file of this process, so that a crash or
+    # another instance never leaves a truncated cache
+    temp_file = f'{_cache_file}.{os.getpid()}.tmp'
+    try:
+        os.makedirs(os.path.dirname(_cache_file), exist_ok=True)
+        with open(temp_file, 'wb') as cache:
+            marshal.dump((key, compiled), cache)
+        os.replace(temp_file, _cache_file)
+    except (OSError, ValueError) as e:
+        logger.warning("Menubar cache %s not written. %s", _cache_file, e)
+        try:
+            os.remove(temp_file)
+        except OSError:
+            pass
+    return compiled
+
+def _collectSlots(nodes) -> set[str]:
+    """
+    Collect the slot names used by the actions of the compiled nodes.
+    """
+    slots = set()
+    for node in nodes:
+        match(node['type']):
+            case 'action':
+                slots.add(node['slot'])
+            case 'menu':
+                slots |= _collectSlots(node['children'])
+    return slots
 
 class MenuBar(QMenuBar):
     """
     Custom menu bar to build menus and actions dynamically from a configuration.
+
+    Actions are connected through a table of slots provided by the parent
+    and can be looked up by their stable id. Icons are loaded the first
+    time the menu holding them is shown.
     """
 
-    def __init__(self, parent):
+    def __init__(self, parent, slots: dict[str, Callable]):
         """
         Initialize the MenuBar.
 
         Args:
             parent: The parent widget.
+            slots (dict[str, Callable]): The callables for each slot name
+                used in the configuration.
         """
         super().__init__(parent)
-        self._iconset = _menubar['iconset']
-        self.buildMenubar(_menubar['menubar'])
+        self._slots = slots
+        self._actions: dict[str, QAction] = {}
+        menubar = loadMenubarConfig()
+        if menubar is None:
+            return
+        self._iconset = menubar['iconset']
+        missing = _collectSlots(menubar['menubar']) - slots.keys()
+        if missing:
+            showError(f"Slots {', '.join(sorted(missing))} in menubar configuration are not defined.")
+        self.buildMenubar(menubar['menubar'])
 
     def buildMenubar(self, menubar_config):
         """
         Build the menubar from a configuration.
 
         Args:
-            menubar_config: The configuration for the menubar.
+            menubar_config: The compiled configuration for the menubar.
         """
         for menu_config in menubar_config:
             menu = self.buildMenu(self, menu_config)
@@ -65,16 +205,17 @@ class MenuBar(QMenuBar):
 
         Args:
             parent (QMenu | QMenuBar): The parent menu or menubar.
-            menu_config: The configuration for the menu.
+            menu_config: The compiled configuration for the menu.
 
         Returns:
             QMenu: The constructed menu.
         """
         menu = QMenu(parent)
         menu.setTitle(menu_config['text'])
-        # Optional menu icon
-        if 'icon' in menu_config:
-            menu.setIcon(QIcon(self._iconset + menu_config['icon']))
+
+        # Icons of the children, loaded when the menu is first shown
+        icons: list[tuple[QAction, str]] = []
+        menu.aboutToShow.connect(lambda: self.loadIcons(icons))
 
         for child_config in menu_config['children']:
             match(child_config['type']):
@@ -83,11 +224,13 @@ class MenuBar(QMenuBar):
                 case 'action':
                     action = self.buildAction(child_config)
                     menu.addAction(action)
+                    if child_config['icon'] is not None:
+                        icons.append((action, child_config['icon']))
                 case 'menu':
                     submenu = self.buildMenu(menu, child_config)
                     menu.addMenu(submenu)
-                case _:
-                    logger.error(f"Unsupported child type {child_config['type']} in menu configuration")
+                    if child_config['icon'] is not None:
+                        icons.append((submenu.menuAction(), child_config['icon']))
         return menu
 
     def buildAction(self, action_config) -> QAction:
@@ -95,32 +238,77 @@ class MenuBar(QMenuBar):
         Build an action from a configuration.
 
         Args:
-            action_config: The configuration for the action.
+            action_config: The compiled configuration for the action.
 
         Returns:
             QAction: The constructed action.
         """
         action = QAction(self)
-        if 'text' in action_config:
-            action.setText(action_config['text'])
-        else:
-            showError('JSON key "text" is required for child type action in menubar configuration.')
-        if 'icon' in action_config:
-            action.setIcon(QIcon(self._iconset + action_config['icon']))
-        if 'shortcut' in action_config:
+        action.setText(action_config['text'])
+        if action_config['shortcut']:
             action.setShortcut(action_config['shortcut'])
-        if 'status-tip' in action_config:
+        if action_config['status-tip']:
             action.setStatusTip(action_config['status-tip'])
-        if 'slot' in action_config:
-            action.triggered.connect(eval(f"self.parent().{action_config['slot']}"))
-        else:
-            showError('JSON key "slot" is required for child type action in menubar configuration.')
-        if 'checkable' in action_config:
-            action.setCheckable(action_config['checkable'])
-        if 'checked' in action_config:
-            action.setChecked(action_config['checked'])
-        return action    
+        slot = self._slots.get(action_config['slot'])
+        if slot is not None:
+            action.triggered.connect(slot)
+        action.setCheckable(action_config['checkable'])
+        action.setChecked(action_config['checked'])
+        if action_config['id'] is not None:
+            self._actions[action_config['id']] = action
+        return action
+
+    def loadIcons(self, icons: list[tuple[QAction, str]]):
+        """
+        Set the pending icons of a menu and forget them.
+
+        Args:
+            icons (list[tuple[QAction, str]]): The actions and their icon file names.
+        """
+        for action, icon_filename in icons:
+            action.setIcon(icon(self._iconset + icon_filename))
+        icons.clear()
+
+    def action(self, id: str) -> QAction | None:
+        """
+        Find an action by its id in the menubar configuration.
+
+        Args:
+            id (str): The action id.
+
+        Returns:
+            QAction | None: The action, or None if there is no action with that id.
+        """
+        return self._actions.get(id)
+
+    def setActionsEnabled(self, ids: tuple[str, ...], enabled: bool):
+        """
+        Enable or disable the actions with the given ids.
+
+        Args:
+            ids (tuple[str, ...]): The action ids.
+            enabled (bool): Whether the actions are enabled.
+        """
+        for id in ids:
+            action = self._actions.get(id)
+            if action is not None:
+                action.setEnabled(enabled)
         
+    def setActionsChecked(self, ids: tuple[str, ...], checked: bool):
+        """
+        Check or uncheck the actions with the given ids without triggering them.
+
+        Args:
+            ids (tuple[str, ...]): The action ids.
+            checked (bool): Whether the actions are checked.
+        """
+        for id in ids:
+            action = self._actions.get(id)
+            if action is not None:
+                action.blockSignals(True)
+                action.setChecked(checked)
+                action.blockSignals(False)
+
     def onUndoAvailable(self, available: bool):
         """
         Enable or disable the undo action based on availability.
@@ -128,17 +316,7 @@ class MenuBar(QMenuBar):
         Args:
             available (bool): Whether the undo action is available.
         """
-        try:
-            edit_menu: QMenu = self.actions()[1].menu()
-        except KeyError:
-            showError('Edit menu not found')
-        else:
-            try:
-                undo_action: QAction = edit_menu.actions()[0]
-            except KeyError:
-                showError('Undo action not found')
-            else:
-                undo_action.setEnabled(available)
+        self.setActionsEnabled(('undo',), available)
 
     def onRedoAvailable(self, available: bool):
         """
@@ -147,9 +325,7 @@ class MenuBar(QMenuBar):
         Args:
             available (bool): Whether the redo action is available.
         """
-        edit_menu: QMenu = self.actions()[1].menu()
-        redo_action: QAction = edit_menu.actions()[1]
-        redo_action.setEnabled(available)
+        self.setActionsEnabled(('redo',), available)
 
     def onCopyAvailable(self, textSelected: bool):
         """
@@ -158,15 +334,7 @@ class MenuBar(QMenuBar):
         Args:
             textSelected (bool): Whether text is selected.
         """
-        edit_menu: QMenu = self.actions()[1].menu()
-
-        cut_action: QAction = edit_menu.actions()[3]
-        copy_action: QAction = edit_menu.actions()[4]
-        del_action: QAction = edit_menu.actions()[6]
-
-        cut_action.setEnabled(textSelected)
-        copy_action.setEnabled(textSelected)
-        del_action.setEnabled(textSelected)
+        self.setActionsEnabled(('cut', 'copy', 'delete'), textSelected)
 
     def onTextChanged(self, hasText: bool):
         """
@@ -175,15 +343,7 @@ class MenuBar(QMenuBar):
         Args:
             hasText (bool): Whether there is text to find.
         """
-        edit_menu: QMenu = self.actions()[1].menu()
-
-        find_action: QAction = edit_menu.actions()[8]
-        find_next_action: QAction = edit_menu.actions()[9]
-        find_prev_action: QAction = edit_menu.actions()[10]
-
-        find_action.setEnabled(hasText) # Find
-        find_next_action.setEnabled(hasText) # Find Next
-        find_prev_action.setEnabled(hasText) # Find Previous
+        self.setActionsEnabled(('find', 'find-next', 'find-previous'), hasText)
 
 
 class StatusBar(QStatusBar):
@@ -261,13 +421,8 @@ class StatusBar(QStatusBar):
             ValueError: If the zoom level is not within the allowed range.
         """
         # zoom-min <= zoom <= zoom-max
-        zoom_min = readConfig('zoom-min')
-        if zoom_min is None:
-            zoom_min = 10
-        zoom_max = readConfig('zoom-max')
-        if zoom_max is None:
-            zoom_max = 500
-        if zoom_min <= zoom and zoom <= zoom_max:
+        config = settings()
+        if config.zoom_min <= zoom and zoom <= config.zoom_max:
             self._zoom_label.setText(f'{zoom}%')
         else:
             raise ValueError(zoom)
@@ -308,3 +463,292 @@ class StatusBar(QStatusBar):
             raise ValueError(encoding)
         else:
             self._encoding_label.setText(info.name.upper())
+
+# Colors of the line number gutter
+_gutter_color = QColor('#f3f3f3')
+_number_color = QColor('#8a8a8a')
+_current_color = QColor('#202020')
+
+class LineNumbers(QWidget):
+    """
+    Gutter at the left of the editor with the line number of each visible
+    block. Only the blocks in view are painted, and their numbers come from
+    the block numbers, less the virtual segments of the long line mode.
+    Folded regions are skipped as a whole, their first line is marked, and
+    clicking a number folds or unfolds the region there.
+    """
+
+    # Space around the numbers, in pixels
+    _padding = 6
+
+    def __init__(self, editor: QTextEdit, long_lines: LongLines, relayout: Relayout, folding: Folding):
+        """
+        Initialize the LineNumbers. The gutter is hidden until it is shown
+        with `setShown`.
+
+        Args:
+            editor (QTextEdit): The editor showing the document.
+            long_lines (LongLines): The virtual segments of the long lines.
+            relayout (Relayout): Lays out the wrapped text again when the
+                gutter changes the width of the viewport.
+            folding (Folding): The folded regions of the editor.
+        """
+        super().__init__(editor)
+        self._editor = editor
+        self._document = editor.document()
+        self._long_lines = long_lines
+        self._relayout = relayout
+        self._folding = folding
+        self._digits = 0
+        # Scroll position of the last paint and line of the cursor
+        self._offset = 0
+        self._current = 1
+        self.setVisible(False)
+
+        self._document.contentsChange.connect(self.onContentsChange)
+        self._document.documentLayout().update.connect(self.onLayoutUpdate)
+        editor.verticalScrollBar().valueChanged.connect(self.onScroll)
+        editor.cursorPositionChanged.connect(self.onCursorPositionChanged)
+        # Resize and font changes of the editor
+        editor.installEventFilter(self)
+
+    def setShown(self, shown: bool):
+        """
+        Show or hide the gutter, making room for it at the left of the editor.
+
+        Args:
+            shown (bool): True to show the gutter.
+        """
+        self.setVisible(shown)
+        # Paints its whole background, so scrolling moves its pixels. Set
+        # once shown, since the style sheet of the editor resets it
+        self.setAttribute(Qt.WidgetAttribute.WA_OpaquePaintEvent)
+        self._digits = 0
+        self._offset = self._editor.verticalScrollBar().value()
+        self._updateWidth()
+
+    def onContentsChange(self, position: int, removed: int, added: int):
+        """
+        Widen or narrow the gutter when the number of lines gains or loses
+        a digit.
+        """
+        if not self.isHidden():
+            self._updateWidth()
+
+    def onLayoutUpdate(self, rect: QRectF):
+        """
+        Repaint the part of the gutter next to the text laid out again.
+
+        Args:
+            rect (QRectF): The area to repaint, in document coordinates.
+        """
+        if self.isHidden():
+            return
+        top = max(rect.top() - self._offset, 0)
+        bottom = min(rect.bottom() - self._offset, self.height())
+        if top <= bottom:
+            self.update(0, int(top), self.width(), int(bottom - top) + 2)
+
+    def onScroll(self, value: int):
+        """
+        Move the numbers painted with the text, only the numbers scrolled
+        into view are painted.
+
+        Args:
+            value (int): The new position of the vertical scroll bar.
+        """
+        dy = self._offset - value
+        self._offset = value
+        if self.isHidden():
+            return
+        if abs(dy) < self.height():
+            self.scroll(0, dy)
+        else:
+            self.update()
+
+    def onCursorPositionChanged(self):
+        """
+        Repaint the gutter when the cursor moves to another line.
+        """
+        if not self.isHidden():
+            line = self._long_lines.position(self._editor.textCursor())[0]
+            if line != self._current:
+                self._current = line
+                self.update()
+
+    def eventFilter(self, obj: QObject, event: QEvent) -> bool:
+        """
+        Follow the size of the editor and the size of its font.
+        """
+        match event.type():
+            case QEvent.Type.Resize:
+                self._updateGeometry()
+            case QEvent.Type.FontChange if not self.isHidden():
+                self._digits = 0
+                self._updateWidth()
+        return False
+
+    def mousePressEvent(self, event: QMouseEvent):
+        """
+        Fold or unfold the region at the clicked line.
+        """
+        if event.button() != Qt.MouseButton.LeftButton:
+            return
+        block = self._editor.cursorForPosition(QPoint(0, round(event.position().y()))).block()
+        if self._folding.toggle(block.blockNumber()):
+            self.update()
+
+    def _updateWidth(self):
+        """
+        Set the width of the gutter if the number of digits of the last line
+        changed.
+        """
+        if self.isHidden():
+            self._relayout.setViewportMargins(0, 0, 0, 0)
+            return
+        digits = max(len(str(self._long_lines.lineCount())), 2)
+        if digits == self._digits:
+            return
+        self._digits = digits
+        self.setFont(self._editor.font())
+        width = self.fontMetrics().horizontalAdvance('9') * digits + 2 * self._padding
+        self._relayout.setViewportMargins(width, 0, 0, 0)
+        self._updateGeometry()
+
+    def _updateGeometry(self):
+        """
+        Place the gutter in the left margin of the editor viewport.
+        """
+        rect = self._editor.contentsRect()
+        self.setGeometry(rect.left(), rect.top(), self._editor.viewport().x() - rect.left(), rect.height())
+
+    def paintEvent(self, event: QPaintEvent):
+        """
+        Paint the numbers of the blocks in view, the current line darker.
+        """
+        painter = QPainter(self)
+        painter.fillRect(event.rect(), _gutter_color)
+        painter.setPen(_number_color)
+        metrics = self.fontMetrics()
+        ascent = metrics.ascent()
+        right = self.width() - self._padding
+        layout = self._document.documentLayout()
+        lineNumber = self._long_lines.lineNumber
+        offset = self._editor.verticalScrollBar().value()
+        bottom = event.rect().bottom()
+        current = self._current = self._long_lines.position(self._editor.textCursor())[0]
+        folded = self._folding.hasFolds()
+        block = self._editor.cursorForPosition(QPoint(0, event.rect().top())).block()
+        while block.isValid():
+            top = layout.blockBoundingRect(block).top() - offset
+            if top > bottom:
+                break
+            number = lineNumber(block.blockNumber())
+            if number is not None and block.isVisible():
+                text = str(number)
+                if number == current:
+                    painter.setPen(_current_color)
+                    painter.drawText(right - metrics.horizontalAdvance(text), round(top) + ascent, text)
+                    painter.setPen(_number_color)
+                else:
+                    painter.drawText(right - metrics.horizontalAdvance(text), round(top) + ascent, text)
+                if folded and self._folding.isFolded(block.blockNumber()):
+                    self._paintFoldMarker(painter, top + ascent / 2)
+            # The blocks of a folded region keep their last layout
+            block = self._folding.nextBlock(block)
+
+    def _paintFoldMarker(self, painter: QPainter, middle: float):
+        """
+        Paint a small triangle in the left padding, next to the number of
+        the first line of a folded region.
+        """
+        size = self._padding - 2
+        painter.save()
+        painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+        painter.setPen(Qt.PenStyle.NoPen)
+        painter.setBrush(_number_color)
+        painter.drawPolygon(QPolygonF([
+            QPointF(1, middle - size / 2),
+            QPointF(1 + size * 0.8, middle),
+            QPointF(1, middle + size / 2)
+        ]))
+        painter.restore()
+
+
+class Editor(QTextEdit):
+    """
+    Plain text editor handing the pasted and dropped text to a handler.
+
+    `QTextEdit` converts the data to a document fragment and inserts it in
+    one call. With a paste handler, the plain text of the data is passed
+    to it instead, with its line endings as in a loaded file. With an undo
+    history, the Undo and Redo of the context menu go to it.
+    """
+
+    def __init__(self, parent: QWidget = None):
+        """
+        Initialize the Editor.
+
+        Args:
+            parent (QWidget): The parent widget.
+        """
+        super().__init__(parent)
+        self.setAcceptRichText(False)
+        self._paste_handler: Callable[[str], None] | None = None
+        self._history: UndoHistory | None = None
+
+    def setHistory(self, history: UndoHistory | None):
+        """
+        Set the undo history offered by the context menu, None for the undo
+        stack of the document.
+        """
+        self._history = history
+
+    def createStandardContextMenu(self, position: QPoint | None = None) -> QMenu:
+        """
+        Returns the context menu of `QTextEdit`, with its Undo and Redo
+        going to the undo history.
+
+        Args:
+            position (QPoint | None): The position the menu is opened at.
+        """
+        if position is None:
+            menu = super().createStandardContextMenu()
+        else:
+            menu = super().createStandardContextMenu(position)
+        if self._history is not None:
+            for action in menu.actions():
+                if action.objectName() == 'edit-undo':
+                    action.triggered.disconnect()
+                    action.triggered.connect(self._history.undo)
+                    action.setEnabled(self._history.isUndoAvailable())
+                elif action.objectName() == 'edit-redo':
+                    action.triggered.disconnect()
+                    action.triggered.connect(self._history.redo)
+                    action.setEnabled(self._history.isRedoAvailable())
+        return menu
+
+    def contextMenuEvent(self, event: QContextMenuEvent):
+        """
+        Show the context menu built by `createStandardContextMenu`, which
+        `QTextEdit` does not call through Python.
+        """
+        menu = self.createStandardContextMenu(event.pos())
+        menu.exec(event.globalPos())
+        menu.deleteLater()
+
+    def setPasteHandler(self, handler: Callable[[str], None] | None):
+        """
+        Set the function inserting the pasted text at the cursor, None for
+        the default insertion.
+        """
+        self._paste_handler = handler
+
+    def insertFromMimeData(self, source: QMimeData):
+        """
+        Pass the plain text of the pasted or dropped data to the handler.
+        """
+        if self._paste_handler is None or not source.hasText():
+            super().insertFromMimeData(source)
+            return
+        self._paste_handler(source.text().replace('\r\n', '\n').replace('\r', '\n'))
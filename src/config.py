@@ -1,30 +1,101 @@
-__all__ = ['readConfig', 'config']
+"""
+Application settings used in the Notepad application
+
+The settings are read once from `config/app.json` into a frozen `Settings`
+object, validated against the field types and defaults declared in
+`settingsfile`. The current settings are returned by `settings()`, so
+reading a value on a hot path is a plain attribute access.
+
+`configWatcher()` reloads the file when it changes on disk and emits
+`settingsChanged` with the names of the fields whose value changed.
+"""
+
+__all__ = ['Settings', 'settings', 'loadSettings', 'configWatcher', 'ConfigWatcher']
 __version__ = '0.1'
 __author__ = 'Victor M. Ortiz <Victor.M.Ortiz@outlook.com>'
 
-import json
-from typing import Any 
+import os
+from PyQt6.QtCore import QFileSystemWatcher, QObject, pyqtSignal
 from .logger import showError, logger
+from .settingsfile import Settings, config_file, readSettings
+
+def loadSettings() -> Settings | None:
+    """
+    Read and validate the configuration file.
 
-# Configuration
-try:
-    config_file = 'config/app.json'
-    with open(config_file, 'r', encoding='utf-8') as app_config:
-        config = json.load(app_config)
-except FileNotFoundError as e:
-    showError(f"File {config_file} not found. {e}")
-except PermissionError as e:
-    showError(f"Permission denied to open {config_file}. {e}")
-except UnicodeDecodeError as e:
-    showError(f"File encoding error while reading file {config_file}. {e}")
-except Exception as e:
-    showError(f"Error parsing JSON file {config_file}. {e}")
-
-def readConfig(key) -> Any:
+    Returns:
+        Settings | None: The settings, or None if the file could not be read.
+    """
     try:
-        value = config[key]
-    except KeyError:
-        logger.warn(f"Configuration key {key} is missing in config {config_file}")
-        return None
-    else:
-        return value
\ No newline at end of file
+        return readSettings()
+    except FileNotFoundError as e:
+        showError(f"File {config_file} not found. {e}")
+    except PermissionError as e:
+        showError(f"Permission denied to open {config_file}. {e}")
+    except UnicodeDecodeError as e:
+        showError(f"File encoding error while reading file {config_file}. {e}")
+    except Exception as e:
+        showError(f"Error parsing JSON file {config_file}. {e}")
+    return None
+
+_settings = loadSettings() or Settings()
+
+def settings() -> Settings:
+    """
+    Returns:
+        Settings: The current application settings.
+    """
+    return _settings
+
+
+class ConfigWatcher(QObject):
+    """
+    Reloads the configuration file when it changes on disk.
+    """
+
+    # Names of the Settings fields whose value changed
+    settingsChanged = pyqtSignal(frozenset)
+
+    def __init__(self, parent: QObject = None):
+        """
+        Initialize the ConfigWatcher.
+
+        Args:
+            parent (QObject): The parent object.
+        """
+        super().__init__(parent)
+        self._watcher = QFileSystemWatcher([config_file], self)
+        self._watcher.fileChanged.connect(self.onFileChanged)
+
+    def onFileChanged(self, path: str):
+        """
+        Reload the settings and notify the fields that changed.
+
+        Args:
+            path (str): The path of the changed file.
+        """
+        global _settings
+        # Editors saving through a rename make the watcher drop the path
+        if path not in self._watcher.files() and os.path.exists(path):
+            self._watcher.addPath(path)
+        try:
+            new_settings = readSettings()
+        except Exception as e:
+            logger.warning("Configuration %s not reloaded. %s", config_file, e)
+            return
+        changed = _settings.changedFields(new_settings)
+        _settings = new_settings
+        if changed:
+            logger.info("Configuration reloaded, changed: %s", ', '.join(sorted(changed)))
+            self.settingsChanged.emit(changed)
+
+_watcher: ConfigWatcher | None = None
+
+def configWatcher() -> ConfigWatcher:
+    """
+    Returns the configuration watcher, creating it on first use.
+    """
+    global _watcher
+    if _watcher is None:
+        _watcher = ConfigWatcher()
+    return _watcher
@@ -2,39 +2,32 @@
 Dialog windows used in the Notepad application
 """
 
-__all__ = ['FindDialog', 'ReplaceDialog', 'AboutDialog']
+__all__ = ['FindDialog', 'ReplaceDialog', 'AboutDialog', 'DiagnosticsDialog']
 __version__ = '0.1'
 __author__ = 'Victor M. Ortiz <Victor.M.Ortiz@outlook.com>'
 
 import os
 import platform
 from PyQt6.QtCore import Qt
-from PyQt6.QtGui import QFont, QPixmap, QTextDocument, QTextCursor
+from PyQt6.QtGui import QFont, QTextDocument, QTextCursor
 from PyQt6.QtWidgets import (
     QDialog, QFrame, QLabel, QMessageBox,
     QLineEdit, QGroupBox, QRadioButton, 
     QCheckBox, QPushButton, QGridLayout, 
     QHBoxLayout, QSpacerItem, QSizePolicy
 )
-from .config import readConfig
+from .config import settings
+from .icons import pixmap
 from .logger import logger
+from .tracing import traced, documentSize
 from .translation import tr
 
-_families = readConfig('font-ui-families')
-if _families is None:
-    _families = 'Arial'
-_size = readConfig('font-ui-size')
-if _size is None:
-    _size = 10
-_ui_font = QFont(_families, _size)
+_ui_font = QFont(list(settings().font_ui_families), settings().font_ui_size)
 
 def _showNotFoundDialog_(text):
-    app_name = readConfig('app-name')
-    if app_name is None:
-        app_name = 'Notepad'
     QMessageBox.information(
         None,
-        app_name, 
+        settings().app_name, 
         tr(f'Cannot find "{text}"'), 
         buttons=QMessageBox.StandardButton.Ok
     )
@@ -53,6 +46,7 @@ class FindDialog (QDialog):
 
         self.setWindowTitle(tr('Find'))
         self.setFont(_ui_font)
+        self._options: QTextDocument.FindFlag = None
 
         # Input field
         find_label = QLabel(tr('Find what:'))
@@ -120,24 +114,13 @@ class FindDialog (QDialog):
         Returns:
             bool: True if the text was found, False otherwise.
         """
-        if self._options is None:
-            if findBackward:
-                found = self.parent().editor.find(
-                    self.find_text.text(), 
-                    QTextDocument.FindFlag.FindBackward
-                )
-            else:
-                found = self.parent().editor.find(self.find_text.text())
-        else:
-            if findBackward:
-                found = self.parent().editor.find(
-                    self.find_text.text(), 
-                    self._options | QTextDocument.FindFlag.FindBackward
-                )
-            else:
-                found = self.parent().editor.find(self.find_text.text(), self._options)
-        return found
+        options = QTextDocument.FindFlag(0) if self._options is None else self._options
+        if findBackward:
+            options |= QTextDocument.FindFlag.FindBackward
+        # Finds occurrences over the virtual breaks of long line mode too
+        return self.parent().long_lines.find(self.find_text.text(), options)
     
+    @traced('FindDialog.findNext', size=documentSize)
     def findNext(self):
         """
         Find the next occurrence of the search text, with optional wrap around.
@@ -152,6 +135,7 @@ class FindDialog (QDialog):
             else:
                 _showNotFoundDialog_(self.find_text.text())
 
+    @traced('FindDialog.findPrevious', size=documentSize)
     def findPrevious(self):
         """
         Find the previous occurrence of the search text, with optional wrap around.
@@ -182,7 +166,6 @@ class ReplaceDialog (QDialog):
 
         self.setWindowTitle(tr('Replace'))
         self.setFont(_ui_font)
-        self.parent = parent
 
         # Text input
         find_label = QLabel(tr('Find what:'))
@@ -233,12 +216,12 @@ class ReplaceDialog (QDialog):
             bool: True if the text was found, False otherwise.
         """
         if self.match_case_checkbox.isChecked():
-            found = self.parent().editor.find(
+            found = self.parent().long_lines.find(
                 self.find_text.text(),
                 QTextDocument.FindFlag.FindCaseSensitively
             )
         else:
-            found = self.parent().editor.find(self.find_text.text())
+            found = self.parent().long_lines.find(self.find_text.text())
         return found
     
     def findNext(self):
@@ -277,16 +260,16 @@ class ReplaceDialog (QDialog):
                 cursor.insertText(self.replace_text.text())
                 self.parent().editor.setTextCursor(cursor)
 
+    @traced('ReplaceDialog.replaceAll', size=documentSize)
     def replaceAll(self):
         """
         Replace all occurrences of the search text with the replacement text.
         """
-        cursor: QTextCursor = self.parent().editor.textCursor()
-        cursor.movePosition(QTextCursor.MoveOperation.Start)
-        self.parent().editor.setTextCursor(cursor)
+        self.parent().editor.moveCursor(QTextCursor.MoveOperation.Start)
 
         while (self.find()):
-            cursor.removeSelectedText()
+            # find() selects the match in the editor cursor
+            cursor: QTextCursor = self.parent().editor.textCursor()
             cursor.insertText(self.replace_text.text())
             self.parent().editor.setTextCursor(cursor)
 
@@ -305,12 +288,7 @@ class AboutDialog (QDialog):
 
         # Logo
         logo_label = QLabel(self)
-        logo = QPixmap()
-        logo_filename = readConfig('about-logo')
-        if logo_filename is None:
-            logo_filename = 'img/windows-logo-300.png'
-        logo.load(logo_filename)
-        logo_label.setPixmap(logo)
+        logo_label.setPixmap(pixmap(settings().about_logo))
         logo_label.setAlignment(Qt.AlignmentFlag.AlignHCenter)
 
         # Horizontal Ruler
@@ -320,12 +298,7 @@ class AboutDialog (QDialog):
 
         # Icon
         icon_label = QLabel(self)
-        icon = QPixmap()
-        icon_filename = readConfig('about-icon')
-        if icon_filename is None:
-            icon_filename = 'img/notepad-icon-32.png'
-        icon.load(icon_filename)
-        icon_label.setPixmap(icon)
+        icon_label.setPixmap(pixmap(settings().about_icon))
         icon_label.setAlignment(Qt.AlignmentFlag.AlignTop)
 
         # Platform
@@ -356,3 +329,48 @@ class AboutDialog (QDialog):
         grid.addWidget(ok_button, 8, 2)
         
         self.setLayout(grid)
+
+
+class DiagnosticsDialog (QDialog):
+    """
+    Dialog showing the memory held by the undo history of the editor,
+    updated while it is open.
+    """
+    def __init__(self, parent):
+        super().__init__(parent, Qt.WindowType.Dialog)
+        self.setWindowTitle(tr('Diagnostics'))
+        self.setFont(_ui_font)
+        self.setMinimumWidth(300)
+
+        self.undo_label = QLabel(self)
+        self.redo_label = QLabel(self)
+        self.memory_label = QLabel(self)
+
+        # Close Button
+        close_button = QPushButton(tr('Close'), self)
+        close_button.setFixedWidth(75)
+        close_button.clicked.connect(self.close)
+
+        grid = QGridLayout(self)
+        grid.addWidget(QLabel(tr('Undo entries:'), self), 0, 0)
+        grid.addWidget(self.undo_label, 0, 1)
+        grid.addWidget(QLabel(tr('Redo entries:'), self), 1, 0)
+        grid.addWidget(self.redo_label, 1, 1)
+        grid.addWidget(QLabel(tr('Undo memory:'), self), 2, 0)
+        grid.addWidget(self.memory_label, 2, 1)
+        grid.addWidget(close_button, 3, 1, Qt.AlignmentFlag.AlignRight)
+        self.setLayout(grid)
+
+        parent.history.changed.connect(self.refresh)
+        self.refresh()
+
+    def refresh(self):
+        """
+        Show the current state of the undo history.
+        """
+        history = self.parent().history
+        self.undo_label.setText(str(history.undoCount()))
+        self.redo_label.setText(str(history.redoCount()))
+        self.memory_label.setText(
+            f"{history.memoryUsage() / (1 << 20):.1f} MB / {history.budget() >> 20} MB"
+        )
@@ -0,0 +1,435 @@
+"""
+Code folding used in the Notepad application
+
+A fold region starts at a line followed by lines indented deeper, and
+ends at the last of them before a line indented as much or less; blank
+lines inside do not end it. This fits nested YAML, JSON, XML and Python
+alike, with no language rules.
+
+`Folding` keeps the indentation of each block in a list, computed from the
+whole text on the first fold request and then only for the blocks of each
+change, spliced into the list. A folded region hides its blocks, which the
+document layout skips when laying out and painting the text, so folding a
+large file to its top level makes scrolling, zooming and wrapping cost as
+much as the lines still shown. Folds larger than a few thousand blocks are
+laid out again in slices by `Relayout`.
+
+Block numbers stay those of the whole text, so go to line, find and the
+Ln of the status bar report true line numbers. Moving the cursor into a
+folded region unfolds it, and so does editing it. Folding is off in long
+line mode.
+"""
+
+__all__ = ['Folding']
+__version__ = '0.1'
+__author__ = 'Victor M. Ortiz <Victor.M.Ortiz@outlook.com>'
+
+import bisect
+import time
+from PyQt6.QtCore import QObject, pyqtSignal
+from PyQt6.QtGui import QTextBlock, QTextCursor
+from PyQt6.QtWidgets import QTextEdit
+from .logger import logger
+
+# Columns of a tab in the indentation
+_tab_width = 4
+# Blocks shown or hidden at once above which the document is laid out again
+# in slices
+_large_fold = 5000
+
+def _indent(text: str) -> int:
+    """
+    Returns the indentation of a line in columns, -1 for a blank line.
+    """
+    stripped = text.lstrip(' \t')
+    if not stripped:
+        return -1
+    prefix = text[:len(text) - len(stripped)]
+    return len(prefix.expandtabs(_tab_width)) if '\t' in prefix else len(prefix)
+
+
+class Folding(QObject):
+    """
+    Folds the regions of an editor by indentation.
+    """
+
+    # Emitted once blocks were shown or hidden and marked for layout
+    changed = pyqtSignal()
+
+    def __init__(self, editor: QTextEdit, long_lines, relayout):
+        """
+        Initialize the Folding.
+
+        Args:
+            editor (QTextEdit): The editor showing the document.
+            long_lines (LongLines): The long line mode of the editor, where
+                folding is off.
+            relayout (Relayout): Lays out large folds again in slices.
+        """
+        super().__init__(editor)
+        self._editor = editor
+        self._document = editor.document()
+        self._long_lines = long_lines
+        self._relayout = relayout
+        # Indentation of each block, None until the first fold
+        self._indents: list[int] | None = None
+        self._count = self._document.blockCount()
+        # Last block hidden by each folded region, by the number of the
+        # block the region starts at, and the sorted starts
+        self._folded: dict[int, int] = {}
+        self._headers: list[int] | None = []
+        # Set while the shown or hidden blocks are marked for layout
+        self._redrawing = False
+        self._document.contentsChange.connect(self.onContentsChange)
+        editor.cursorPositionChanged.connect(self.onCursorPositionChanged)
+
+    def hasFolds(self) -> bool:
+        """
+        Returns:
+            bool: True if some region is folded.
+        """
+        return bool(self._folded)
+
+    def isFolded(self, number: int) -> bool:
+        """
+        Returns:
+            bool: True if a folded region starts at a block.
+        """
+        return number in self._folded
+
+    def region(self, number: int) -> int:
+        """
+        Returns the last block of the region starting at a block.
+
+        Args:
+            number (int): The block number.
+
+        Returns:
+            int: The number of the last block of the region, the block itself
+                if no region starts there.
+        """
+        indents = self._ensureIndents()
+        indent = indents[number]
+        if indent < 0:
+            return number
+        last = number
+        for following in range(number + 1, len(indents)):
+            other = indents[following]
+            if other < 0:
+                continue
+            if other <= indent:
+                break
+            last = following
+        return last
+
+    def nextBlock(self, block: QTextBlock) -> QTextBlock:
+        """
+        Returns the block shown after a shown block, skipping its folded
+        region.
+
+        Args:
+            block (QTextBlock): A shown block.
+        """
+        last = self._folded.get(block.blockNumber())
+        if last is None:
+            return block.next()
+        return self._document.findBlockByNumber(last + 1)
+
+    def visibleBlock(self, block: QTextBlock) -> QTextBlock:
+        """
+        Returns a block if it is shown, otherwise the first block of the
+        outermost folded region hiding it.
+
+        Args:
+            block (QTextBlock): A block.
+        """
+        if block.isVisible() or not self._folded:
+            return block
+        header = self._outermost(block.blockNumber())
+        return block if header is None else self._document.findBlockByNumber(header)
+
+    def fold(self, number: int) -> bool:
+        """
+        Fold the region starting at a block, or the innermost region around
+        it.
+
+        Args:
+            number (int): The block number.
+
+        Returns:
+            bool: True if a region was folded.
+        """
+        if self._long_lines.isActive():
+            return False
+        indents = self._ensureIndents()
+        header = number
+        while header >= 0 and indents[header] < 0:
+            header -= 1
+        if header < 0:
+            return False
+        last = self.region(header)
+        if last == header:
+            # The region the block is in starts at the closest line above
+            # indented less
+            indent = indents[header]
+            header -= 1
+            while header >= 0 and not 0 <= indents[header] < indent:
+                header -= 1
+            if header < 0:
+                return False
+            last = self.region(header)
+        if header in self._folded:
+            return False
+        self._moveOutOf(header, last)
+        self._folded[header] = last
+        self._headers = None
+        self._setVisible(header + 1, last, False)
+        self._redraw(header, last)
+        logger.info("Folded lines %s to %s", header + 1, last + 1)
+        return True
+
+    def unfold(self, number: int) -> bool:
+        """
+        Unfold the folded region starting at a block.
+
+        Args:
+            number (int): The block number.
+
+        Returns:
+            bool: True if a region was unfolded.
+        """
+        last = self._folded.pop(number, None)
+        if last is None:
+            return False
+        self._headers = None
+        self._show(number + 1, last)
+        self._redraw(number, last)
+        logger.info("Unfolded lines %s to %s", number + 1, last + 1)
+        return True
+
+    def toggle(self, number: int) -> bool:
+        """
+        Unfold the folded region starting at a block, otherwise fold the
+        region at the block.
+
+        Args:
+            number (int): The block number.
+
+        Returns:
+            bool: True if a region was folded or unfolded.
+        """
+        return self.unfold(number) or self.fold(number)
+
+    def foldAll(self):
+        """
+        Fold every region at the top level, in a single pass over the blocks.
+        """
+        if self._long_lines.isActive():
+            return
+        start = time.perf_counter()
+        indents = self._ensureIndents()
+        count = len(indents)
+        number = 0
+        regions = []
+        while number < count:
+            last = self.region(number) if indents[number] >= 0 else number
+            if last > number:
+                regions.append((number, last))
+            number = last + 1
+        if not regions:
+            return
+        cursor_number = self._editor.textCursor().blockNumber()
+        index = bisect.bisect_right(regions, (cursor_number, count)) - 1
+        if index >= 0:
+            self._moveOutOf(*regions[index])
+        # Regions folded inside stay folded
+        self._folded.update(regions)
+        self._headers = None
+        for header, last in regions:
+            self._setVisible(header + 1, last, False)
+        self._redraw(0, count - 1)
+        logger.info(
+            "Folded %s regions of %s lines in %.2f s",
+            len(regions), count, time.perf_counter() - start
+        )
+
+    def unfoldAll(self):
+        """
+        Unfold every folded region.
+        """
+        if not self._folded:
+            return
+        for header, last in self._folded.items():
+            self._setVisible(header + 1, last, True)
+        self._folded.clear()
+        self._headers = []
+        self._redraw(0, self._document.blockCount() - 1)
+        logger.info("Unfolded every region")
+
+    def onContentsChange(self, position: int, removed: int, added: int):
+        """
+        Update the indentation of the changed blocks, move the folds after
+        them and unfold the folds they change.
+        """
+        if self._redrawing:
+            return
+        count = self._document.blockCount()
+        if position == 0 and added >= self._document.characterCount() - 1:
+            # A new text, every block is shown
+            self._indents = None
+            self._folded.clear()
+            self._headers = []
+            self._count = count
+            return
+        delta = count - self._count
+        self._count = count
+        if self._indents is None and not self._folded:
+            return
+        first = self._document.findBlock(position)
+        last_number = self._document.findBlock(position + added).blockNumber()
+        first_number = first.blockNumber()
+        if self._indents is not None:
+            indents = []
+            block = first
+            for _ in range(last_number - first_number + 1):
+                indents.append(_indent(block.text()))
+                block = block.next()
+            self._indents[first_number:last_number - delta + 1] = indents
+        if not self._folded or (delta == 0 and first_number == last_number
+                and first.isVisible() and first_number not in self._folded):
+            # Typing in a shown line outside the first line of a fold
+            return
+        old_last = last_number - delta
+        folded = {}
+        changed = []
+        for header, last in self._folded.items():
+            if last < first_number:
+                folded[header] = last
+            elif header > old_last:
+                folded[header + delta] = last + delta
+            else:
+                changed.append((header, last))
+        if len(folded) == len(self._folded) and delta == 0:
+            return
+        self._folded = folded
+        self._headers = None
+        if changed:
+            start = min(first_number, min(header for header, _ in changed))
+            end = max(last_number, max(last + delta for _, last in changed))
+            self._show(start, end)
+            self._redraw(start, end)
+            logger.info("Unfolded %s regions changed by an edit", len(changed))
+
+    def onCursorPositionChanged(self):
+        """
+        Unfold the regions hiding the cursor, e.g. after find or go to line.
+        """
+        block = self._editor.textCursor().block()
+        if block.isVisible() or not self._folded:
+            return
+        number = block.blockNumber()
+        while True:
+            header = self._outermost(number)
+            if header is None:
+                break
+            self.unfold(header)
+        self._editor.ensureCursorVisible()
+
+    def _ensureIndents(self) -> list[int]:
+        """
+        Returns the indentation of each block, computed on first use.
+        """
+        if self._indents is None:
+            start = time.perf_counter()
+            indents = [_indent(line) for line in self._long_lines.text().split('\n')]
+            if len(indents) != self._document.blockCount():
+                # Line separators inside a block
+                indents = []
+                block = self._document.firstBlock()
+                while block.isValid():
+                    indents.append(_indent(block.text()))
+                    block = block.next()
+            self._indents = indents
+            self._count = len(indents)
+            logger.info(
+                "Indentation of %s lines computed in %.2f s",
+                len(indents), time.perf_counter() - start
+            )
+        return self._indents
+
+    def _outermost(self, number: int) -> int | None:
+        """
+        Returns the first block of the outermost folded region hiding a
+        block, None if it is shown.
+        """
+        if self._headers is None:
+            self._headers = sorted(self._folded)
+        index = bisect.bisect_left(self._headers, number) - 1
+        outermost = None
+        while index >= 0:
+            header = self._headers[index]
+            if self._folded[header] >= number:
+                outermost = header
+                if self._indents is not None and self._indents[header] == 0:
+                    # No region starts further out
+                    break
+            index -= 1
+        return outermost
+
+    def _moveOutOf(self, header: int, last: int):
+        """
+        Move the cursor to the end of the first block of a region when it is
+        in the blocks about to be hidden.
+        """
+        cursor = self._editor.textCursor()
+        if header < cursor.blockNumber() <= last:
+            cursor.setPosition(self._document.findBlockByNumber(header).position())
+            cursor.movePosition(QTextCursor.MoveOperation.EndOfBlock)
+            self._editor.setTextCursor(cursor)
+
+    def _setVisible(self, first: int, last: int, visible: bool):
+        """
+        Show or hide the blocks between two block numbers.
+        """
+        block = self._document.findBlockByNumber(first)
+        for _ in range(last - first + 1):
+            block.setVisible(visible)
+            block = block.next()
+
+    def _show(self, first: int, last: int):
+        """
+        Show the blocks between two block numbers, but those of the folded
+        regions among them.
+        """
+        number = first
+        block = self._document.findBlockByNumber(first)
+        while block.isValid() and number <= last:
+            block.setVisible(True)
+            inner = self._folded.get(number)
+            if inner is None:
+                block = block.next()
+                number += 1
+            else:
+                number = inner + 1
+                block = self._document.findBlockByNumber(number)
+
+    def _redraw(self, first: int, last: int):
+        """
+        Lay out the blocks between two block numbers again after showing or
+        hiding them. Many blocks are laid out in slices.
+        """
+        start = self._document.findBlockByNumber(first).position()
+        end_block = self._document.findBlockByNumber(last)
+        end = min(end_block.position() + end_block.length(), self._document.characterCount())
+
+        def change():
+            self._redrawing = True
+            try:
+                self._document.markContentsDirty(start, end - start)
+            finally:
+                self._redrawing = False
+            self.changed.emit()
+        if last - first > _large_fold:
+            self._relayout.editText(change)
+        else:
+            change()
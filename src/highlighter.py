@@ -0,0 +1,526 @@
+"""
+Syntax highlighting used in the Notepad application
+
+A `Language` tokenizes one line at a time from the state left by the line
+before it, and returns the highlighted spans and the state for the next
+line. Languages are registered with `registerLanguage` and chosen by the
+extension of the file; the built-in rule sets are in `languages`.
+
+`Highlighter` keeps a cache per block with the state the block was
+tokenized from, the state it ended with, and a digest of its spans. After
+an edit it tokenizes the edited blocks at once, then the following blocks
+until one would start from the same state as before. Blocks coming into
+view are tokenized first and the rest of the document in idle time, in
+event loop slices of about `highlight-slice-ms`.
+
+The spans are drawn as additional formats of the block layout, so they
+are never part of the text or of the undo history. Laying out a block
+again moves every block after it, so only the blocks in view are drawn,
+all in one range, and a block is drawn again only if its digest changed.
+Highlighting turns itself off in documents larger
+than `highlight-max-kb` and in long line mode, so the cost of a keystroke
+never depends on the document size.
+"""
+
+__all__ = ['Language', 'Highlighter', 'registerLanguage', 'languageFor']
+__version__ = '0.1'
+__author__ = 'Victor M. Ortiz <Victor.M.Ortiz@outlook.com>'
+
+import os
+import re
+import time
+from PyQt6.QtCore import QEvent, QObject, QPoint, QTimer
+from PyQt6.QtGui import QColor, QFont, QTextBlock, QTextBlockUserData, QTextCharFormat, QTextCursor, QTextLayout
+from PyQt6.QtWidgets import QTextEdit
+from .config import settings, configWatcher
+from .logger import logger
+
+# Colors of the token kinds returned by the languages
+_colors = {
+    'comment': '#008000',
+    'string': '#a31515',
+    'number': '#098658',
+    'keyword': '#0000ff',
+    'key': '#0451a5',
+    'section': '#795e26',
+    'punctuation': '#555555',
+    'date': '#808080',
+    'error': '#cd3131',
+    'warning': '#b8860b',
+    'info': '#0070c1',
+    'debug': '#8a8a8a',
+}
+_bold = {'section', 'error'}
+_formats: dict[str, QTextCharFormat] = {}
+
+
+class Language:
+    """
+    Rule set of a file format.
+
+    The rules are pairs of a regular expression and a token kind, tried in
+    order at each position of a line. Subclasses with tokens spanning lines
+    override `highlight` and keep what they need in the state.
+    """
+
+    name = 'Plain Text'
+    extensions: tuple[str, ...] = ()
+    rules: tuple[tuple[str, str], ...] = ()
+    flags = 0
+
+    def __init__(self):
+        """
+        Initialize the Language.
+        """
+        self._pattern = re.compile(
+            '|'.join(f'(?P<_{index}>{pattern})' for index, (pattern, _) in enumerate(self.rules)),
+            self.flags
+        ) if self.rules else None
+        self._kinds = [kind for _, kind in self.rules]
+
+    def highlight(self, text: str, state: int) -> tuple[list[tuple[int, int, str]], int]:
+        """
+        Tokenize a line.
+
+        Args:
+            text (str): The line, without its line break.
+            state (int): The state left by the line before, 0 for the
+                first line.
+
+        Returns:
+            tuple[list[tuple[int, int, str]], int]: The spans as start,
+                length and token kind, and the state for the next line.
+        """
+        return self.match(text), 0
+
+    def match(self, text: str, start: int = 0) -> list[tuple[int, int, str]]:
+        """
+        Returns:
+            list[tuple[int, int, str]]: The spans of the rules in a line
+                from a start offset.
+        """
+        if self._pattern is None:
+            return []
+        kinds = self._kinds
+        return [
+            (match.start(), match.end() - match.start(), kinds[int(match.lastgroup[1:])])
+            for match in self._pattern.finditer(text, start)
+            if match.end() > match.start()
+        ]
+
+
+_languages: list[Language] = []
+_builtins_loaded = False
+
+def registerLanguage(language: Language):
+    """
+    Add a language, chosen before the languages registered earlier for the
+    same extension.
+
+    Args:
+        language (Language): The language.
+    """
+    _languages.insert(0, language)
+
+def languageFor(filename: str) -> Language | None:
+    """
+    Returns:
+        Language | None: The language of a file by its extension, or None.
+    """
+    global _builtins_loaded
+    if not _builtins_loaded:
+        # Loaded on first use, most files have no highlighting
+        _builtins_loaded = True
+        from . import languages
+    extension = os.path.splitext(filename)[1].lower()
+    for language in _languages:
+        if extension in language.extensions:
+            return language
+    return None
+
+def _charFormat(kind: str) -> QTextCharFormat:
+    """
+    Returns the format drawing a token kind.
+    """
+    if kind not in _formats:
+        char_format = QTextCharFormat()
+        char_format.setForeground(QColor(_colors.get(kind, '#000000')))
+        if kind in _bold:
+            char_format.setFontWeight(QFont.Weight.Bold)
+        _formats[kind] = char_format
+    return _formats[kind]
+
+def _utf16Offsets(text: str) -> list[int]:
+    """
+    Returns the offset in document positions of each character of a text
+    with characters outside the Basic Multilingual Plane, and of its end.
+    """
+    offsets = [0]
+    offset = 0
+    for char in text:
+        offset += 2 if ord(char) > 0xFFFF else 1
+        offsets.append(offset)
+    return offsets
+
+
+class _BlockData(QTextBlockUserData):
+    """
+    Tokenizer cache of a block.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.generation = 0
+        # Tokenized from the end state of the block before
+        self.exact = False
+        self.start = 0
+        self.end = 0
+        self.digest = 0
+        # The spans are set as the formats of the block layout
+        self.drawn = False
+
+
+class Highlighter(QObject):
+    """
+    Highlights the document of an editor in the language of its file.
+    """
+
+    def __init__(self, editor: QTextEdit, long_lines, folding):
+        """
+        Initialize the Highlighter.
+
+        Args:
+            editor (QTextEdit): The editor showing the document.
+            long_lines (LongLines): The long line mode of the editor, where
+                highlighting is off.
+            folding (Folding): The folded regions, whose hidden blocks are
+                not drawn.
+        """
+        super().__init__(editor)
+        self._editor = editor
+        self._document = editor.document()
+        self._long_lines = long_lines
+        self._folding = folding
+        # Language of the file, and the language in use if highlighting is on
+        self._wanted: Language | None = None
+        self._language: Language | None = None
+        # Bumped when the language changes, invalidating every block cache
+        self._generation = 0
+        # Some block may have formats or a cache
+        self._formatted = False
+        # Start of the blocks left to tokenize after edits and by the first
+        # pass over the document, moved by Qt on each edit
+        self._dirty: list[QTextCursor] = []
+        self._frontier: QTextCursor | None = None
+        # Range of the blocks drawn with new formats, not laid out yet
+        self._redrawn: tuple[int, int] | None = None
+        self._timer = QTimer(self)
+        self._timer.timeout.connect(self._step)
+        # Collapses the scroll events of a single paint
+        self._visible = QTimer(self)
+        self._visible.setSingleShot(True)
+        self._visible.timeout.connect(self._highlightVisible)
+        self._document.contentsChange.connect(self.onContentsChange)
+        editor.verticalScrollBar().valueChanged.connect(lambda: self._visible.start(0))
+        folding.changed.connect(lambda: self._visible.start(0))
+        editor.viewport().installEventFilter(self)
+        configWatcher().settingsChanged.connect(self.onSettingsChanged)
+
+    def language(self) -> Language | None:
+        """
+        Returns:
+            Language | None: The language highlighted, or None if
+                highlighting is off.
+        """
+        return self._language
+
+    def setFile(self, filename: str | None):
+        """
+        Highlight the document in the language of a file.
+
+        Args:
+            filename (str | None): The file shown, None for a new file.
+        """
+        self._wanted = languageFor(filename) if filename else None
+        self._update()
+
+    def onContentsChange(self, position: int, removed: int, added: int):
+        """
+        Tokenize the edited blocks and the blocks whose start state changed.
+        """
+        if position == 0 and added >= self._document.characterCount() - 1:
+            # A new text, tokenized from the start in idle time
+            self._formatted = False
+            self._restart()
+            self._update()
+            return
+        self._update()
+        if self._language is None:
+            return
+        cursor = QTextCursor(self._document)
+        cursor.setPosition(position)
+        deadline = time.perf_counter() + settings().highlight_slice_ms / 1000
+        settled = self._chain(cursor, deadline, position + added)
+        self._flush()
+        self._visible.start(0)
+        if not settled:
+            block = cursor.block()
+            while block.isValid() and block.position() <= position + added:
+                block.setUserData(None)
+                block = block.next()
+            self._dirty.append(cursor)
+            self._timer.start(0)
+
+    def onSettingsChanged(self, changed: frozenset[str]):
+        """
+        Apply new highlighting settings.
+
+        Args:
+            changed (frozenset[str]): The names of the changed settings.
+        """
+        if changed & {'highlight_enabled', 'highlight_max_kb'}:
+            self._update()
+
+    def eventFilter(self, obj: QObject, event: QEvent) -> bool:
+        """
+        Tokenize the blocks coming into view when the viewport grows.
+        """
+        if event.type() == QEvent.Type.Resize:
+            self._visible.start(0)
+        return False
+
+    def _update(self):
+        """
+        Turn highlighting on or off for the current file, settings and
+        document size.
+        """
+        config = settings()
+        language = self._wanted
+        if language is not None and (
+            not config.highlight_enabled
+            or self._long_lines.isActive()
+            or self._document.characterCount() > config.highlight_max_kb << 10
+        ):
+            language = None
+        if language is self._language:
+            return
+        if language is None:
+            logger.info("Highlighting off")
+        else:
+            logger.info("Highlighting %s", language.name)
+        self._language = language
+        self._generation += 1
+        self._restart()
+
+    def _restart(self):
+        """
+        Tokenize every block again from the start, or clear their formats
+        if highlighting is off.
+        """
+        self._dirty.clear()
+        self._frontier = None
+        if self._language is not None or self._formatted:
+            self._frontier = QTextCursor(self._document)
+            self._timer.start(0)
+        self._visible.start(0)
+
+    def _step(self):
+        """
+        Tokenize the blocks left for about a slice of time, the blocks after
+        an edit first.
+        """
+        deadline = time.perf_counter() + settings().highlight_slice_ms / 1000
+        while time.perf_counter() < deadline:
+            if self._dirty:
+                self._dirty.sort(key=QTextCursor.position)
+                cursor = self._dirty[0]
+            elif self._frontier is not None:
+                cursor = self._frontier
+            else:
+                break
+            if not self._chain(cursor, deadline):
+                break
+            if cursor is self._frontier:
+                self._frontier = None
+                if self._language is None:
+                    self._formatted = False
+            else:
+                # The blocks up to where the chain stopped are done
+                stop = cursor.position()
+                self._dirty = [other for other in self._dirty[1:] if other.position() > stop]
+        # Draw the blocks in view whose spans changed
+        self._highlightVisible()
+        if not self._dirty and self._frontier is None:
+            self._timer.stop()
+
+    def _chain(self, cursor: QTextCursor, deadline: float, changed: int = -1) -> bool:
+        """
+        Tokenize the blocks from the block of a cursor until a block would
+        start from the same state as before, or the time is up. The chain
+        of the first pass goes on to the end, and the chain of an edit
+        stops where the first pass is, which goes on from there.
+
+        Args:
+            cursor (QTextCursor): The first block, moved to where the chain
+                stopped.
+            deadline (float): The time to stop at, as `time.perf_counter()`.
+            changed (int): The end of the edited text, whose blocks are drawn
+                at once.
+
+        Returns:
+            bool: True if the chain stopped on a settled block or at the end.
+        """
+        first_pass = cursor is self._frontier
+        frontier = -1 if first_pass or self._frontier is None else self._frontier.position()
+        block = cursor.block()
+        state, exact = self._startState(block.previous())
+        while block.isValid():
+            data = self._data(block)
+            position = block.position()
+            force = position <= changed
+            if not force and not first_pass and (
+                0 <= frontier <= position
+                or data is not None and data.exact and exact and data.start == state
+            ):
+                cursor.setPosition(position)
+                return True
+            if force and data is not None:
+                # Qt keeps the formats of an edited block as they were
+                data.drawn = False
+            state, exact = self._highlightBlock(block, state, exact, data, draw=force)
+            block = block.next()
+            if block.isValid() and time.perf_counter() > deadline:
+                cursor.setPosition(block.position())
+                return False
+        cursor.movePosition(QTextCursor.MoveOperation.End)
+        return True
+
+    def _highlightVisible(self):
+        """
+        Draw the blocks in view, and tokenize the blocks not tokenized yet
+        from the best known state. The blocks of folded regions are skipped.
+        """
+        if self._language is None:
+            return
+        viewport = self._editor.viewport()
+        block = self._editor.cursorForPosition(QPoint(0, 0)).block()
+        last = self._editor.cursorForPosition(QPoint(0, viewport.height())).blockNumber()
+        state, exact = self._startState(block.previous())
+        while block.isValid() and block.blockNumber() <= last:
+            data = self._data(block)
+            if data is not None and data.drawn:
+                state, exact = data.end, data.exact
+            elif data is not None:
+                state, exact = self._highlightBlock(block, data.start, data.exact, data, draw=True)
+            else:
+                state, exact = self._highlightBlock(block, state, exact, None, draw=True)
+            following = self._folding.nextBlock(block)
+            if following.isValid() and following.blockNumber() != block.blockNumber() + 1:
+                # The hidden blocks of a folded region are left to the
+                # background pass, go on from the cache of the last one, and
+                # keep them out of the range laid out again
+                state, exact = self._startState(following.previous())
+                self._flush()
+            block = following
+        self._flush()
+
+    def _redraw(self, block: QTextBlock):
+        """
+        Add a block with new formats to the range laid out again by `_flush`.
+        """
+        start = block.position()
+        end = start + block.length()
+        if self._redrawn is None:
+            self._redrawn = (start, end)
+        else:
+            self._redrawn = (min(self._redrawn[0], start), max(self._redrawn[1], end))
+
+    def _flush(self):
+        """
+        Lay out the blocks with new formats again. The layout moves every
+        block after a changed range, so they are laid out in a single range.
+        """
+        if self._redrawn is not None:
+            start, end = self._redrawn
+            self._redrawn = None
+            self._document.markContentsDirty(start, end - start)
+
+    def _startState(self, previous: QTextBlock) -> tuple[int, bool]:
+        """
+        Returns:
+            tuple[int, bool]: The state a block starts from, and whether it
+                is exact, from the cache of the block before.
+        """
+        if not previous.isValid():
+            return 0, True
+        data = self._data(previous)
+        if data is None:
+            return 0, False
+        return data.end, data.exact
+
+    def _data(self, block: QTextBlock) -> _BlockData | None:
+        """
+        Returns:
+            _BlockData | None: The cache of a block for the current language.
+        """
+        data = block.userData()
+        if isinstance(data, _BlockData) and data.generation == self._generation:
+            return data
+        return None
+
+    def _highlightBlock(self, block: QTextBlock, state: int, exact: bool,
+            data: _BlockData | None, draw: bool = False) -> tuple[int, bool]:
+        """
+        Tokenize a block, and draw its spans if asked to and they changed.
+
+        Returns:
+            tuple[int, bool]: The state the block ends with, and whether it
+                is exact.
+        """
+        if self._language is None:
+            if block.userData() is not None:
+                block.setUserData(None)
+                if block.layout().formats():
+                    block.layout().clearFormats()
+                    self._redraw(block)
+            return 0, False
+
+        text = block.text()
+        spans, end = self._language.highlight(text, state)
+        digest = hash(tuple(spans))
+        if data is None:
+            data = _BlockData()
+            block.setUserData(data)
+            self._formatted = True
+        elif data.digest != digest:
+            data.drawn = False
+        data.generation = self._generation
+        data.exact = exact
+        data.start = state
+        data.end = end
+        data.digest = digest
+        if draw and not data.drawn:
+            self._draw(block, text, spans)
+            data.drawn = True
+        return end, exact
+
+    def _draw(self, block: QTextBlock, text: str, spans: list[tuple[int, int, str]]):
+        """
+        Set the spans of a block as the formats of its layout.
+        """
+        offsets = None if text.isascii() else _utf16Offsets(text)
+        ranges = []
+        for start, length, kind in spans:
+            format_range = QTextLayout.FormatRange()
+            if offsets is None:
+                format_range.start = start
+                format_range.length = length
+            else:
+                format_range.start = offsets[start]
+                format_range.length = offsets[start + length] - offsets[start]
+            format_range.format = _charFormat(kind)
+            ranges.append(format_range)
+        layout = block.layout()
+        if ranges or layout.formats():
+            layout.setFormats(ranges)
+            self._redraw(block)
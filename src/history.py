@@ -0,0 +1,603 @@
+"""
+Undo history used in the Notepad application
+
+`QTextDocument` keeps an undo stack without any limit, so a few large
+pastes or replacements on a big file hold their text forever. `UndoHistory`
+replaces it with a history bounded by the `undo-memory-budget-mb` setting.
+
+Each change of the document is recorded as the text it removed and the
+text it added at a position. The document undo stack only serves to read
+the removed text right after each change and is then cleared. Adjacent
+typing is coalesced into one entry per word, adjacent deletions into one
+entry, and the oldest entries are dropped once the history is over budget.
+
+When a file is saved, its undo entries are written in the background to
+`cache/undo`, one file per document named after the hash of its path. The
+entries are encoded as varint position deltas and lengths followed by their
+text, compressed with zlib, after the SHA-256 hash of the saved text. After
+the file is opened again they are only read when Undo goes past the changes
+of the session, or on the next save, and are discarded if the opened text
+does not match the hash.
+Each file is capped by `undo-persist-file-kb`, and the least recently used
+files are removed once the directory is over `undo-persist-total-mb`.
+"""
+
+__all__ = ['UndoHistory']
+__version__ = '0.1'
+__author__ = 'Victor M. Ortiz <Victor.M.Ortiz@outlook.com>'
+
+import collections
+import hashlib
+import os
+import sys
+import zlib
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from PyQt6.QtCore import QEvent, QObject, pyqtSignal
+from PyQt6.QtGui import QKeySequence, QTextCursor
+from PyQt6.QtWidgets import QTextEdit
+from .config import settings, configWatcher
+from .logger import logger
+
+# Approximate size of an entry without its text, in bytes
+_entry_overhead = 120
+# Persisted histories
+_persist_directory = 'cache/undo'
+_persist_magic = b'NPUNDO1\n'
+_digest_size = hashlib.sha256().digest_size
+# Characters inserted at a time by insertText
+_insert_chunk = 1 << 20
+# Hashes and writes persisted histories, one at a time
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='UndoHistory')
+
+def _length(text: str) -> int:
+    """
+    Returns the length of a text in document positions, which count UTF-16
+    code units.
+    """
+    if text.isascii():
+        return len(text)
+    return len(text.encode('utf-16-le', 'surrogatepass')) // 2
+
+
+@dataclass(slots=True)
+class _Edit:
+    """
+    A change of the document: `removed` was replaced by `added` at `position`.
+    """
+    position: int
+    removed: str
+    added: str
+
+    def size(self) -> int:
+        """
+        Returns the approximate memory held by the entry in bytes.
+        """
+        return sys.getsizeof(self.removed) + sys.getsizeof(self.added) + _entry_overhead
+
+def _digest(text: str) -> bytes:
+    """
+    Returns the hash of a document text, used to validate persisted entries.
+    """
+    return hashlib.sha256(text.encode('utf-8', 'surrogatepass')).digest()
+
+def _persistPath(filename: str) -> str:
+    """
+    Returns the path of the persisted history of a document.
+    """
+    key = hashlib.sha1(os.path.abspath(filename).encode('utf-8', 'surrogatepass')).hexdigest()
+    return os.path.join(_persist_directory, key + '.undo')
+
+def _writeVarint(buffer: bytearray, value: int):
+    while value > 0x7f:
+        buffer.append(value & 0x7f | 0x80)
+        value >>= 7
+    buffer.append(value)
+
+def _readVarint(data: bytes, offset: int) -> tuple[int, int]:
+    value = shift = 0
+    while True:
+        byte = data[offset]
+        offset += 1
+        value |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return value, offset
+        shift += 7
+
+def _encode(edits: list[tuple[int, str, str]]) -> bytes:
+    """
+    Encode entries, oldest first, as varints and UTF-8 text.
+
+    Positions are stored as the zigzag encoded difference with the position
+    of the previous entry, which fits in a byte or two while typing.
+    """
+    buffer = bytearray()
+    _writeVarint(buffer, len(edits))
+    previous = 0
+    for position, removed, added in edits:
+        delta = position - previous
+        _writeVarint(buffer, delta << 1 if delta >= 0 else (-delta << 1) - 1)
+        previous = position
+        for text in (removed, added):
+            data = text.encode('utf-8', 'surrogatepass')
+            _writeVarint(buffer, len(data))
+            buffer += data
+    return bytes(buffer)
+
+def _decode(data: bytes) -> list[_Edit]:
+    """
+    Decode entries encoded by `_encode`.
+    """
+    count, offset = _readVarint(data, 0)
+    edits = []
+    position = 0
+    for _ in range(count):
+        delta, offset = _readVarint(data, offset)
+        position += -(delta + 1 >> 1) if delta & 1 else delta >> 1
+        texts = []
+        for _ in range(2):
+            length, offset = _readVarint(data, offset)
+            texts.append(data[offset:offset + length].decode('utf-8', 'surrogatepass'))
+            offset += length
+        edits.append(_Edit(position, *texts))
+    return edits
+
+def _writePersisted(path: str, text: str, edits: list[tuple[int, str, str]], file_cap: int, total_cap: int):
+    """
+    Write the persisted history of a document and evict the least recently
+    used histories over the total cap. Run by the background executor.
+    """
+    try:
+        digest = _digest(text)
+        payload = zlib.compress(_encode(edits))
+        # Drop the oldest entries until the file fits in its cap
+        while edits and len(payload) + len(_persist_magic) + _digest_size > file_cap:
+            edits = edits[max(1, len(edits) // 4):]
+            payload = zlib.compress(_encode(edits))
+        os.makedirs(_persist_directory, exist_ok=True)
+        if not edits:
+            if os.path.exists(path):
+                os.remove(path)
+            return
+        temporary = path + '.tmp'
+        with open(temporary, 'wb') as persisted:
+            persisted.write(_persist_magic + digest + payload)
+        os.replace(temporary, path)
+        _evictPersisted(total_cap)
+    except Exception as e:
+        logger.warning("Undo history %s not written. %s", path, e)
+
+def _evictPersisted(total_cap: int):
+    """
+    Remove the least recently used histories until they fit in the total cap.
+    """
+    entries = []
+    with os.scandir(_persist_directory) as scan:
+        for entry in scan:
+            if entry.name.endswith('.undo'):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= total_cap:
+            break
+        os.remove(path)
+        total -= size
+        logger.info("Evicted undo history %s", path)
+
+
+class UndoHistory(QObject):
+    """
+    Bounded undo and redo history of a text editor.
+
+    The history takes over the undo and redo shortcuts of the editor and
+    emits `undoAvailable` and `redoAvailable` like `QTextEdit` does. The
+    document keeps no undo stack of its own, so the context menu of the
+    editor offers the history instead, see `Editor.setHistory`.
+    """
+
+    undoAvailable = pyqtSignal(bool)
+    redoAvailable = pyqtSignal(bool)
+    # Emitted when the entries or their memory change
+    changed = pyqtSignal()
+    # Emitted after each change of the text, undo and redo included, with
+    # its position and the texts it removed and added. Changes that cannot
+    # be undone, like setPlainText, are not emitted
+    edited = pyqtSignal(int, str, str)
+
+    def __init__(self, editor: QTextEdit):
+        """
+        Initialize the UndoHistory.
+
+        Args:
+            editor (QTextEdit): The editor whose changes are recorded.
+        """
+        super().__init__(editor)
+        self._editor = editor
+        self._document = editor.document()
+        self._undo: collections.deque[_Edit] = collections.deque()
+        self._redo: list[_Edit] = []
+        self._memory = 0
+        self._budget = settings().undo_memory_budget_mb << 20
+        # Whether the next change may be coalesced with the last entry
+        self._coalesce = False
+        self._applying = False
+        self._undo_available = False
+        self._redo_available = False
+        # Long line mode of the editor, see setLongLines
+        self._long_lines = None
+        # Persisted history of the opened file, read on the first undo past
+        # the session changes, and the hash of the opened text
+        self._persisted: str | None = None
+        self._opened_digest: Future | None = None
+        self._document.contentsChange.connect(self.onContentsChange)
+        editor.installEventFilter(self)
+        configWatcher().settingsChanged.connect(self.onSettingsChanged)
+
+    def undoCount(self) -> int:
+        """
+        Returns:
+            int: The number of changes that can be undone.
+        """
+        return len(self._undo)
+
+    def redoCount(self) -> int:
+        """
+        Returns:
+            int: The number of changes that can be redone.
+        """
+        return len(self._redo)
+
+    def isUndoAvailable(self) -> bool:
+        """
+        Returns:
+            bool: True if a change can be undone, persisted ones included.
+        """
+        return bool(self._undo) or self._persisted is not None
+
+    def isRedoAvailable(self) -> bool:
+        """
+        Returns:
+            bool: True if a change can be redone.
+        """
+        return bool(self._redo)
+
+    def memoryUsage(self) -> int:
+        """
+        Returns:
+            int: The approximate memory held by the history in bytes.
+        """
+        return self._memory
+
+    def budget(self) -> int:
+        """
+        Returns:
+            int: The memory allowed for the history in bytes.
+        """
+        return self._budget
+
+    def clear(self):
+        """
+        Forget every recorded change, e.g. when a new document is loaded.
+        """
+        self._undo.clear()
+        self._redo.clear()
+        self._memory = 0
+        self._coalesce = False
+        self._persisted = None
+        self._opened_digest = None
+        self._document.clearUndoRedoStacks()
+        self._emitAvailability()
+
+    def setLongLines(self, long_lines):
+        """
+        Record the virtual breaks of long line mode in the entries.
+
+        Args:
+            long_lines (LongLines): The long line mode of the editor.
+        """
+        self._long_lines = long_lines
+
+    def _isLongLines(self) -> bool:
+        return self._long_lines is not None and self._long_lines.isActive()
+
+    def setFile(self, filename: str, text: str):
+        """
+        Start the history of a file that was just loaded, with the entries
+        persisted when it was last saved, if any.
+
+        Args:
+            filename (str): The path of the loaded file.
+            text (str): The loaded text.
+        """
+        self.clear()
+        # Entry positions count the virtual breaks of long line mode
+        if settings().undo_persist_enabled and not self._isLongLines():
+            path = _persistPath(filename)
+            if os.path.exists(path):
+                self._persisted = path
+                self._opened_digest = _executor.submit(_digest, text)
+                self._emitAvailability()
+
+    def persist(self, filename: str, text: str):
+        """
+        Write the undo entries of a saved document in the background.
+
+        Args:
+            filename (str): The path the document was saved to.
+            text (str): The saved text.
+        """
+        config = settings()
+        if not config.undo_persist_enabled or self._isLongLines():
+            return
+        # Entries still on disk were never read and stay valid
+        if self._persisted is not None:
+            self._loadPersisted()
+        edits = [(edit.position, edit.removed, edit.added) for edit in self._undo]
+        _executor.submit(
+            _writePersisted, _persistPath(filename), text, edits,
+            config.undo_persist_file_kb << 10, config.undo_persist_total_mb << 20
+        )
+
+    def undo(self):
+        """
+        Undo the last change and move the cursor after the restored text.
+        """
+        if not self._undo and self._persisted is not None:
+            self._loadPersisted()
+        if not self._undo:
+            return
+        edit = self._undo.pop()
+        self._apply(edit.position, edit.added, edit.removed)
+        self._redo.append(edit)
+        self._coalesce = False
+        self._emitAvailability()
+
+    def redo(self):
+        """
+        Redo the last undone change and move the cursor after its text.
+        """
+        if not self._redo:
+            return
+        edit = self._redo.pop()
+        self._apply(edit.position, edit.removed, edit.added)
+        self._undo.append(edit)
+        self._coalesce = False
+        self._emitAvailability()
+
+    def insertText(self, cursor: QTextCursor, text: str):
+        """
+        Replace the selection of a cursor with a text as a single entry.
+
+        The text is inserted in chunks inside one edit block, and recorded
+        as given instead of being read back from the document, which is
+        slow for a large paste.
+
+        Args:
+            cursor (QTextCursor): The cursor whose selection is replaced.
+            text (str): The plain text to insert.
+        """
+        position = cursor.selectionStart()
+        removed = self._text(position, cursor.selectionEnd())
+        self._applying = True
+        try:
+            cursor.beginEditBlock()
+            cursor.removeSelectedText()
+            for start in range(0, len(text), _insert_chunk):
+                cursor.insertText(text[start:start + _insert_chunk])
+            cursor.endEditBlock()
+            self._document.clearUndoRedoStacks()
+        finally:
+            self._applying = False
+        if removed or text:
+            self.edited.emit(position, removed, text)
+            self._push(_Edit(position, removed, text))
+
+    def eventFilter(self, obj: QObject, event: QEvent) -> bool:
+        """
+        Route the undo and redo shortcuts of the editor to the history.
+        """
+        if event.type() == QEvent.Type.KeyPress:
+            if event.matches(QKeySequence.StandardKey.Undo):
+                self.undo()
+                return True
+            if event.matches(QKeySequence.StandardKey.Redo):
+                self.redo()
+                return True
+        return False
+
+    def onContentsChange(self, position: int, removed: int, added: int):
+        """
+        Record a change of the document.
+
+        Args:
+            position (int): The position of the change.
+            removed (int): The number of characters removed.
+            added (int): The number of characters added.
+        """
+        # Changes without an undo command, like setPlainText, are not undoable
+        if self._applying or not self._document.isUndoAvailable():
+            return
+        added_text = self._text(position, position + added)
+        if removed == 0:
+            # Typing and pasting, nothing to read back
+            removed_text = ''
+            self._document.clearUndoRedoStacks()
+        else:
+            # Read the removed text from the undo command of the change
+            self._document.blockSignals(True)
+            try:
+                self._document.undo()
+                removed_text = self._text(position, position + removed, previous=True)
+                self._document.redo()
+                self._document.clearUndoRedoStacks()
+            finally:
+                self._document.blockSignals(False)
+        if removed_text == added_text:
+            # Format only change
+            return
+        self.edited.emit(position, removed_text, added_text)
+        self._push(_Edit(position, removed_text, added_text))
+
+    def onSettingsChanged(self, changed: frozenset[str]):
+        """
+        Apply a new memory budget.
+
+        Args:
+            changed (frozenset[str]): The names of the changed settings.
+        """
+        if 'undo_memory_budget_mb' in changed:
+            self._budget = settings().undo_memory_budget_mb << 20
+            self._trim()
+            self._emitAvailability()
+
+    def _loadPersisted(self):
+        """
+        Read the persisted entries under the entries of the session.
+        """
+        path = self._persisted
+        opened_digest = self._opened_digest.result()
+        self._persisted = None
+        self._opened_digest = None
+        edits = []
+        try:
+            with open(path, 'rb') as persisted:
+                data = persisted.read()
+            if not data.startswith(_persist_magic):
+                raise ValueError("not an undo history")
+            digest = data[len(_persist_magic):len(_persist_magic) + _digest_size]
+            if digest != opened_digest:
+                logger.info("Undo history %s does not match the opened file, discarded", path)
+            else:
+                edits = _decode(zlib.decompress(data[len(_persist_magic) + _digest_size:]))
+                # Mark as recently used
+                os.utime(path)
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.warning("Undo history %s not read. %s", path, e)
+        for edit in reversed(edits):
+            self._undo.appendleft(edit)
+            self._memory += edit.size()
+        self._trim()
+        self._emitAvailability()
+
+    def _text(self, start: int, end: int, previous: bool = False) -> str:
+        """
+        Returns the plain text of the document between two positions.
+        """
+        if self._isLongLines():
+            return self._long_lines.markedText(start, end, previous)
+        # The last position is the implicit paragraph separator of the document
+        end = min(end, self._document.characterCount() - 1)
+        if end <= start:
+            return ''
+        cursor = QTextCursor(self._document)
+        cursor.setPosition(start)
+        cursor.setPosition(end, QTextCursor.MoveMode.KeepAnchor)
+        return cursor.selectedText().replace('\u2029', '\n')
+
+    def _apply(self, position: int, current: str, replacement: str):
+        """
+        Replace the text of an entry in the document without recording it.
+        """
+        cursor = QTextCursor(self._document)
+        cursor.setPosition(position)
+        cursor.setPosition(position + _length(current), QTextCursor.MoveMode.KeepAnchor)
+        self._applying = True
+        try:
+            if self._isLongLines():
+                self._long_lines.insertMarked(cursor, replacement)
+            else:
+                cursor.insertText(replacement)
+            self._document.clearUndoRedoStacks()
+        finally:
+            self._applying = False
+        self.edited.emit(position, current, replacement)
+        self._editor.setTextCursor(cursor)
+
+    def _merge(self, edit: _Edit) -> bool:
+        """
+        Coalesce a change with the last entry when both are adjacent typing
+        or adjacent deletions.
+
+        Returns:
+            bool: True if the change was merged into the last entry.
+        """
+        if not self._coalesce or not self._undo:
+            return False
+        last = self._undo[-1]
+        if last.removed or edit.removed:
+            if last.added or edit.added or len(edit.removed) != 1:
+                return False
+            if edit.position == last.position:
+                # Delete
+                last.removed += edit.removed
+                return True
+            if edit.position + 1 == last.position:
+                # Backspace
+                last.removed = edit.removed + last.removed
+                last.position = edit.position
+                return True
+            return False
+        if len(edit.added) != 1 or edit.added == '\n':
+            return False
+        if edit.position != last.position + _length(last.added):
+            return False
+        # One entry per word and the spaces after it
+        if last.added[-1].isspace() and not edit.added.isspace():
+            return False
+        last.added += edit.added
+        return True
+
+    def _push(self, edit: _Edit):
+        """
+        Add a change to the history, dropping the redo entries and the
+        oldest entries over the memory budget.
+        """
+        for undone in self._redo:
+            self._memory -= undone.size()
+        self._redo.clear()
+        last_size = self._undo[-1].size() if self._undo else 0
+        if self._merge(edit):
+            self._memory += self._undo[-1].size() - last_size
+        else:
+            self._undo.append(edit)
+            self._memory += edit.size()
+        # Only single character edits are coalesced
+        self._coalesce = len(edit.added) + len(edit.removed) == 1
+        self._trim()
+        self._emitAvailability()
+
+    def _trim(self):
+        """
+        Drop the oldest entries until the history fits in its budget.
+        """
+        dropped = 0
+        if self._memory > self._budget:
+            # The persisted entries would no longer follow the oldest entry
+            self._persisted = None
+            self._opened_digest = None
+        while self._memory > self._budget and (self._undo or self._redo):
+            # Redo entries are dropped last, they are newer than every undo entry
+            edit = self._undo.popleft() if self._undo else self._redo.pop(0)
+            self._memory -= edit.size()
+            dropped += 1
+        if dropped:
+            logger.info(
+                "Dropped the %s oldest undo entries, over the budget of %s MB",
+                dropped, self._budget >> 20
+            )
+
+    def _emitAvailability(self):
+        """
+        Emit the availability signals when they change, and `changed`.
+        """
+        undo_available = self.isUndoAvailable()
+        if self._undo_available != undo_available:
+            self._undo_available = undo_available
+            self.undoAvailable.emit(self._undo_available)
+        if self._redo_available != self.isRedoAvailable():
+            self._redo_available = self.isRedoAvailable()
+            self.redoAvailable.emit(self._redo_available)
+        self.changed.emit()
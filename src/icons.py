@@ -0,0 +1,195 @@
+"""
+Icon bundle used in the Notepad application
+
+All the icons referenced by `config/menubar.json` and `config/app.json` are
+packed into a single bundle file, read with one I/O on first use and decoded
+only when an icon is requested. When the bundle is missing, or older than
+the configuration files or any of its images, the icons are loaded from the
+loose image files.
+
+Build the bundle from the repository root with:
+
+    python -m src.icons
+"""
+
+__all__ = ['icon', 'pixmap', 'buildBundle']
+__version__ = '0.1'
+__author__ = 'Victor M. Ortiz <Victor.M.Ortiz@outlook.com>'
+
+import json
+import os
+import struct
+from PyQt6.QtGui import QIcon, QPixmap
+from .config import settings, config_file
+from .logger import logger
+
+_bundle_file = 'cache/icons.bundle'
+_menubar_file = 'config/menubar.json'
+_magic = b'NPICONS1'
+# Settings holding image file names
+_app_icon_fields = ('window_icon', 'about_icon', 'about_logo')
+
+# Loaded bundle: file name -> (offset, length) in _bundle_data
+_bundle_index: dict[str, tuple[int, int]] | None = None
+_bundle_data = b''
+_pixmaps: dict[str, QPixmap] = {}
+
+def _stat(filename: str) -> list[int]:
+    """
+    Returns the modification time and the size of a file, zeros if it is
+    missing.
+    """
+    try:
+        stat = os.stat(filename)
+    except OSError:
+        return [0, 0]
+    return [stat.st_mtime_ns, stat.st_size]
+
+def _sources() -> dict[str, list[int]]:
+    """
+    Returns the modification time and the size of the files listing the
+    bundled icons and of the icons themselves.
+    """
+    filenames = [_menubar_file, config_file]
+    try:
+        filenames.extend(_iconFiles())
+    except (OSError, ValueError, KeyError):
+        # The menubar file cannot be read, its own stat stays in the key
+        pass
+    return {filename: _stat(filename) for filename in filenames}
+
+def _iconFiles() -> list[str]:
+    """
+    Collect the image files referenced by the configuration files.
+
+    Returns:
+        list[str]: The image file names, relative to the repository root.
+    """
+    with open(_menubar_file, 'r') as menubar_config:
+        menubar = json.load(menubar_config)
+    iconset = menubar['iconset']
+
+    def collect(nodes):
+        for node in nodes:
+            if 'icon' in node:
+                yield iconset + node['icon']
+            yield from collect(node.get('children', []))
+
+    filenames = list(collect(menubar['menubar']))
+    for field in _app_icon_fields:
+        filename = getattr(settings(), field)
+        if filename is not None:
+            filenames.append(filename)
+    return sorted(set(filenames))
+
+def buildBundle(bundle_file: str = _bundle_file) -> int:
+    """
+    Pack the icons referenced by the configuration files into one file.
+
+    The bundle starts with a magic string and the length of a JSON header
+    holding the modification time and size of each source file and the
+    offset and length of each icon, followed by the image data.
+
+    Args:
+        bundle_file (str): The bundle file to write.
+
+    Returns:
+        int: The number of icons packed.
+    """
+    index = {}
+    chunks = []
+    offset = 0
+    for filename in _iconFiles():
+        try:
+            with open(filename, 'rb') as image:
+                data = image.read()
+        except OSError as e:
+            logger.warning("Icon %s not bundled. %s", filename, e)
+            continue
+        index[filename] = (offset, len(data))
+        chunks.append(data)
+        offset += len(data)
+    header = json.dumps({'sources': _sources(), 'icons': index}).encode('utf-8')
+
+    os.makedirs(os.path.dirname(bundle_file) or '.', exist_ok=True)
+    temp_file = bundle_file + '.tmp'
+    with open(temp_file, 'wb') as bundle:
+        bundle.write(_magic + struct.pack('<I', len(header)) + header)
+        bundle.writelines(chunks)
+    os.replace(temp_file, bundle_file)
+    logger.info("Bundled %s icons in %s", len(index), bundle_file)
+    return len(index)
+
+def _loadBundle():
+    """
+    Read the bundle once, leaving it empty when it is missing or stale.
+    """
+    global _bundle_index, _bundle_data
+    _bundle_index = {}
+    try:
+        with open(_bundle_file, 'rb') as bundle:
+            data = bundle.read()
+    except FileNotFoundError:
+        logger.info("Icon bundle %s not found, using image files", _bundle_file)
+        return
+    except OSError as e:
+        logger.warning("Icon bundle %s not read. %s", _bundle_file, e)
+        return
+    try:
+        if not data.startswith(_magic):
+            raise ValueError('bad magic string')
+        start = len(_magic)
+        (header_length,) = struct.unpack_from('<I', data, start)
+        start += 4
+        header = json.loads(data[start:start + header_length])
+        start += header_length
+    except Exception as e:
+        logger.warning("Icon bundle %s is corrupt, using image files. %s", _bundle_file, e)
+        return
+    if header['sources'] != _sources():
+        logger.info("Icon bundle %s is stale, using image files", _bundle_file)
+        return
+    _bundle_data = data
+    _bundle_index = {
+        filename: (start + offset, length)
+        for filename, (offset, length) in header['icons'].items()
+    }
+
+def pixmap(filename: str) -> QPixmap:
+    """
+    Returns the image, decoded from the bundle or loaded from its file.
+
+    Args:
+        filename (str): The image file name, relative to the repository root.
+
+    Returns:
+        QPixmap: The image, null if it could not be loaded.
+    """
+    if filename in _pixmaps:
+        return _pixmaps[filename]
+    if _bundle_index is None:
+        _loadBundle()
+    image = QPixmap()
+    if filename in _bundle_index:
+        offset, length = _bundle_index[filename]
+        image.loadFromData(_bundle_data[offset:offset + length])
+    if image.isNull():
+        image.load(filename)
+    _pixmaps[filename] = image
+    return image
+
+def icon(filename: str) -> QIcon:
+    """
+    Returns the icon, decoded from the bundle or loaded from its file.
+
+    Args:
+        filename (str): The image file name, relative to the repository root.
+
+    Returns:
+        QIcon: The icon.
+    """
+    return QIcon(pixmap(filename))
+
+# Build step
+if __name__ == '__main__':
+    buildBundle()
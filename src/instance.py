@@ -0,0 +1,159 @@
+"""
+Single instance support for the Notepad application
+
+The first Notepad process listens on a local socket. Later launches connect
+to it, forward the files given on the command line and exit right away,
+without importing the widgets or building a window.
+
+This module only depends on `QtCore` and `QtNetwork` so that forwarding the
+files stays cheap.
+"""
+
+__all__ = ['serverName', 'forwardFiles', 'InstanceServer']
+__version__ = '0.1'
+__author__ = 'Victor M. Ortiz <Victor.M.Ortiz@outlook.com>'
+
+import getpass
+import logging
+from PyQt6.QtCore import QObject, pyqtSignal
+from PyQt6.QtNetwork import QLocalServer, QLocalSocket
+
+# Use the application logger without importing the Qt widgets
+logger = logging.getLogger('notepadLogger')
+
+# Milliseconds to wait on each step of the handshake with a running instance
+_timeout = 500
+
+def serverName() -> str:
+    """
+    Build the name of the local socket, unique for each user.
+
+    Returns:
+        str: The local socket name.
+    """
+    try:
+        user = getpass.getuser()
+    except Exception:
+        user = 'user'
+    return f'notepad-pyqt-{user}'
+
+def forwardFiles(filenames: list[str]) -> bool:
+    """
+    Send the files to a running Notepad instance.
+
+    The files are sent as absolute paths, each followed by a new line. An
+    empty list, sent as a single new line, asks the running instance to open
+    a new window.
+
+    Args:
+        filenames (list[str]): Absolute paths of the files to open.
+
+    Returns:
+        bool: True if a running instance received the files, False otherwise.
+    """
+    socket = QLocalSocket()
+    socket.connectToServer(serverName())
+    if not socket.waitForConnected(_timeout):
+        return False
+    socket.write(''.join(filename + '\n' for filename in filenames or ['']).encode('utf-8'))
+    if not socket.waitForBytesWritten(_timeout):
+        socket.abort()
+        return False
+    socket.disconnectFromServer()
+    if socket.state() != QLocalSocket.LocalSocketState.UnconnectedState:
+        socket.waitForDisconnected(_timeout)
+    return True
+
+def _isStale(name: str) -> bool:
+    """
+    Check whether a local socket is left behind by a process that is gone.
+
+    Args:
+        name (str): The local socket name.
+
+    Returns:
+        bool: True if no server accepts connections on the socket.
+    """
+    socket = QLocalSocket()
+    socket.connectToServer(name)
+    if socket.waitForConnected(_timeout):
+        socket.disconnectFromServer()
+        return False
+    return socket.error() in (
+        QLocalSocket.LocalSocketError.ServerNotFoundError,
+        QLocalSocket.LocalSocketError.ConnectionRefusedError
+    )
+
+
+class InstanceServer(QLocalServer):
+    """
+    Local server that receives the files forwarded by later launches.
+    """
+
+    filesReceived = pyqtSignal(list)
+
+    def __init__(self, parent: QObject = None):
+        """
+        Initialize the InstanceServer.
+
+        Args:
+            parent (QObject): The parent object.
+        """
+        super().__init__(parent)
+        self.newConnection.connect(self.onNewConnection)
+
+    def start(self) -> bool:
+        """
+        Start listening on the local socket.
+
+        Returns:
+            bool: True if the server is listening, False otherwise.
+        """
+        name = serverName()
+        if not self.listen(name):
+            # A crashed process may have left a stale socket behind, but a
+            # live or busy instance, or one started at the same time, keeps
+            # its socket
+            if not _isStale(name):
+                logger.warning("Single instance server not started, %s is in use", name)
+                return False
+            QLocalServer.removeServer(name)
+            if not self.listen(name):
+                logger.warning("Single instance server not started. %s", self.errorString())
+                return False
+        logger.info("Single instance server listening on %s", self.fullServerName())
+        return True
+
+    def onNewConnection(self):
+        """
+        Collect the data sent by each new client until it disconnects.
+        """
+        while self.hasPendingConnections():
+            socket = self.nextPendingConnection()
+            data = bytearray()
+            socket.readyRead.connect(
+                lambda s=socket, d=data: d.extend(s.readAll().data())
+            )
+            socket.disconnected.connect(
+                lambda s=socket, d=data: self.onClientDisconnected(s, d)
+            )
+
+    def onClientDisconnected(self, socket: QLocalSocket, data: bytearray):
+        """
+        Decode the forwarded file paths and emit them. A client sending
+        nothing is another instance probing the socket.
+
+        Args:
+            socket (QLocalSocket): The disconnected client socket.
+            data (bytearray): The data received from the client.
+        """
+        data.extend(socket.readAll().data())
+        socket.deleteLater()
+        if not data:
+            return
+        filenames = [
+            filename for filename in data.decode('utf-8').split('\n')
+            if filename != ''
+        ]
+        logger.info("Received %s file(s) from another instance", len(filenames))
+        self.filesReceived.emit(filenames)
@@ -0,0 +1,116 @@
+"""
+Built-in highlighting rule sets used in the Notepad application
+
+JSON, INI, YAML and log files. YAML keeps the indentation of a block
+scalar in the state, so its lines are strings, and a log keeps whether the
+last record is an error, so its stack trace is highlighted with it.
+"""
+
+__all__ = ['Json', 'Ini', 'Yaml', 'Log']
+__version__ = '0.1'
+__author__ = 'Victor M. Ortiz <Victor.M.Ortiz@outlook.com>'
+
+import re
+from .highlighter import Language, registerLanguage
+
+_number = r'(?<![\w.])-?\d+(?:\.\d+)?(?:[eE][+-]?\d+)?(?![\w.])'
+
+
+class Json(Language):
+    """
+    JSON and JSON Lines.
+    """
+
+    name = 'JSON'
+    extensions = ('.json', '.jsonl', '.geojson')
+    rules = (
+        (r'"(?:[^"\\]|\\.)*"(?=\s*:)', 'key'),
+        (r'"(?:[^"\\]|\\.)*"?', 'string'),
+        (_number, 'number'),
+        (r'\b(?:true|false|null)\b', 'keyword'),
+        (r'[{}\[\],:]', 'punctuation'),
+    )
+
+
+class Ini(Language):
+    """
+    INI, configuration and properties files.
+    """
+
+    name = 'INI'
+    extensions = ('.ini', '.cfg', '.conf', '.properties', '.desktop')
+    rules = (
+        (r'^\s*[;#].*', 'comment'),
+        (r'^\s*\[[^\]]*\]?', 'section'),
+        (r'^\s*[^\s=:;#\[][^=:]*?(?=\s*[=:])', 'key'),
+        (r'"[^"]*"?|\'[^\']*\'?', 'string'),
+        (_number, 'number'),
+        (r'(?i:\b(?:true|false|yes|no|on|off)\b)', 'keyword'),
+        (r'[=:]', 'punctuation'),
+    )
+
+
+class Yaml(Language):
+    """
+    YAML. The state is 0, or one more than the indentation of the line
+    opening the block scalar the line is in.
+    """
+
+    name = 'YAML'
+    extensions = ('.yaml', '.yml')
+    rules = (
+        (r'(?:^|(?<=\s))#.*', 'comment'),
+        (r'^(?:---|\.\.\.)(?=\s|$)', 'keyword'),
+        (r'(?:"[^"]*"|\'[^\']*\'|[^\s#\'"\-?:,\[\]{}][^#:]*?)(?=\s*:(?:\s|$))', 'key'),
+        (r'"(?:[^"\\]|\\.)*"?|\'(?:[^\']|\'\')*\'?', 'string'),
+        (r'[&*][^\s,\[\]{}]+|!\S*', 'keyword'),
+        (_number, 'number'),
+        (r'(?:\b(?:true|false|yes|no|on|off|null)\b|~)(?=\s*(?:#|$|,|\]|\}))', 'keyword'),
+        (r'-(?=\s|$)|[:?,\[\]{}|>]', 'punctuation'),
+    )
+    _block_scalar = re.compile(r'(?:^\s*-|:)\s+[|>][-+1-9]*\s*(?:#.*)?$')
+
+    def highlight(self, text: str, state: int) -> tuple[list[tuple[int, int, str]], int]:
+        stripped = text.lstrip(' ')
+        indent = len(text) - len(stripped)
+        if state:
+            # Blank lines and lines indented more than the opening line
+            if not stripped:
+                return [], state
+            if indent >= state:
+                return [(indent, len(stripped), 'string')], state
+        spans = self.match(text)
+        if self._block_scalar.search(text):
+            return spans, indent + 1
+        return spans, 0
+
+
+class Log(Language):
+    """
+    Log files whose records start with a date. The state is 1 within an
+    error record, so the lines of its stack trace are highlighted with it.
+    """
+
+    name = 'Log'
+    extensions = ('.log',)
+    rules = (
+        (r'^\[?\d{4}-\d{2}-\d{2}[ T]\d{2}:\d{2}:\d{2}(?:[.,]\d+)?(?:Z|[+-]\d{2}:?\d{2})?\]?', 'date'),
+        (r'\b(?:CRITICAL|FATAL|ERROR|SEVERE)\b', 'error'),
+        (r'\b(?:WARNING|WARN)\b', 'warning'),
+        (r'\bINFO\b', 'info'),
+        (r'\b(?:DEBUG|TRACE)\b', 'debug'),
+        (r'"[^"]*"', 'string'),
+    )
+    _record = re.compile(r'\[?\d{4}-\d{2}-\d{2}[ T]\d{2}:\d{2}')
+
+    def highlight(self, text: str, state: int) -> tuple[list[tuple[int, int, str]], int]:
+        if not self._record.match(text):
+            if state and text.strip():
+                return [(0, len(text), 'error')], state
+            return self.match(text), state
+        spans = self.match(text)
+        return spans, int(any(kind == 'error' for _, _, kind in spans))
+
+
+for _language in (Json(), Ini(), Yaml(), Log()):
+    registerLanguage(_language)
@@ -1,27 +1,75 @@
+"""
+Logging used in the Notepad application
+
+The handlers declared in `config/logging.conf` for `notepadLogger` run on a
+background thread. The logger itself only puts records on a queue, so the
+GUI thread never waits on the console or the log file. The listener writes
+every record waiting in the queue before flushing the handlers once, and
+the log file is rotated by size.
+
+Log calls should pass their arguments separately, e.g.
+`logger.debug("Opened %s", filename)`, so messages below the logger level
+are never formatted.
+"""
+
 __all__ = ['logger', 'showError', 'showWarning']
 __version__ = '0.1'
 __author__ = 'Victor M. Ortiz <Victor.M.Ortiz@outlook.com>'
 
+import atexit
 import logging
 import logging.config
+import logging.handlers
+import queue
 from PyQt6.QtWidgets import QMessageBox
+from .loghandlers import DeferredFlushMixin
+
+class _BatchingQueueListener(logging.handlers.QueueListener):
+    """
+    Queue listener that flushes its handlers when the queue is drained.
+    """
+
+    def handle(self, record: logging.LogRecord):
+        super().handle(record)
+        if self.queue.empty():
+            for handler in self.handlers:
+                if isinstance(handler, DeferredFlushMixin):
+                    handler.flushBatch()
+                else:
+                    handler.flush()
 
 # Logging
-logging.config.fileConfig('config/logging.conf')
+logging.config.fileConfig('config/logging.conf', disable_existing_loggers=False)
 logger = logging.getLogger('notepadLogger')
 
+# Move the configured handlers behind a queue
+_queue = queue.SimpleQueue()
+_listener = _BatchingQueueListener(_queue, *logger.handlers, respect_handler_level=True)
+for _handler in list(logger.handlers):
+    logger.removeHandler(_handler)
+logger.addHandler(logging.handlers.QueueHandler(_queue))
+_listener.start()
+
+@atexit.register
+def _stopListener():
+    """
+    Write the records left in the queue. `logging.shutdown`, registered
+    before and so run after, flushes and closes the handlers.
+    """
+    _listener.stop()
+
 def showError(error_msg):
     logger.error(error_msg)
     QMessageBox.critical(
-        title = 'Error', 
-        text = error_msg, 
+        title = 'Error',
+        text = error_msg,
         buttons = QMessageBox.StandardButton.Ok
     )
 
 def showWarning(warning_msg):
-    logger.warn(warning_msg)
+    logger.warning(warning_msg)
     QMessageBox.warning(
         title = 'Warning',
         text = warning_msg,
         buttons = QMessageBox.StandardButton.Ok
-    )
\ No newline at end of file
+    )
@@ -0,0 +1,51 @@
+"""
+Logging handlers used in the Notepad application
+
+These handlers are declared in `config/logging.conf`. They skip the flush
+after each record so that the queue listener in `logger` can flush them
+once per batch of records.
+"""
+
+__all__ = ['DeferredFlushMixin', 'BufferedStreamHandler', 'BufferedRotatingFileHandler']
+__version__ = '0.1'
+__author__ = 'Victor M. Ortiz <Victor.M.Ortiz@outlook.com>'
+
+import logging
+import logging.handlers
+import os
+
+class DeferredFlushMixin:
+    """
+    Handler mixin that skips the flush after each record. The listener
+    calls `flushBatch` once the queue is drained.
+    """
+    _deferred = True
+
+    def flush(self):
+        if not self._deferred:
+            super().flush()
+
+    def flushBatch(self):
+        self._deferred = False
+        try:
+            self.flush()
+        finally:
+            self._deferred = True
+
+    def close(self):
+        self.flushBatch()
+        super().close()
+
+class BufferedStreamHandler(DeferredFlushMixin, logging.StreamHandler):
+    """
+    Stream handler flushed once per batch of records.
+    """
+
+class BufferedRotatingFileHandler(DeferredFlushMixin, logging.handlers.RotatingFileHandler):
+    """
+    Size rotating file handler flushed once per batch of records.
+    """
+
+    def __init__(self, filename, *args, **kwargs):
+        os.makedirs(os.path.dirname(filename) or '.', exist_ok=True)
+        super().__init__(filename, *args, **kwargs)
@@ -0,0 +1,461 @@
+"""
+Long line mode used in the Notepad application
+
+`QTextEdit` lays out each paragraph as a whole, so lines of megabytes, as
+in minified JSON or some logs, make every edit and cursor move relayout
+the whole line. When a loaded file has a line longer than the
+`long-line-threshold` setting, `LongLines` shows each long line as virtual
+segments of `long-line-segment` characters, one block each, so only the
+edited segment is laid out again.
+
+A block continuing the line of the previous block is marked with a user
+state, and a sorted list of their block numbers is kept up to date on each
+change. The virtual breaks between segments are never part of the text:
+saving, copying, Ln/Col, go to line, moving the cursor or deleting over a
+break, and find all work with the true text.
+"""
+
+__all__ = ['LongLines', 'VIRTUAL_BREAK']
+__version__ = '0.1'
+__author__ = 'Victor M. Ortiz <Victor.M.Ortiz@outlook.com>'
+
+import bisect
+import re
+from PyQt6.QtCore import QEvent, QObject, Qt
+from PyQt6.QtGui import QGuiApplication, QKeySequence, QTextCursor, QTextDocument
+from PyQt6.QtWidgets import QTextEdit
+from .config import settings
+from .logger import logger
+
+# Block user state of a segment continuing the line of the previous block
+_continuation = 1
+# Stands for a virtual break in the text exchanged with the undo history,
+# a Unicode noncharacter that never appears in a text file
+VIRTUAL_BREAK = '\ufdd0'
+
+def _length(text: str) -> int:
+    """
+    Returns the length of a text in document positions.
+    """
+    if text.isascii():
+        return len(text)
+    return len(text.encode('utf-16-le', 'surrogatepass')) // 2
+
+def _slice(text: str, start: int, end: int) -> str:
+    """
+    Returns the part of a text between two offsets in document positions.
+    """
+    if text.isascii():
+        return text[start:end]
+    data = text.encode('utf-16-le', 'surrogatepass')
+    return data[start * 2:end * 2].decode('utf-16-le', 'surrogatepass')
+
+
+class LongLines(QObject):
+    """
+    Shows the long lines of an editor as virtual segments.
+
+    It must be created after the `UndoHistory` of the editor, so the history
+    reads each change before the segments are updated.
+    """
+
+    def __init__(self, editor: QTextEdit):
+        """
+        Initialize the LongLines.
+
+        Args:
+            editor (QTextEdit): The editor showing the document.
+        """
+        super().__init__(editor)
+        self._editor = editor
+        self._document = editor.document()
+        self._active = False
+        # Sorted block numbers of the continuation segments, updated after
+        # the undo history has read each change
+        self._continuations: list[int] = []
+        self._block_count = 0
+        self._document.contentsChange.connect(self.onContentsChange)
+        editor.installEventFilter(self)
+
+    def isActive(self) -> bool:
+        """
+        Returns:
+            bool: True if the document is shown as segments.
+        """
+        return self._active
+
+    def clear(self):
+        """
+        Leave long line mode, e.g. when the editor is cleared.
+        """
+        self._active = False
+        self._continuations = []
+
+    def load(self, text: str) -> bool:
+        """
+        Load a text in the editor as segments if it has a long line.
+
+        Args:
+            text (str): The text to load.
+
+        Returns:
+            bool: True if the text was loaded in long line mode, False if
+                it has no long line and was not loaded.
+        """
+        self.clear()
+        config = settings()
+        threshold = config.long_line_threshold
+        if threshold <= 0 or len(text) <= threshold \
+                or re.search(f'[^\\n]{{{threshold + 1}}}', text) is None:
+            return False
+
+        size = config.long_line_segment
+        segments = []
+        continuations = []
+        for line in text.split('\n'):
+            if len(line) <= size:
+                segments.append(line)
+                continue
+            for start in range(0, len(line), size):
+                if start:
+                    continuations.append(len(segments))
+                segments.append(line[start:start + size])
+        # Set first, so the line count is right when the text is replaced
+        self._continuations = continuations
+        self._editor.setPlainText('\n'.join(segments))
+        for number in continuations:
+            self._document.findBlockByNumber(number).setUserState(_continuation)
+        self._block_count = self._document.blockCount()
+        self._active = True
+        logger.info("Long line mode, %s virtual segments of %s characters", len(continuations), size)
+        return True
+
+    def text(self) -> str:
+        """
+        Returns:
+            str: The true text of the document, without virtual breaks.
+        """
+        if not self._active:
+            return self._document.toPlainText()
+        return self.trueText(0, self._document.characterCount() - 1)
+
+    def trueText(self, start: int, end: int) -> str:
+        """
+        Returns the text between two document positions without virtual breaks.
+        """
+        return self._join(start, end, self._cachedBreaks(start, end), '')
+
+    def markedText(self, start: int, end: int, previous: bool = False) -> str:
+        """
+        Returns the text between two document positions with the virtual
+        breaks as `VIRTUAL_BREAK`, for the undo history.
+
+        Args:
+            start (int): The first position.
+            end (int): The position after the last character.
+            previous (bool): Whether the document is in the state before the
+                change being recorded, instead of after it.
+        """
+        if previous:
+            # The cached continuations still describe the document before
+            # the change
+            breaks = self._cachedBreaks(start, end)
+        else:
+            # The continuations are not updated yet, read the block states
+            breaks = []
+            block = self._document.findBlock(start).next()
+            while block.isValid() and block.position() - 1 < end:
+                if block.userState() == _continuation:
+                    breaks.append(block.position() - 1)
+                block = block.next()
+        return self._join(start, end, breaks, VIRTUAL_BREAK)
+
+    def insertMarked(self, cursor: QTextCursor, text: str):
+        """
+        Replace the selection of a cursor with a text from `markedText`,
+        restoring its virtual breaks.
+        """
+        cursor.beginEditBlock()
+        pieces = text.split(VIRTUAL_BREAK)
+        cursor.insertText(pieces[0])
+        for piece in pieces[1:]:
+            cursor.insertBlock()
+            cursor.block().setUserState(_continuation)
+            cursor.insertText(piece)
+        cursor.endEditBlock()
+
+    def position(self, cursor: QTextCursor) -> tuple[int, int]:
+        """
+        Returns the true line and column of a cursor, counted from 1.
+        """
+        block = cursor.block()
+        number = block.blockNumber()
+        line = number + 1 - bisect.bisect_right(self._continuations, number)
+        col = cursor.positionInBlock() + 1
+        while block.userState() == _continuation:
+            block = block.previous()
+            col += block.length() - 1
+        return line, col
+
+    def lineNumber(self, number: int) -> int | None:
+        """
+        Returns the true line of a block, counted from 1, or None if the
+        block continues the line of the previous one.
+
+        Args:
+            number (int): The block number.
+        """
+        index = bisect.bisect_left(self._continuations, number)
+        if index < len(self._continuations) and self._continuations[index] == number:
+            return None
+        return number + 1 - index
+
+    def lineCount(self) -> int:
+        """
+        Returns:
+            int: The number of true lines in the document.
+        """
+        return self._document.blockCount() - len(self._continuations)
+
+    def lineStart(self, line: int) -> int:
+        """
+        Returns the document position of the start of a true line.
+
+        Args:
+            line (int): The line number, counted from 1.
+        """
+        # Smallest block number whose number of line starts up to it reaches the line
+        number = line - 1
+        while True:
+            following = line - 1 + bisect.bisect_right(self._continuations, number)
+            if following == number:
+                break
+            number = following
+        block = self._document.findBlockByNumber(number)
+        if not block.isValid():
+            return self._document.characterCount() - 1
+        return block.position()
+
+    def find(self, text: str, flags: QTextDocument.FindFlag = QTextDocument.FindFlag(0)) -> bool:
+        """
+        Find and select the next occurrence of a text from the editor cursor,
+        like `QTextEdit.find`, including occurrences over virtual breaks.
+
+        Args:
+            text (str): The text to find.
+            flags (QTextDocument.FindFlag): The search options.
+
+        Returns:
+            bool: True if the text was found.
+        """
+        if not self._active or not text:
+            return self._editor.find(text, flags)
+        backward = bool(flags & QTextDocument.FindFlag.FindBackward)
+        cursor = self._editor.textCursor()
+        found = self._document.find(text, cursor, flags)
+        spanning = self._findSpanning(
+            text, cursor, flags, None if found.isNull() else found
+        )
+        if spanning is not None:
+            found = spanning
+        if found.isNull():
+            return False
+        if backward:
+            # Same selection direction as QTextEdit.find
+            start, end = found.selectionEnd(), found.selectionStart()
+            found.setPosition(start)
+            found.setPosition(end, QTextCursor.MoveMode.KeepAnchor)
+        self._editor.setTextCursor(found)
+        return True
+
+    def copy(self):
+        """
+        Copy the selection to the clipboard without virtual breaks.
+        """
+        if not self._active:
+            self._editor.copy()
+            return
+        cursor = self._editor.textCursor()
+        if cursor.hasSelection():
+            QGuiApplication.clipboard().setText(
+                self.trueText(cursor.selectionStart(), cursor.selectionEnd())
+            )
+
+    def cut(self):
+        """
+        Cut the selection to the clipboard without virtual breaks.
+        """
+        if not self._active:
+            self._editor.cut()
+            return
+        self.copy()
+        self._editor.textCursor().removeSelectedText()
+
+    def eventFilter(self, obj: QObject, event: QEvent) -> bool:
+        """
+        Handle the keys that would stop at or delete a virtual break.
+        """
+        if not self._active or event.type() != QEvent.Type.KeyPress:
+            return False
+        if event.matches(QKeySequence.StandardKey.Copy):
+            self.copy()
+            return True
+        if event.matches(QKeySequence.StandardKey.Cut):
+            self.cut()
+            return True
+        modifiers = event.modifiers() & ~Qt.KeyboardModifier.KeypadModifier
+        if modifiers not in (Qt.KeyboardModifier.NoModifier, Qt.KeyboardModifier.ShiftModifier):
+            return False
+        cursor = self._editor.textCursor()
+        mode = QTextCursor.MoveMode.KeepAnchor if modifiers else QTextCursor.MoveMode.MoveAnchor
+        at_virtual_start = cursor.atBlockStart() and cursor.block().userState() == _continuation
+        at_virtual_end = cursor.atBlockEnd() and cursor.block().next().userState() == _continuation
+        match event.key():
+            case Qt.Key.Key_Right if at_virtual_end and (modifiers or not cursor.hasSelection()):
+                cursor.movePosition(QTextCursor.MoveOperation.NextCharacter, mode, 2)
+            case Qt.Key.Key_Left if at_virtual_start and (modifiers or not cursor.hasSelection()):
+                cursor.movePosition(QTextCursor.MoveOperation.PreviousCharacter, mode, 2)
+            case Qt.Key.Key_Backspace if at_virtual_start and not modifiers and not cursor.hasSelection():
+                cursor.movePosition(QTextCursor.MoveOperation.PreviousCharacter)
+                cursor.deletePreviousChar()
+            case Qt.Key.Key_Delete if at_virtual_end and not modifiers and not cursor.hasSelection():
+                cursor.movePosition(QTextCursor.MoveOperation.NextCharacter)
+                cursor.deleteChar()
+            case _:
+                return False
+        self._editor.setTextCursor(cursor)
+        return True
+
+    def onContentsChange(self, position: int, removed: int, added: int):
+        """
+        Update the continuation segments after a change of the document.
+
+        Args:
+            position (int): The position of the change.
+            removed (int): The number of characters removed.
+            added (int): The number of characters added.
+        """
+        if not self._active:
+            return
+        previous = self._continuations
+        block_count = self._document.blockCount()
+        delta = block_count - self._block_count
+        self._block_count = block_count
+        end = min(position + added, self._document.characterCount() - 1)
+        first = self._document.findBlock(position)
+        first_number = first.blockNumber()
+        last_number = self._document.findBlock(end).blockNumber()
+
+        # A block merged with the next ones takes their state, the first
+        # block of the change keeps the state it had before
+        was_continuation = first_number in previous[
+            bisect.bisect_left(previous, first_number):bisect.bisect_right(previous, first_number)
+        ]
+        first.setUserState(_continuation if was_continuation else -1)
+        changed = [first_number] if was_continuation else []
+        block = first.next()
+        while block.isValid() and block.blockNumber() <= last_number:
+            if block.userState() == _continuation:
+                changed.append(block.blockNumber())
+            block = block.next()
+        following = bisect.bisect_right(previous, last_number - delta)
+        self._continuations = (
+            previous[:bisect.bisect_left(previous, first_number)]
+            + changed
+            + [number + delta for number in previous[following:]]
+        )
+
+    def _cachedBreaks(self, start: int, end: int) -> list[int]:
+        """
+        Returns the positions of the virtual breaks between two positions.
+        """
+        continuations = self._continuations
+        first = self._document.findBlock(start).blockNumber()
+        last = self._document.findBlock(end).blockNumber()
+        breaks = []
+        for number in continuations[bisect.bisect_right(continuations, first):bisect.bisect_right(continuations, last)]:
+            position = self._document.findBlockByNumber(number).position() - 1
+            if start <= position < end:
+                breaks.append(position)
+        return breaks
+
+    def _join(self, start: int, end: int, breaks: list[int], separator: str) -> str:
+        """
+        Returns the text between two positions, with a separator in place of
+        each virtual break.
+        """
+        end = min(end, self._document.characterCount() - 1)
+        if end <= start:
+            return ''
+        # A single selection, the cursor lays out the block at each position
+        cursor = QTextCursor(self._document)
+        cursor.setPosition(start)
+        cursor.setPosition(end, QTextCursor.MoveMode.KeepAnchor)
+        text = cursor.selectedText().replace('\u2029', '\n')
+        if not breaks:
+            return text
+        pieces = []
+        offset = 0
+        for stop in breaks:
+            pieces.append(_slice(text, offset, stop - start))
+            offset = stop - start + 1
+        pieces.append(_slice(text, offset, end - start))
+        return separator.join(pieces)
+
+    def _findSpanning(self, text: str, cursor: QTextCursor, flags: QTextDocument.FindFlag,
+            limit: QTextCursor | None) -> QTextCursor | None:
+        """
+        Find the nearest occurrence over a virtual break that comes before
+        an occurrence found within the segments.
+
+        Returns:
+            QTextCursor | None: The occurrence selected, or None.
+        """
+        backward = bool(flags & QTextDocument.FindFlag.FindBackward)
+        # Lookahead to find overlapping occurrences
+        pattern = re.compile(
+            f'(?=({re.escape(text)}))',
+            0 if flags & QTextDocument.FindFlag.FindCaseSensitively else re.IGNORECASE
+        )
+        span = _length(text) - 1
+        origin = cursor.selectionStart() if backward else cursor.selectionEnd()
+        block_number = self._document.findBlock(origin).blockNumber()
+        continuations = self._continuations
+        if backward:
+            numbers = reversed(continuations[:bisect.bisect_right(continuations, block_number)])
+        else:
+            numbers = continuations[bisect.bisect_right(continuations, block_number):]
+
+        for number in numbers:
+            segment = self._document.findBlockByNumber(number)
+            position = segment.position() - 1
+            # Past the occurrence found within the segments
+            if limit is not None and (
+                position < limit.selectionStart() if backward
+                else position - span > limit.selectionStart()
+            ):
+                return None
+            left_start = max(segment.previous().position(), position - span)
+            right_end = min(segment.position() + segment.length() - 1, position + 1 + span)
+            previous = segment.previous()
+            left = _slice(previous.text(), left_start - previous.position(), position - previous.position())
+            right = _slice(segment.text(), 0, right_end - position - 1)
+            matches = []
+            for match in pattern.finditer(left + right):
+                if match.start(1) < len(left) < match.end(1):
+                    match_start = left_start + _length(left[:match.start(1)])
+                    match_end = position + 1 + _length(right[:match.end(1) - len(left)])
+                    if (match_end <= origin) if backward else (match_start >= origin):
+                        matches.append((match_start, match_end))
+            if matches:
+                match_start, match_end = matches[-1] if backward else matches[0]
+                if limit is not None and (
+                    match_start < limit.selectionStart() if backward
+                    else match_start > limit.selectionStart()
+                ):
+                    return None
+                found = QTextCursor(self._document)
+                found.setPosition(match_start)
+                found.setPosition(match_end, QTextCursor.MoveMode.KeepAnchor)
+                return found
+        return None
@@ -0,0 +1,178 @@
+"""
+Printing and PDF export used in the Notepad application
+
+`PrintJob` paints a snapshot of the text taken when the job starts, so the
+editor can be used and changed while it runs. A worker thread lays out one
+line at a time with `QTextLayout`, wrapped to the width of the page, and
+paints its lines until the page is full, then starts the next page. The
+pages are streamed to the printer, or to the PDF file, as they are painted
+and the layout of the whole document is never held, so a large log prints
+in constant memory. The job reports its progress after each page and can
+be cancelled between pages.
+"""
+
+__all__ = ['PrintJob']
+__version__ = '0.1'
+__author__ = 'Victor M. Ortiz <Victor.M.Ortiz@outlook.com>'
+
+import os
+import threading
+import time
+from PyQt6.QtCore import QObject, QPointF, pyqtSignal
+from PyQt6.QtGui import QFont, QPainter, QTextLayout, QTextOption
+from PyQt6.QtPrintSupport import QPrinter
+from .logger import logger
+
+
+class PrintJob(QObject):
+    """
+    Prints a text in a worker thread, a page at a time.
+
+    The job must be created in the GUI thread, its signals are queued to it.
+    The printer must not be changed until the job is finished.
+    """
+
+    # Emitted after each page with the pages painted and the percentage done
+    progress = pyqtSignal(int, int)
+    # Emitted at the end with the pages painted and an error message, empty
+    # when the job completed, cancelled when it was cancelled
+    finished = pyqtSignal(int, str)
+
+    def __init__(self, printer: QPrinter, text: str, font: QFont, parent: QObject = None):
+        """
+        Initialize the PrintJob.
+
+        Args:
+            printer (QPrinter): The printer, or a printer with the PDF output format.
+            text (str): The text to print.
+            font (QFont): The font of the text.
+            parent (QObject): The parent object.
+        """
+        super().__init__(parent)
+        self._printer = printer
+        self._text = text
+        self._font = QFont(font)
+        self._cancel = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def start(self):
+        """
+        Start printing in the worker thread.
+        """
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='PrintJob', daemon=True)
+            self._thread.start()
+
+    def cancel(self):
+        """
+        Stop printing after the page being painted.
+        """
+        self._cancel.set()
+
+    def isRunning(self) -> bool:
+        """
+        Returns:
+            bool: True if the worker thread is printing.
+        """
+        return self._thread is not None and self._thread.is_alive()
+
+    def wait(self, timeout: float | None = None) -> bool:
+        """
+        Wait for the worker thread to finish.
+
+        Args:
+            timeout (float | None): The longest wait in seconds, None to wait
+                until it finishes.
+
+        Returns:
+            bool: True if the worker thread finished.
+        """
+        if self._thread is not None:
+            self._thread.join(timeout)
+        return not self.isRunning()
+
+    def _run(self):
+        """
+        Paint the pages in the worker thread and report how it ended.
+        """
+        start = time.perf_counter()
+        pages = 0
+        try:
+            pages = self._paint()
+        except Exception as e:
+            logger.exception("Printing failed")
+            self.finished.emit(pages, str(e))
+            return
+        if self._cancel.is_set():
+            filename = self._printer.outputFileName()
+            if filename and os.path.exists(filename):
+                # A partial PDF file is useless
+                os.remove(filename)
+            logger.info("Printing cancelled after %s pages", pages)
+            self.finished.emit(pages, 'cancelled')
+            return
+        logger.info("Printed %s pages in %.2f s", pages, time.perf_counter() - start)
+        self.finished.emit(pages, '')
+
+    def _paint(self) -> int:
+        """
+        Lay out the text line by line and paint it on the pages of the
+        printer range.
+
+        Returns:
+            int: The number of pages painted.
+        """
+        printer = self._printer
+        painter = QPainter()
+        if not painter.begin(printer):
+            raise OSError("The printer could not be started")
+        page_rect = printer.pageRect(QPrinter.Unit.DevicePixel)
+        width, height = page_rect.width(), page_rect.height()
+        # Pages are counted from 1, 0 means no limit
+        first = max(printer.fromPage(), 1)
+        last = printer.toPage() or None
+        option = QTextOption()
+        option.setWrapMode(QTextOption.WrapMode.WrapAtWordBoundaryOrAnywhere)
+
+        page = 1
+        painted = 0
+        done = 0
+        total = max(len(self._text), 1)
+        y = 0.0
+        try:
+            for text in self._text.split('\n'):
+                layout = QTextLayout(text, self._font, printer)
+                layout.setTextOption(option)
+                layout.beginLayout()
+                while True:
+                    line = layout.createLine()
+                    if not line.isValid():
+                        break
+                    line.setLineWidth(width)
+                layout.endLayout()
+
+                for number in range(layout.lineCount()):
+                    line = layout.lineAt(number)
+                    if y > 0 and y + line.height() > height:
+                        # Page full
+                        if page >= first:
+                            painted += 1
+                            self.progress.emit(painted, done * 100 // total)
+                        if self._cancel.is_set() or (last is not None and page >= last):
+                            return painted
+                        page += 1
+                        y = 0.0
+                        if first < page and (last is None or page <= last):
+                            printer.newPage()
+                    if page >= first:
+                        line.draw(painter, QPointF(0, y - line.y()))
+                    y += line.height()
+                done += len(text) + 1
+            if page >= first:
+                painted += 1
+                self.progress.emit(painted, 100)
+            return painted
+        finally:
+            if self._cancel.is_set():
+                printer.abort()
+            painter.end()
@@ -0,0 +1,69 @@
+"""
+On-demand profiling of the Notepad application
+
+Profiles the GUI thread with `cProfile` between `start` and `stop`, which
+covers every slot and event handler run by the Qt event loop in between.
+When stopped, the statistics are written to the profile directory as a
+`.pstats` file, readable with `pstats` or `snakeviz`, and as a text summary
+of the functions with the highest cumulative time.
+"""
+
+__all__ = ['start', 'stop', 'isRunning']
+__version__ = '0.1'
+__author__ = 'Victor M. Ortiz <Victor.M.Ortiz@outlook.com>'
+
+import cProfile
+import datetime as dt
+import os
+import pstats
+from .config import settings
+from .logger import logger
+
+_profile: cProfile.Profile | None = None
+
+def isRunning() -> bool:
+    """
+    Returns:
+        bool: True if the GUI thread is being profiled.
+    """
+    return _profile is not None
+
+def start():
+    """
+    Start profiling the calling thread, which should be the GUI thread.
+    """
+    global _profile
+    if _profile is not None:
+        return
+    _profile = cProfile.Profile()
+    _profile.enable()
+    logger.info("Profiling started")
+
+def stop() -> tuple[str, str] | None:
+    """
+    Stop profiling and write the statistics and their summary.
+
+    Returns:
+        tuple[str, str] | None: The paths of the `.pstats` file and of the
+            text summary, or None if the profiler was not running.
+    """
+    global _profile
+    if _profile is None:
+        return None
+    profile = _profile
+    profile.disable()
+    _profile = None
+
+    config = settings()
+    os.makedirs(config.profile_directory, exist_ok=True)
+    name = dt.datetime.now().strftime('profile-%Y%m%d-%H%M%S')
+    stats_file = os.path.join(config.profile_directory, name + '.pstats')
+    summary_file = os.path.join(config.profile_directory, name + '.txt')
+
+    profile.dump_stats(stats_file)
+    with open(summary_file, 'w', encoding='utf-8') as summary:
+        stats = pstats.Stats(profile, stream=summary)
+        stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(config.profile_top)
+        stats.sort_stats(pstats.SortKey.TIME).print_stats(config.profile_top)
+    logger.info("Profiling stopped, statistics written to %s", stats_file)
+    return stats_file, summary_file
@@ -0,0 +1,309 @@
+"""
+Non-blocking relayout used in the Notepad application
+
+Changing the font size, the wrap mode or the viewport margins of a
+`QTextEdit` throws away the layout of the whole document. Qt lays it out
+again lazily from the start, but in timer steps that grow to 200,000
+characters, each one freezing the window, and the view jumps back to the
+top since nothing below is laid out yet.
+
+`Relayout` applies these changes instead. Zoom steps requested within
+`relayout-delay-ms` of each other are applied as one font change. The steps
+of the document layout are held back while the blocks are laid out in
+order, in event loop slices of about `relayout-slice-ms`. The editor
+keeps its last picture until the block at the top is laid out again, then
+scrolls back to the same text and the rest is laid out in the following
+slices.
+
+A large paste is laid out by Qt in one go when it is inserted, so
+`editText` makes it with the layout of the document turned off and lays
+the document out again the same way, scrolling to the cursor instead.
+"""
+
+__all__ = ['Relayout']
+__version__ = '0.1'
+__author__ = 'Victor M. Ortiz <Victor.M.Ortiz@outlook.com>'
+
+import time
+from collections.abc import Callable
+from PyQt6.QtCore import QEvent, QMargins, QObject, QPoint, QSizeF, QTimer, pyqtSignal
+from PyQt6.QtGui import QFont, QTextOption
+from PyQt6.QtWidgets import QTextEdit
+from .config import settings
+from .logger import logger
+
+# Blocks laid out by the first call of a relayout, adapted to the slice
+_initial_blocks = 256
+
+
+class Relayout(QObject):
+    """
+    Applies zoom and wrap mode changes to an editor without blocking.
+    """
+
+    # Emitted when the whole document is laid out again
+    finished = pyqtSignal()
+
+    def __init__(self, editor: QTextEdit):
+        """
+        Initialize the Relayout.
+
+        Args:
+            editor (QTextEdit): The editor showing the document.
+        """
+        super().__init__(editor)
+        self._editor = editor
+        self._document = editor.document()
+        self._base_size = editor.font().pointSizeF()
+        self._size = self._base_size
+        # Collapses the zoom steps requested in a row
+        self._delay = QTimer(self)
+        self._delay.setSingleShot(True)
+        self._delay.timeout.connect(self._applyZoom)
+        self._timer = QTimer(self)
+        self._timer.timeout.connect(self._step)
+        # Number of the next block to lay out, -1 when idle
+        self._next = -1
+        self._blocks = _initial_blocks
+        # Block number and offset of the text at the top of the viewport
+        self._anchor: tuple[int, float] | None = None
+        self._started = 0.0
+        # Each blink of the text cursor lays out the text down to it, the
+        # blinks are held back with the layout steps
+        self._control = next((
+            child for child in editor.children()
+            if child.metaObject().className() == 'QWidgetTextControl'
+        ), None)
+        # Folding of the editor, see setFolding
+        self._folding = None
+        self._document.contentsChange.connect(self.onContentsChange)
+
+    def isRunning(self) -> bool:
+        """
+        Returns:
+            bool: True if a change is pending or being laid out.
+        """
+        return self._delay.isActive() or self._next >= 0
+
+    def baseFont(self) -> QFont:
+        """
+        Returns:
+            QFont: The font of the editor at its size before zooming.
+        """
+        font = self._editor.font()
+        font.setPointSizeF(self._base_size)
+        return font
+
+    def setFolding(self, folding):
+        """
+        Measure the laid out text up to the shown blocks, since the folded
+        blocks keep their last layout.
+
+        Args:
+            folding (Folding): The folding of the editor.
+        """
+        self._folding = folding
+
+    def setZoom(self, steps: int):
+        """
+        Set the font size in steps of one point from the initial size. The
+        change is applied once no other step is requested for a while.
+
+        Args:
+            steps (int): The steps to zoom in, negative to zoom out.
+        """
+        self._size = max(1.0, self._base_size + steps)
+        self._delay.start(settings().relayout_delay_ms)
+
+    def setWordWrapMode(self, mode: QTextOption.WrapMode):
+        """
+        Set the wrap mode of the editor.
+
+        Args:
+            mode (QTextOption.WrapMode): The new wrap mode.
+        """
+        if self._editor.wordWrapMode() != mode:
+            self._relayout(lambda: self._editor.setWordWrapMode(mode))
+
+    def setViewportMargins(self, left: int, top: int, right: int, bottom: int):
+        """
+        Set the margins around the viewport of the editor, e.g. for a gutter.
+        A text wrapped to the viewport is laid out again in slices.
+
+        Args:
+            left (int): The left margin, in pixels.
+            top (int): The top margin, in pixels.
+            right (int): The right margin, in pixels.
+            bottom (int): The bottom margin, in pixels.
+        """
+        margins = QMargins(left, top, right, bottom)
+        if self._editor.viewportMargins() == margins:
+            return
+        if self._editor.lineWrapMode() == QTextEdit.LineWrapMode.NoWrap:
+            self._editor.setViewportMargins(margins)
+            return
+
+        def change():
+            # The editor lays out the text down to the viewport right away,
+            # quickly from the top, and the anchor is restored afterwards
+            self._editor.verticalScrollBar().setValue(0)
+            self._editor.setViewportMargins(margins)
+        self._relayout(change)
+
+    def editText(self, change: Callable):
+        """
+        Make a large change of the text without laying out the changed blocks
+        right away. The whole document is laid out again in slices and the
+        editor then scrolls to its cursor.
+
+        Args:
+            change (Callable): Makes the change, leaving the cursor of the
+                editor where the view should scroll to.
+        """
+        size = self._document.pageSize()
+
+        def deferred():
+            # With an empty page the document layout ignores the change, and
+            # setting it back starts a lazy layout of the whole document
+            self._document.setPageSize(QSizeF(0, 0))
+            try:
+                change()
+            finally:
+                # Unless the editor was resized meanwhile, e.g. by its gutter
+                if self._document.pageSize() == QSizeF(0, 0):
+                    self._document.setPageSize(size)
+        self._relayout(deferred, follow_cursor=True)
+
+    def onContentsChange(self, position: int, removed: int, added: int):
+        """
+        Start over when a new text replaces the document, since it is laid
+        out lazily from the start again.
+        """
+        if self._next > 0 and position == 0 and added >= self._document.characterCount() - 1:
+            self._next = 0
+            self._restoreAnchor()
+
+    def eventFilter(self, obj: QObject, event: QEvent) -> bool:
+        """
+        Hold back the layout steps of the document and the cursor blinks
+        while it is relaid out.
+        """
+        return self._next >= 0 and event.type() == QEvent.Type.Timer
+
+    def _applyZoom(self):
+        """
+        Apply the last requested font size.
+        """
+        font = self._editor.font()
+        if font.pointSizeF() != self._size:
+            font.setPointSizeF(self._size)
+            self._relayout(lambda: self._editor.setFont(font))
+
+    def _relayout(self, change: Callable, follow_cursor: bool = False):
+        """
+        Make a change that relays out the whole document and lay it out
+        again in slices.
+
+        Args:
+            change (Callable): Makes the change.
+            follow_cursor (bool): Whether to scroll to the cursor of the
+                editor after the change, instead of to the text at the top.
+        """
+        if self._next < 0:
+            # A relayout in progress keeps the anchor taken before it
+            self._anchor = self._topAnchor()
+            if self._anchor is not None:
+                # The editor and its gutter keep their last picture
+                self._editor.setUpdatesEnabled(False)
+            self._document.documentLayout().installEventFilter(self)
+            if self._control is not None:
+                self._control.installEventFilter(self)
+            self._started = time.perf_counter()
+        change()
+        if follow_cursor:
+            self._anchor = (self._editor.textCursor().blockNumber(), 0.0)
+            self._editor.setUpdatesEnabled(False)
+        self._next = 0
+        self._timer.start(0)
+
+    def _topAnchor(self) -> tuple[int, float] | None:
+        """
+        Returns:
+            tuple[int, float] | None: The number of the block at the top of
+                the viewport and the scrolled part of its height, or None
+                at the top of the document.
+        """
+        value = self._editor.verticalScrollBar().value()
+        if value == 0:
+            return None
+        block = self._editor.cursorForPosition(QPoint(0, 0)).block()
+        rect = self._document.documentLayout().blockBoundingRect(block)
+        offset = (value - rect.top()) / rect.height() if rect.height() > 0 else 0.0
+        return block.blockNumber(), offset
+
+    def _restoreAnchor(self):
+        """
+        Scroll the anchor back to the top of the viewport and paint it.
+        """
+        if self._anchor is None:
+            return
+        number, offset = self._anchor
+        self._anchor = None
+        block = self._document.findBlockByNumber(number)
+        if block.isValid():
+            rect = self._document.documentLayout().blockBoundingRect(block)
+            self._editor.verticalScrollBar().setValue(round(rect.top() + offset * rect.height()))
+        self._editor.setUpdatesEnabled(True)
+
+    def _step(self):
+        """
+        Lay out the next blocks for about a slice of time.
+        """
+        budget = settings().relayout_slice_ms / 1000
+        start = time.perf_counter()
+        layout = self._document.documentLayout()
+        count = self._document.blockCount()
+        number = self._next
+        while number < count and time.perf_counter() - start < budget:
+            last = min(number + self._blocks, count) - 1
+            called = time.perf_counter()
+            # Lays out every block up to this one
+            layout.blockBoundingRect(self._document.findBlockByNumber(last))
+            took = time.perf_counter() - called
+            # Keep each call well within the slice
+            if took < budget / 4:
+                self._blocks *= 2
+            elif took > budget / 2 and self._blocks > 1:
+                self._blocks //= 2
+            number = last + 1
+        self._next = number
+
+        # Let the scroll bars cover the text laid out so far
+        last_block = self._document.findBlockByNumber(number - 1)
+        if self._folding is not None:
+            last_block = self._folding.visibleBlock(last_block)
+        bottom = layout.blockBoundingRect(last_block).bottom()
+        layout.documentSizeChanged.emit(QSizeF(self._document.pageSize().width(), bottom))
+        if self._anchor is not None and number > self._anchor[0]:
+            top = layout.blockBoundingRect(self._document.findBlockByNumber(self._anchor[0])).top()
+            if bottom - top >= self._editor.viewport().height() or number >= count:
+                self._restoreAnchor()
+        if number >= count:
+            self._finish()
+
+    def _finish(self):
+        """
+        Stop once the whole document is laid out.
+        """
+        self._timer.stop()
+        self._next = -1
+        self._blocks = _initial_blocks
+        self._document.documentLayout().removeEventFilter(self)
+        if self._control is not None:
+            self._control.removeEventFilter(self)
+        self._restoreAnchor()
+        logger.info(
+            "Relaid out %s blocks in %.2f s",
+            self._document.blockCount(), time.perf_counter() - self._started
+        )
+        self.finished.emit()
@@ -0,0 +1,207 @@
+"""
+Settings file of the Notepad application
+
+Declares the `Settings` read from `config/app.json` and reads them with the
+standard library only, so that the batch commands get the settings without
+importing Qt. The GUI gets the current settings from `config`.
+"""
+
+__all__ = ['Settings', 'config_file', 'readSettings']
+__version__ = '0.1'
+__author__ = 'Victor M. Ortiz <Victor.M.Ortiz@outlook.com>'
+
+import dataclasses
+import json
+import logging
+import types
+import typing
+from dataclasses import dataclass
+from typing import Any
+
+logger = logging.getLogger('notepadLogger')
+
+# Configuration
+config_file = 'config/app.json'
+
+@dataclass(frozen=True)
+class Settings:
+    """
+    Application settings. Each field maps to the key of `config/app.json`
+    with dashes instead of underscores, e.g. `zoom_max` is `zoom-max`.
+    """
+    app_locale: str = 'en'
+    app_name: str = 'Notepad'
+    about_logo: str = 'img/windows-logo-300.png'
+    about_icon: str = 'img/notepad-icon-32.png'
+    completion_memory_mb: int = 32
+    completion_min_length: int = 3
+    datetime_format: str = '%I:%M %p %m/%d/%Y'
+    file_name: str = 'Untitled'
+    file_encoding: str = 'utf_8'
+    file_extension: str = '*.txt'
+    file_dialog_directory: str = '~'
+    file_dialog_filters: str = 'Text Documents(*.txt);;All Files(*.*)'
+    font_ui_families: tuple[str, ...] = ('Arial',)
+    font_ui_size: int = 10
+    font_ui_weight: int = 0
+    font_ui_italic: bool = False
+    help_view: str = 'https://www.bing.com/search?q=get+help+with+notepad+in+windows'
+    highlight_enabled: bool = True
+    highlight_max_kb: int = 2048
+    highlight_slice_ms: int = 8
+    long_line_threshold: int = 10000
+    long_line_segment: int = 4096
+    paste_warning_mb: int = 50
+    spell_dictionary: str = '/usr/share/dict/words'
+    spell_extensions: tuple[str, ...] = ('.txt', '.md', '.rst', '.tex')
+    trace_enabled: bool = False
+    trace_buffer_size: int = 10000
+    undo_memory_budget_mb: int = 64
+    undo_persist_enabled: bool = True
+    undo_persist_file_kb: int = 512
+    undo_persist_total_mb: int = 32
+    watchdog_enabled: bool = True
+    watchdog_threshold_ms: int = 100
+    watchdog_sample_interval_ms: int = 5
+    profile_directory: str = 'logs'
+    profile_top: int = 30
+    relayout_delay_ms: int = 50
+    relayout_slice_ms: int = 8
+    window_icon: str | None = None
+    window_title: str = '[*]{file} - {app}'
+    zoom_factor: int = 10
+    zoom_restore: int = 100
+    zoom_min: int = 10
+    zoom_max: int = 500
+
+    @staticmethod
+    def key(field: str) -> str:
+        """
+        Returns the JSON key of a settings field.
+        """
+        return field.replace('_', '-')
+
+    @classmethod
+    def fromDict(cls, values: dict) -> 'Settings':
+        """
+        Build the settings from the parsed JSON configuration.
+
+        Missing keys and values of the wrong type are logged and replaced
+        by their default.
+
+        Args:
+            values (dict): The parsed configuration.
+
+        Returns:
+            Settings: The validated settings.
+        """
+        hints = typing.get_type_hints(cls)
+        kwargs = {}
+        for field in dataclasses.fields(cls):
+            key = cls.key(field.name)
+            if key not in values:
+                logger.warning("Configuration key %s is missing in config %s", key, config_file)
+                continue
+            value = _coerce(values[key], hints[field.name])
+            if value is _invalid:
+                logger.warning("Configuration key %s has an invalid value %r in config %s", key, values[key], config_file)
+                continue
+            kwargs[field.name] = value
+        known = {cls.key(field.name) for field in dataclasses.fields(cls)}
+        for key in values.keys() - known:
+            logger.warning("Unknown configuration key %s in config %s", key, config_file)
+
+        settings = cls(**kwargs)
+        if not (0 < settings.zoom_min <= settings.zoom_restore <= settings.zoom_max) \
+                or settings.zoom_factor <= 0:
+            logger.warning("Zoom settings are out of range in config %s, using defaults", config_file)
+            settings = dataclasses.replace(
+                settings,
+                zoom_factor = cls.zoom_factor,
+                zoom_restore = cls.zoom_restore,
+                zoom_min = cls.zoom_min,
+                zoom_max = cls.zoom_max
+            )
+        if settings.long_line_segment <= 0:
+            logger.warning("Long line segment is not positive in config %s, using default", config_file)
+            settings = dataclasses.replace(settings, long_line_segment = cls.long_line_segment)
+        if settings.highlight_max_kb < 0 or settings.highlight_slice_ms <= 0:
+            logger.warning("Highlight settings are out of range in config %s, using defaults", config_file)
+            settings = dataclasses.replace(
+                settings,
+                highlight_max_kb = cls.highlight_max_kb,
+                highlight_slice_ms = cls.highlight_slice_ms
+            )
+        if settings.relayout_delay_ms < 0 or settings.relayout_slice_ms <= 0:
+            logger.warning("Relayout settings are out of range in config %s, using defaults", config_file)
+            settings = dataclasses.replace(
+                settings,
+                relayout_delay_ms = cls.relayout_delay_ms,
+                relayout_slice_ms = cls.relayout_slice_ms
+            )
+        if settings.undo_memory_budget_mb < 0:
+            logger.warning("Undo memory budget is negative in config %s, using default", config_file)
+            settings = dataclasses.replace(settings, undo_memory_budget_mb = cls.undo_memory_budget_mb)
+        if settings.completion_memory_mb < 0 or settings.completion_min_length <= 0:
+            logger.warning("Completion settings are out of range in config %s, using defaults", config_file)
+            settings = dataclasses.replace(
+                settings,
+                completion_memory_mb = cls.completion_memory_mb,
+                completion_min_length = cls.completion_min_length
+            )
+        return settings
+
+    def changedFields(self, other: 'Settings') -> frozenset[str]:
+        """
+        Returns the names of the fields whose value differs in other settings.
+        """
+        return frozenset(
+            field.name for field in dataclasses.fields(self)
+            if getattr(self, field.name) != getattr(other, field.name)
+        )
+
+_invalid = object()
+
+def _coerce(value: Any, hint) -> Any:
+    """
+    Check a JSON value against a field type.
+
+    Returns:
+        The value converted to the field type, or `_invalid`.
+    """
+    if isinstance(hint, types.UnionType):
+        for option in typing.get_args(hint):
+            coerced = _coerce(value, option)
+            if coerced is not _invalid:
+                return coerced
+        return _invalid
+    if hint is type(None):
+        return None if value is None else _invalid
+    if typing.get_origin(hint) is tuple:
+        item_type = typing.get_args(hint)[0]
+        if isinstance(value, str):
+            value = [value]
+        if not isinstance(value, list) or not all(isinstance(item, item_type) for item in value):
+            return _invalid
+        return tuple(value)
+    # bool is a subclass of int, do not accept it for numbers
+    if hint is int and isinstance(value, bool):
+        return _invalid
+    return value if isinstance(value, hint) else _invalid
+
+def readSettings() -> Settings:
+    """
+    Read and validate the configuration file.
+
+    Returns:
+        Settings: The settings.
+
+    Raises:
+        OSError: If the file could not be opened.
+        ValueError: If the file is not a JSON object in UTF-8.
+    """
+    with open(config_file, 'r', encoding='utf-8') as app_config:
+        values = json.load(app_config)
+    if not isinstance(values, dict):
+        raise ValueError(f"Configuration file {config_file} must hold a JSON object")
+    return Settings.fromDict(values)
@@ -0,0 +1,534 @@
+"""
+Spell checking used in the Notepad application
+
+`Dictionary` holds the word list of the `spell-dictionary` setting, one
+word per line, as a DAWG: a trie whose identical suffixes are shared, so a
+list of hundreds of thousands of words takes a few hundred thousand edges.
+The edges of all the nodes are kept in flat arrays, a node being the slice
+of its edges. Suggestions are the words within a small edit distance,
+found by walking the same graph with rows of the distance table per
+edge and leaving the branches that cannot get close enough.
+
+`SpellChecker` underlines the misspelled words of the blocks in view as
+extra selections of the editor, which are painted without laying out the
+text again. The blocks are checked on a worker thread, which also loads
+the dictionary on first use, and the results are cached by a hash of the
+block text. Only a block whose text changed is checked again, and
+scrolling back to checked text reuses its results. Spell checking is for
+prose, it is off for files whose extension is not in `spell-extensions`
+and in long line mode.
+"""
+
+__all__ = ['Dictionary', 'SpellChecker']
+__version__ = '0.1'
+__author__ = 'Victor M. Ortiz <Victor.M.Ortiz@outlook.com>'
+
+import collections
+import os
+import queue
+import re
+import threading
+import time
+from array import array
+from collections.abc import Iterable
+from PyQt6.QtCore import QEvent, QObject, QPoint, QTimer, pyqtSignal
+from PyQt6.QtGui import QAction, QColor, QTextCharFormat, QTextCursor
+from PyQt6.QtWidgets import QTextEdit
+from .config import settings, configWatcher
+from .logger import logger
+from .translation import tr
+
+# Words, with their inner apostrophes
+_word = re.compile(r"[^\W\d_]+(?:['’][^\W\d_]+)*")
+# Checked blocks whose results are kept
+_cache_size = 20000
+# Suggestions shown for a misspelled word
+_max_suggestions = 8
+_max_distance = 2
+# Loaded dictionaries by path, shared by the windows
+_dictionaries: dict[str, 'Dictionary'] = {}
+_dictionaries_lock = threading.Lock()
+
+
+class Dictionary:
+    """
+    Word list stored as a DAWG in flat arrays.
+    """
+
+    def __init__(self, words: Iterable[str]):
+        """
+        Initialize the Dictionary.
+
+        Args:
+            words (Iterable[str]): The words, in any order.
+        """
+        labels: list[str] = []
+        self._targets = array('l')
+        self._starts = array('l')
+        self._final = bytearray()
+        # Nodes by their finality and edges, to share identical suffixes
+        register: dict[tuple, int] = {}
+
+        def freeze(final: bool, edges: dict[str, int]) -> int:
+            items = tuple(sorted(edges.items()))
+            key = (final, items)
+            node = register.get(key)
+            if node is None:
+                node = len(self._final)
+                register[key] = node
+                self._final.append(final)
+                self._starts.append(len(labels))
+                for label, target in items:
+                    labels.append(label)
+                    self._targets.append(target)
+            return node
+
+        # Nodes of the last word, which may still get edges, as the node
+        # after each of its prefixes
+        path: list[list] = [[False, {}]]
+        previous = ''
+        count = 0
+        for word in sorted(set(words)):
+            if not word:
+                continue
+            common = 0
+            limit = min(len(word), len(previous))
+            while common < limit and word[common] == previous[common]:
+                common += 1
+            # The nodes past the common prefix get no other edges
+            while len(path) > common + 1:
+                final, edges = path.pop()
+                path[-1][1][previous[len(path) - 1]] = freeze(final, edges)
+            for _ in word[common:]:
+                path.append([False, {}])
+            path[-1][0] = True
+            previous = word
+            count += 1
+        while len(path) > 1:
+            final, edges = path.pop()
+            path[-1][1][previous[len(path) - 1]] = freeze(final, edges)
+        self._root = freeze(*path[0])
+        self._starts.append(len(labels))
+        self._labels = ''.join(labels)
+        self._count = count
+
+    @classmethod
+    def load(cls, path: str) -> 'Dictionary':
+        """
+        Load a word list, one word per line.
+
+        Args:
+            path (str): The path of the word list.
+
+        Returns:
+            Dictionary: The dictionary of the words.
+        """
+        with open(path, 'r', encoding='utf-8', errors='replace') as file:
+            return cls(line.strip() for line in file)
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __contains__(self, word: str) -> bool:
+        node = self._root
+        labels, starts, targets = self._labels, self._starts, self._targets
+        for char in word:
+            index = labels.find(char, starts[node], starts[node + 1])
+            if index < 0:
+                return False
+            node = targets[index]
+        return bool(self._final[node])
+
+    def nodeCount(self) -> int:
+        """
+        Returns:
+            int: The number of nodes of the graph.
+        """
+        return len(self._final)
+
+    def suggest(self, word: str, distance: int = _max_distance, limit: int = _max_suggestions) -> list[str]:
+        """
+        Returns the words closest to a word, by the number of letters inserted,
+        removed, replaced or swapped.
+
+        Args:
+            word (str): The word.
+            distance (int): The largest distance of a suggestion.
+            limit (int): The largest number of suggestions.
+
+        Returns:
+            list[str]: The suggestions, the closest first.
+        """
+        labels, starts, targets, final = self._labels, self._starts, self._targets, self._final
+        size = len(word)
+        found: dict[str, int] = {}
+        # Nodes to visit with their prefix and the last two rows of the
+        # distance table of the prefix against the word, which count a
+        # swap of two letters as one edit
+        stack = [(self._root, '', list(range(size + 1)), None)]
+        while stack:
+            node, prefix, row, previous_row = stack.pop()
+            if final[node] and row[size] <= distance:
+                found[prefix] = row[size]
+            for index in range(starts[node], starts[node + 1]):
+                label = labels[index]
+                next_row = [row[0] + 1]
+                for column in range(1, size + 1):
+                    cost = min(
+                        next_row[column - 1] + 1,
+                        row[column] + 1,
+                        row[column - 1] + (word[column - 1] != label)
+                    )
+                    if (
+                        previous_row is not None and column > 1 and label == word[column - 2]
+                        and prefix[-1] == word[column - 1]
+                    ):
+                        cost = min(cost, previous_row[column - 2] + 1)
+                    next_row.append(cost)
+                if min(next_row) <= distance:
+                    stack.append((targets[index], prefix + label, next_row, row))
+        # Closest first, then those keeping the first letter and the length
+        return sorted(found, key=lambda suggestion: (
+            found[suggestion], suggestion[:1] != word[:1], abs(len(suggestion) - size), suggestion
+        ))[:limit]
+
+def _dictionary(path: str) -> Dictionary:
+    """
+    Returns the dictionary of a word list, loaded on first use.
+    """
+    with _dictionaries_lock:
+        dictionary = _dictionaries.get(path)
+        if dictionary is None:
+            start = time.perf_counter()
+            dictionary = _dictionaries[path] = Dictionary.load(path)
+            logger.info(
+                "Dictionary %s loaded in %.2f s, %s words in %s nodes",
+                path, time.perf_counter() - start, len(dictionary), dictionary.nodeCount()
+            )
+        return dictionary
+
+def _isKnown(dictionary: Dictionary, word: str) -> bool:
+    """
+    Returns whether a word is spelled right, capitalized or in upper case
+    if it is in the dictionary in lower case.
+    """
+    if word in dictionary:
+        return True
+    if word[0].isupper() and (word[1:].islower() or word.isupper()):
+        lower = word.lower()
+        return lower in dictionary or word.capitalize() in dictionary
+    return False
+
+def _misspelled(dictionary: Dictionary, text: str) -> tuple[tuple[int, int], ...]:
+    """
+    Returns the misspelled words of a line as their start and length in
+    document positions.
+    """
+    offsets = None
+    spans = []
+    for match in _word.finditer(text):
+        word = match.group().replace('’', "'")
+        if len(word) < 2 or (len(word) <= 5 and word.isupper()):
+            # Letters and acronyms
+            continue
+        if _isKnown(dictionary, word) or (word.endswith("'s") and _isKnown(dictionary, word[:-2])):
+            continue
+        start, end = match.span()
+        if not text.isascii():
+            if offsets is None:
+                offsets = [0]
+                for char in text:
+                    offsets.append(offsets[-1] + (2 if ord(char) > 0xFFFF else 1))
+            start, end = offsets[start], offsets[end]
+        spans.append((start, end - start))
+    return tuple(spans)
+
+
+class SpellChecker(QObject):
+    """
+    Underlines the misspelled words in view of an editor.
+    """
+
+    # Emitted when the dictionary cannot be loaded, with the error
+    unavailable = pyqtSignal(str)
+    # Emitted by the worker thread with the generation it checked for and
+    # the misspelled words of each block text
+    _checked = pyqtSignal(int, object)
+    # Emitted by the worker thread with the generation it failed for and
+    # the error
+    _failed = pyqtSignal(int, str)
+
+    def __init__(self, editor: QTextEdit, long_lines, folding):
+        """
+        Initialize the SpellChecker.
+
+        Args:
+            editor (QTextEdit): The editor showing the document.
+            long_lines (LongLines): The long line mode of the editor, where
+                spell checking is off.
+            folding (Folding): The folded regions, whose hidden blocks are
+                not checked.
+        """
+        super().__init__(editor)
+        self._editor = editor
+        self._document = editor.document()
+        self._long_lines = long_lines
+        self._folding = folding
+        self._enabled = False
+        self._prose = True
+        self._active = False
+        self._dictionary: Dictionary | None = None
+        # Misspelled words by hash of the block text, least recently used first
+        self._cache: collections.OrderedDict[int, tuple] = collections.OrderedDict()
+        # Block texts sent to the worker thread and not checked yet
+        self._pending: set[int] = set()
+        # Bumped when the dictionary changes, dropping older results
+        self._generation = 0
+        self._queue: queue.SimpleQueue = queue.SimpleQueue()
+        self._thread: threading.Thread | None = None
+        self._underlined: list[tuple[int, int]] = []
+        self._format = QTextCharFormat()
+        self._format.setUnderlineStyle(QTextCharFormat.UnderlineStyle.SpellCheckUnderline)
+        self._format.setUnderlineColor(QColor('#e51400'))
+        # Collapses the edits and scroll events of a single paint
+        self._visible = QTimer(self)
+        self._visible.setSingleShot(True)
+        self._visible.timeout.connect(self._checkVisible)
+        self._checked.connect(self.onChecked)
+        self._failed.connect(self.onFailed)
+        self._document.contentsChange.connect(self.onContentsChange)
+        editor.verticalScrollBar().valueChanged.connect(lambda: self._schedule())
+        folding.changed.connect(lambda: self._schedule())
+        editor.viewport().installEventFilter(self)
+        configWatcher().settingsChanged.connect(self.onSettingsChanged)
+
+    def isActive(self) -> bool:
+        """
+        Returns:
+            bool: True if the document is spell checked.
+        """
+        return self._active
+
+    def setEnabled(self, enabled: bool):
+        """
+        Turn spell checking on or off.
+
+        Args:
+            enabled (bool): Whether prose files are spell checked.
+        """
+        self._enabled = enabled
+        self._update()
+
+    def setFile(self, filename: str | None):
+        """
+        Spell check the document if a file is prose, by its extension.
+
+        Args:
+            filename (str | None): The file shown, None for a new file.
+        """
+        extension = os.path.splitext(filename)[1].lower() if filename else ''
+        self._prose = filename is None or extension in settings().spell_extensions
+        self._update()
+
+    def onContentsChange(self, position: int, removed: int, added: int):
+        """
+        Check the blocks in view once the edits are done.
+        """
+        self._update()
+        self._schedule()
+
+    def onChecked(self, generation: int, results: list[tuple[int, tuple]]):
+        """
+        Cache the misspelled words found by the worker thread and underline
+        those in view.
+        """
+        if generation != self._generation:
+            return
+        for key, spans in results:
+            self._pending.discard(key)
+            self._cache[key] = spans
+        while len(self._cache) > _cache_size:
+            self._cache.popitem(last=False)
+        self._schedule()
+
+    def onFailed(self, generation: int, message: str):
+        """
+        Turn spell checking off when the dictionary could not be loaded.
+        """
+        if generation != self._generation:
+            return
+        self._enabled = False
+        self._update()
+        self.unavailable.emit(message)
+
+    def onSettingsChanged(self, changed: frozenset[str]):
+        """
+        Check the text again with a new dictionary.
+
+        Args:
+            changed (frozenset[str]): The names of the changed settings.
+        """
+        if 'spell_dictionary' in changed:
+            self._dictionary = None
+            self._reset()
+            self._schedule()
+
+    def eventFilter(self, obj: QObject, event: QEvent) -> bool:
+        """
+        Check the blocks coming into view when the viewport grows, and offer
+        suggestions in the context menu of a misspelled word.
+        """
+        if event.type() == QEvent.Type.Resize:
+            self._schedule()
+        elif event.type() == QEvent.Type.ContextMenu and self._active:
+            return self._showSuggestions(event.pos(), event.globalPos())
+        return False
+
+    def _update(self):
+        """
+        Turn spell checking on or off for the current file, settings and
+        long line mode.
+        """
+        active = self._enabled and self._prose and not self._long_lines.isActive()
+        if active == self._active:
+            return
+        self._active = active
+        logger.info("Spell checking %s", 'on' if active else 'off')
+        if not active:
+            self._reset()
+        self._schedule()
+
+    def _reset(self):
+        """
+        Forget the results and the pending checks.
+        """
+        self._generation += 1
+        self._cache.clear()
+        self._pending.clear()
+
+    def _schedule(self):
+        """
+        Underline the blocks in view once the event loop is idle.
+        """
+        if self._active or self._underlined:
+            self._visible.start(0)
+
+    def _checkVisible(self):
+        """
+        Underline the misspelled words of the blocks in view, and send the
+        blocks not checked yet to the worker thread. The blocks of folded
+        regions are skipped.
+        """
+        spans = []
+        missing = []
+        if self._active:
+            viewport = self._editor.viewport()
+            # The document margin hits the block laid out last while the
+            # layout is still lazy, so hit the first line and step back
+            # over the block ending in the margin
+            top = int(self._document.documentMargin()) + 1
+            block = self._editor.cursorForPosition(QPoint(0, top)).block()
+            if block.previous().isValid():
+                block = self._folding.visibleBlock(block.previous())
+            last = self._editor.cursorForPosition(QPoint(0, viewport.height())).blockNumber()
+            while block.isValid() and block.blockNumber() <= last:
+                text = block.text()
+                key = hash(text)
+                misspelled = self._cache.get(key)
+                if misspelled is not None:
+                    self._cache.move_to_end(key)
+                    position = block.position()
+                    spans.extend((position + start, length) for start, length in misspelled)
+                elif key not in self._pending:
+                    self._pending.add(key)
+                    missing.append((key, text))
+                block = self._folding.nextBlock(block)
+        if missing:
+            self._queue.put((self._generation, settings().spell_dictionary, missing))
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='SpellChecker', daemon=True)
+                self._thread.start()
+        if spans != self._underlined:
+            self._underlined = spans
+            self._editor.setExtraSelections([self._selection(start, length) for start, length in spans])
+
+    def _selection(self, start: int, length: int) -> QTextEdit.ExtraSelection:
+        """
+        Returns the underline of a misspelled word.
+        """
+        selection = QTextEdit.ExtraSelection()
+        selection.cursor = QTextCursor(self._document)
+        selection.cursor.setPosition(start)
+        selection.cursor.setPosition(start + length, QTextCursor.MoveMode.KeepAnchor)
+        selection.format = self._format
+        return selection
+
+    def _run(self):
+        """
+        Check the block texts sent by the GUI thread, loading the dictionary
+        on first use.
+        """
+        while True:
+            generation, path, texts = self._queue.get()
+            try:
+                dictionary = _dictionary(path)
+            except (OSError, UnicodeError) as e:
+                logger.warning("Dictionary %s not loaded. %s", path, e)
+                try:
+                    self._failed.emit(generation, f"The dictionary {path} could not be loaded. {e}")
+                except RuntimeError:
+                    return
+                continue
+            self._dictionary = dictionary
+            results = [(key, _misspelled(dictionary, text)) for key, text in texts]
+            try:
+                self._checked.emit(generation, results)
+            except RuntimeError:
+                # The editor was closed
+                return
+
+    def _showSuggestions(self, position: QPoint, global_position: QPoint) -> bool:
+        """
+        Show the context menu of the editor with the suggestions for the
+        misspelled word at a position of the viewport.
+
+        Returns:
+            bool: True if the menu was shown, False if there is no
+                misspelled word at the position.
+        """
+        cursor = self._editor.cursorForPosition(position)
+        offset = cursor.position()
+        span = next((
+            (start, length) for start, length in self._underlined
+            if start <= offset <= start + length
+        ), None)
+        if span is None or self._dictionary is None:
+            return False
+        cursor.setPosition(span[0])
+        cursor.setPosition(span[0] + span[1], QTextCursor.MoveMode.KeepAnchor)
+        word = cursor.selectedText()
+        lookup = word.lower() if word[:1].isupper() else word
+        suggestions = [
+            suggestion for suggestion in self._dictionary.suggest(lookup.replace('’', "'"))
+            if suggestion != lookup
+        ]
+        if word[:1].isupper():
+            suggestions = [
+                suggestion.upper() if word.isupper() else suggestion[:1].upper() + suggestion[1:]
+                for suggestion in suggestions
+            ]
+
+        menu = self._editor.createStandardContextMenu(position)
+        first = menu.actions()[0] if menu.actions() else None
+        for suggestion in suggestions:
+            action = QAction(suggestion, menu)
+            action.triggered.connect(lambda checked, text=suggestion: cursor.insertText(text))
+            menu.insertAction(first, action)
+        if not suggestions:
+            action = QAction(tr('No suggestions'), menu)
+            action.setEnabled(False)
+            menu.insertAction(first, action)
+        menu.insertSeparator(first)
+        menu.exec(global_position)
+        menu.deleteLater()
+        return True
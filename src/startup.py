@@ -0,0 +1,87 @@
+"""
+Startup timing for the Notepad application
+
+Records the time spent importing modules and building the main window until
+the editor is painted for the first time. It is enabled with the
+`--profile-startup` command line flag and does nothing otherwise.
+"""
+
+__all__ = ['enable', 'isEnabled', 'mark', 'report', 'watchFirstPaint']
+__version__ = '0.1'
+__author__ = 'Victor M. Ortiz <Victor.M.Ortiz@outlook.com>'
+
+import sys
+import time
+
+# Taken before any Qt module is imported by the application
+_start = time.perf_counter()
+_marks: list[tuple[str, float]] = []
+_enabled = False
+
+from PyQt6.QtCore import QEvent, QObject
+
+def enable():
+    """
+    Start recording startup marks.
+    """
+    global _enabled
+    _enabled = True
+
+def isEnabled() -> bool:
+    """
+    Returns:
+        bool: True if startup marks are being recorded.
+    """
+    return _enabled
+
+def mark(label: str):
+    """
+    Record the time at which a startup step finished.
+
+    Args:
+        label (str): The name of the step.
+    """
+    if _enabled:
+        _marks.append((label, time.perf_counter()))
+
+def report(stream = None):
+    """
+    Print the time spent on each startup step.
+
+    Args:
+        stream: The text stream to write to, `sys.stderr` by default.
+    """
+    if stream is None:
+        stream = sys.stderr
+    print(f"{'Startup step':<32}{'Step (ms)':>12}{'Total (ms)':>12}", file=stream)
+    previous = _start
+    for label, timestamp in _marks:
+        step = (timestamp - previous) * 1000
+        total = (timestamp - _start) * 1000
+        print(f"{label:<32}{step:>12.1f}{total:>12.1f}", file=stream)
+        previous = timestamp
+    stream.flush()
+
+
+class _FirstPaintFilter(QObject):
+    """
+    Event filter that records the first paint event of a widget.
+    """
+
+    def eventFilter(self, obj: QObject, event: QEvent) -> bool:
+        if event.type() == QEvent.Type.Paint:
+            obj.removeEventFilter(self)
+            mark('first paint')
+            report()
+            self.deleteLater()
+        return False
+
+def watchFirstPaint(widget: QObject):
+    """
+    Print the startup report once the widget is painted for the first time.
+
+    Args:
+        widget (QObject): The widget to watch, usually the editor viewport.
+    """
+    if _enabled:
+        widget.installEventFilter(_FirstPaintFilter(widget))
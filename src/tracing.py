@@ -0,0 +1,181 @@
+"""
+Tracing of editor operations in the Notepad application
+
+Operations decorated with `traced` record a span in a ring buffer while
+tracing is enabled: wall time, thread CPU time, document size and, on the
+GUI thread, how long the event loop stayed blocked. The buffer is exported
+as Chrome Trace Event JSON, which can be opened in `chrome://tracing` or
+https://ui.perfetto.dev.
+
+When tracing is disabled a traced call costs one flag check.
+"""
+
+__all__ = ['enable', 'disable', 'isEnabled', 'span', 'traced', 'documentSize', 'events', 'dump']
+__version__ = '0.1'
+__author__ = 'Victor M. Ortiz <Victor.M.Ortiz@outlook.com>'
+
+import collections
+import contextlib
+import functools
+import inspect
+import json
+import os
+import threading
+import time
+from collections.abc import Callable
+from PyQt6.QtCore import QCoreApplication, QThread, QTimer
+
+_enabled = False
+_events: collections.deque = collections.deque(maxlen=10000)
+
+def enable(buffer_size: int | None = None):
+    """
+    Start recording spans.
+
+    Args:
+        buffer_size (int | None): The number of spans kept, the oldest are
+            dropped first. Keeps the current size when None.
+    """
+    global _enabled, _events
+    if buffer_size is not None and buffer_size != _events.maxlen:
+        _events = collections.deque(_events, maxlen=buffer_size)
+    _enabled = True
+
+def disable():
+    """
+    Stop recording spans, keeping the ones already recorded.
+    """
+    global _enabled
+    _enabled = False
+
+def isEnabled() -> bool:
+    """
+    Returns:
+        bool: True if spans are being recorded.
+    """
+    return _enabled
+
+def _isGuiThread() -> bool:
+    app = QCoreApplication.instance()
+    return app is not None and QThread.currentThread() is app.thread()
+
+@contextlib.contextmanager
+def span(name: str, category: str = 'editor'):
+    """
+    Record the enclosed block as a complete trace event.
+
+    Args:
+        name (str): The span name.
+        category (str): The trace event category.
+
+    Yields:
+        dict: The event arguments, to which the block may add values.
+    """
+    if not _enabled:
+        yield {}
+        return
+    args = {}
+    start = time.perf_counter_ns()
+    cpu_start = time.thread_time_ns()
+    try:
+        yield args
+    finally:
+        end = time.perf_counter_ns()
+        args['cpu_ms'] = round((time.thread_time_ns() - cpu_start) / 1e6, 3)
+        event = {
+            'name': name,
+            'cat': category,
+            'ph': 'X',
+            'ts': start / 1000,
+            'dur': (end - start) / 1000,
+            'pid': os.getpid(),
+            'tid': threading.get_ident(),
+            'args': args
+        }
+        _events.append(event)
+        if _isGuiThread():
+            # The event loop is blocked until the layout and paint work
+            # triggered by the operation is done, measure up to then
+            def onEventLoop():
+                args['stall_ms'] = round((time.perf_counter_ns() - start) / 1e6, 3)
+            QTimer.singleShot(0, onEventLoop)
+
+def traced(name: str, size: Callable | None = None):
+    """
+    Decorate a function to record a span on each call while tracing.
+
+    Like Qt slots, the decorated function ignores extra positional
+    arguments, so it can still be connected to signals with more arguments.
+
+    Args:
+        name (str): The span name.
+        size (Callable | None): Called with the function arguments after the
+            call to get the document size recorded with the span.
+    """
+    def decorator(func):
+        parameters = inspect.signature(func).parameters.values()
+        if any(p.kind == p.VAR_POSITIONAL for p in parameters):
+            count = None
+        else:
+            count = sum(
+                p.kind in (p.POSITIONAL_ONLY, p.POSITIONAL_OR_KEYWORD)
+                for p in parameters
+            )
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            args = args[:count]
+            if not _enabled:
+                return func(*args, **kwargs)
+            with span(name) as event_args:
+                result = func(*args, **kwargs)
+                if size is not None:
+                    event_args['size'] = size(*args)
+            return result
+        return wrapper
+    return decorator
+
+def documentSize(owner, *args) -> int:
+    """
+    Returns the number of characters in the editor of a window, or of the
+    window a dialog belongs to, for the `size` of `traced`.
+
+    Args:
+        owner: The `Notepad` window or one of its dialogs.
+    """
+    editor = getattr(owner, 'editor', None)
+    if editor is None:
+        editor = owner.parent().editor
+    return editor.document().characterCount()
+
+def events() -> list[dict]:
+    """
+    Returns:
+        list[dict]: The recorded trace events, oldest first.
+    """
+    return list(_events)
+
+def dump(filename: str) -> int:
+    """
+    Write the recorded spans as Chrome Trace Event JSON.
+
+    Args:
+        filename (str): The file to write.
+
+    Returns:
+        int: The number of events written.
+    """
+    trace_events = events()
+    metadata = {
+        'name': 'thread_name',
+        'ph': 'M',
+        'pid': os.getpid(),
+        'tid': threading.main_thread().ident,
+        'args': {'name': 'GUI thread'}
+    }
+    with open(filename, 'w', encoding='utf-8') as trace_file:
+        json.dump(
+            {'traceEvents': [metadata] + trace_events, 'displayTimeUnit': 'ms'},
+            trace_file
+        )
+    return len(trace_events)
@@ -1,5 +1,5 @@
 import gettext
-from .config import readConfig
+from .config import settings
 
 __all__ = ['tr']
 __version__ = '0.1'
@@ -7,8 +7,8 @@ __author__ = 'Victor M. Ortiz <Victor.M.Ortiz@outlook.com>'
 
 # Localization
 gettext.bindtextdomain(
-    readConfig('app-name'), 
-    'locales/' + readConfig('app-locale')
+    settings().app_name, 
+    'locales/' + settings().app_locale
 )
-gettext.textdomain(readConfig('app-name'))
+gettext.textdomain(settings().app_name)
 tr = gettext.gettext
@@ -0,0 +1,163 @@
+"""
+GUI thread stall watchdog used in the Notepad application
+
+A background thread pings the Qt event loop. When the answer is later than
+the configured threshold, the thread samples the Python stack of the GUI
+thread until the event loop answers again, and logs how long the stall
+lasted with a summary of the collapsed stacks that were sampled.
+
+Collapsed stacks list the frames from the outermost to the innermost call,
+separated by semicolons, as used by flame graph tools.
+"""
+
+__all__ = ['Watchdog']
+__version__ = '0.1'
+__author__ = 'Victor M. Ortiz <Victor.M.Ortiz@outlook.com>'
+
+import collections
+import os
+import sys
+import threading
+import time
+from types import FrameType
+from PyQt6.QtCore import QObject, pyqtSignal
+from .config import settings, configWatcher
+from .logger import logger
+
+# Number of collapsed stacks written to the log for each stall
+_top_stacks = 5
+
+def _collapse(frame: FrameType | None) -> str:
+    """
+    Returns the stack of a frame as a single line, outermost call first.
+    """
+    calls = []
+    while frame is not None:
+        code = frame.f_code
+        calls.append(f"{os.path.basename(code.co_filename)}:{code.co_name}:{frame.f_lineno}")
+        frame = frame.f_back
+    return ';'.join(reversed(calls))
+
+
+class Watchdog(QObject):
+    """
+    Detects when the GUI thread stops processing events and samples its stack.
+
+    The watchdog must be created in the GUI thread. It follows the
+    `watchdog-*` settings, including changes made while running.
+    """
+
+    _ping = pyqtSignal(int)
+
+    def __init__(self, parent: QObject = None):
+        """
+        Initialize the Watchdog.
+
+        Args:
+            parent (QObject): The parent object.
+        """
+        super().__init__(parent)
+        self._gui_thread_id = threading.get_ident()
+        self._pong = threading.Event()
+        self._stop = threading.Event()
+        self._sequence = 0
+        self._thread: threading.Thread | None = None
+        # Emitted from the watchdog thread, queued to the GUI thread
+        self._ping.connect(self.onPing)
+        configWatcher().settingsChanged.connect(self.onSettingsChanged)
+
+    def start(self):
+        """
+        Start the watchdog thread if it is not running.
+        """
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='Watchdog', daemon=True)
+        self._thread.start()
+        logger.info("Watchdog started, threshold %s ms", settings().watchdog_threshold_ms)
+
+    def stop(self):
+        """
+        Stop the watchdog thread and wait for it to finish.
+        """
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._pong.set()
+        self._thread.join()
+        self._thread = None
+        logger.info("Watchdog stopped")
+
+    def isRunning(self) -> bool:
+        """
+        Returns:
+            bool: True if the watchdog thread is running.
+        """
+        return self._thread is not None
+
+    def onPing(self, sequence: int):
+        """
+        Answer a ping from the watchdog thread, run by the event loop.
+
+        Args:
+            sequence (int): The ping number.
+        """
+        if sequence == self._sequence:
+            self._pong.set()
+
+    def onSettingsChanged(self, changed: frozenset[str]):
+        """
+        Start, stop or restart the watchdog when its settings change.
+
+        Args:
+            changed (frozenset[str]): The names of the changed settings.
+        """
+        if not changed & {'watchdog_enabled', 'watchdog_threshold_ms', 'watchdog_sample_interval_ms'}:
+            return
+        self.stop()
+        if settings().watchdog_enabled:
+            self.start()
+
+    def _run(self):
+        """
+        Ping the event loop and sample the GUI thread while it is late.
+        """
+        config = settings()
+        threshold = config.watchdog_threshold_ms / 1000
+        sample_interval = config.watchdog_sample_interval_ms / 1000
+        while not self._stop.wait(threshold):
+            self._sequence += 1
+            self._pong.clear()
+            sent = time.perf_counter()
+            self._ping.emit(self._sequence)
+            if self._pong.wait(threshold):
+                continue
+
+            # Stalled, sample until the event loop answers
+            samples = collections.Counter()
+            while not self._pong.wait(sample_interval):
+                frame = sys._current_frames().get(self._gui_thread_id)
+                samples[_collapse(frame)] += 1
+                del frame
+            if self._stop.is_set():
+                return
+            self._logStall(time.perf_counter() - sent, samples)
+
+    def _logStall(self, duration: float, samples: collections.Counter):
+        """
+        Log a stall with its most sampled stacks.
+
+        Args:
+            duration (float): The stall duration in seconds.
+            samples (collections.Counter): The number of samples of each collapsed stack.
+        """
+        total = sum(samples.values())
+        lines = [
+            f"{count} {stack}"
+            for stack, count in samples.most_common(_top_stacks)
+        ]
+        logger.warning(
+            "GUI thread stalled for %.0f ms, %s stack samples:\n%s",
+            duration * 1000, total, '\n'.join(lines)
+        )
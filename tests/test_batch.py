@@ -0,0 +1,51 @@
+"""
+Each batch command of `src/batch.py` run over a small file, with the
+default encoding of the settings.
+"""
+
+import io
+import json
+import os
+import sys
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src import batch  # noqa: E402
+
+def _run(argv: list[str]) -> tuple[int, list[dict]]:
+    output = io.StringIO()
+    status = batch._run(batch._parseArguments(argv + ['--jobs', '1']), output)
+    return status, [json.loads(line) for line in output.getvalue().splitlines()]
+
+@pytest.fixture
+def document(tmp_path):
+    path = tmp_path / 'a.txt'
+    path.write_bytes(b'a NEEDLE b\r\nneedle\r\nhay\r\n')
+    return str(path)
+
+def test_find(document):
+    status, [result, summary] = _run(['find', 'needle', document])
+    assert status == 0
+    assert result['matches'] == 2
+    assert summary['summary']['matches'] == 2
+
+def test_replace(document):
+    status, [result, _] = _run(['replace', 'needle', 'pin', document])
+    assert status == 0
+    assert result['replacements'] == 2
+    with open(document, 'rb') as file:
+        assert file.read() == b'a pin b\r\npin\r\nhay\r\n'
+
+def test_encoding(document):
+    status, [result, _] = _run(['encoding', '--to', 'utf-16', document])
+    assert status == 0
+    assert result['changed']
+    with open(document, 'rb') as file:
+        assert file.read().decode('utf-16') == 'a NEEDLE b\r\nneedle\r\nhay\r\n'
+
+def test_line_ending(document):
+    status, [result, _] = _run(['line-ending', '--to', 'lf', document])
+    assert status == 0
+    assert result['line_endings'] == 3
+    with open(document, 'rb') as file:
+        assert file.read() == b'a NEEDLE b\nneedle\nhay\n'
@@ -0,0 +1,33 @@
+"""
+Keystroke to paint latency of each scenario of `benchmarks/latency.py`, on
+a small document and a few events. The p99 of each scenario is reported,
+and checked against a budget only when `NOTEPAD_LATENCY_BUDGET_MS` is set,
+since a wall clock gate on a few events fails on a slow machine. Full runs
+use the command line of the harness.
+"""
+
+import os
+import sys
+import pytest
+
+pytest.importorskip('PyQt6.QtWidgets')
+pytest.importorskip('PyQt6.QtTest')
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'benchmarks'))
+import latency  # noqa: E402
+
+_size = '100kb'
+_events = 30
+_interval = 0.01
+_budget_ms = os.environ.get('NOTEPAD_LATENCY_BUDGET_MS')
+
+@pytest.mark.parametrize('scenario', latency._scenarios)
+def test_scenario_latency(scenario, record_property):
+    latency.application()
+    [result] = latency.runSize(_size, [scenario], _events, _interval)
+    assert result['events'] == _events
+    assert {'p50_ms', 'p95_ms', 'p99_ms', 'max_ms'} <= result.keys()
+    record_property('p99_ms', result['p99_ms'])
+    print(f"{scenario} p99 {result['p99_ms']:.2f} ms")
+    if _budget_ms is not None:
+        assert result['p99_ms'] <= float(_budget_ms), result